@@ -1,305 +1,725 @@
-from typing import Dict, List, Any, Tuple, TypedDict, Annotated, Literal, Optional
+from typing import Dict, List, Any, Tuple, TypedDict, Literal, Optional, Callable, Iterator, Union
 import json
 import os
-from langchain_openai import ChatOpenAI
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langgraph.graph import StateGraph, END
-from langgraph.prebuilt import ToolNode
 
 # Import utility functions
-from backend.utils import load_frame_data, extract_frame_elements, get_few_shot_prompts, get_language_specific_info
+from backend.utils import load_frame_data, extract_frame_elements
+from backend.llm import get_llm, get_model_config_id, route_models, mark_prefix_warm
+from backend import metrics
+from backend.governor import get_governor
+from backend.singleflight import analysis_flights
+from backend.segmentation import segment_text, reassemble, merge_frame_analyses
+from backend.example_selector import select_examples
+from backend import pre_annotator
+from backend.cancellation import Cancelled, raise_if_cancelled
+from backend.structured_output import parse_json_object, validate_frame_analysis, with_json_mode
+from backend.prompts import (
+    build_messages, is_multi_frame, build_analysis_format, prompt_size,
+    analysis_suffix, translation_suffix, fast_suffix, draft_suffix
+)
+
+# Default number of concurrent pipelines in run_batch_translation
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+# Bump whenever prompts change so cached translations are not reused across versions
+PROMPT_VERSION = "3"
+
+TRANSLATION_MODES = ("standard", "fast", "speculative")
+
+_DRAFT_TAG_RE = re.compile(r'\[([A-Za-z_]+)\]')
+_DRAFT_TAG_SPAN_RE = re.compile(r'\s*\[([A-Za-z_]+)\]\s*')
+_NUMBER_RE = re.compile(r'\d[\d,.]*\d|\d')
+_NUMBER_SEPARATOR_RE = re.compile(r'(?<=\d)[,.](?=\d)')
 
 # Define state type
 class AgentState(TypedDict):
-    messages: List[Any]
-    frame_data: Dict[str, Any]
+    # Conversation log, only kept when the caller asks for it (None otherwise)
+    messages: Optional[List[Any]]
+    # Frame data is resolved from the in-memory Frame cache by path
+    frame_path: str
+    # All Frames of a multi-Frame request (frame_path is the first one)
+    frame_paths: List[str]
     source_text: str
     source_language: Literal["English", "Japanese"]
     target_language: Literal["English", "Japanese"]
     frame_elements: List[Dict[str, Any]]
     translation_result: Optional[str]
     frame_analysis: Optional[Dict[str, Any]]
+    # Requested mode ("standard", "fast" or "speculative"); set to the path actually taken
+    mode: str
+    # Token usage (and the model that answered) per LLM call, keyed by node name
+    usage: Dict[str, Dict[str, Any]]
+    # Speculative mode: Frame-tagged draft translated alongside the analysis, merged by check_draft
+    draft_translation: Optional[str]
+    draft_usage: Dict[str, Dict[str, Any]]
+    draft_messages: Optional[List[Any]]
+    draft_issues: Optional[List[str]]
+    # Rule-based pre-annotation: {"confidence": ..., "used": ...} (None when disabled)
+    pre_annotation: Optional[Dict[str, Any]]
 
-# Create LLM instance
-def get_llm():
-    import os
-    from dotenv import load_dotenv
-    import sys
-    
-    # Load environment variables
-    load_dotenv()
-    
-    # Get model configuration
-    model_name = os.getenv("DEFAULT_MODEL", "deepseek-chat")
-    
-    # Check if using DeepSeek or OpenAI
-    if "deepseek" in model_name.lower():
+# Normalize a Frame path or a list of Frame paths to a list
+def as_frame_paths(frame_path: Union[str, List[str]]) -> List[str]:
+    frame_paths = [frame_path] if isinstance(frame_path, str) else list(frame_path)
+    if not frame_paths:
+        raise ValueError("At least one Frame is required")
+    return frame_paths
+
+# Merge the element lists of several Frames, tagging each element with its Frame name
+def merge_frame_elements(frames: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    elements = []
+    for frame_data in frames:
+        for element in extract_frame_elements(frame_data):
+            elements.append(dict(element, frame=frame_data.get("frame_name", "")))
+    return elements
+
+# Select the few-shot examples for the source text (one per Frame for multi-Frame requests)
+def select_frame_examples(frame_paths: List[str], source_text: str, source_language: str) -> List[Dict[str, Any]]:
+    if len(frame_paths) == 1:
+        return select_examples(frame_paths[0], source_text, source_language)
+    examples = []
+    for frame_path in frame_paths:
+        frame_name = load_frame_data(frame_path).get("frame_name", "")
+        for example in select_examples(frame_path, source_text, source_language, k=1):
+            examples.append(dict(example, annotation={frame_name: example["annotation"]}))
+    return examples
+
+# Check that a Frame analysis only uses known Frame element names
+# (multi-Frame analyses are keyed by Frame name first)
+def is_valid_frame_analysis(frame_analysis: Any, frame_elements: List[Dict[str, Any]]) -> bool:
+    return not validate_frame_analysis(frame_analysis, frame_elements)
+
+# Parse a (possibly truncated or fenced) JSON object from an LLM response
+def parse_llm_json(content: str) -> Optional[Dict[str, Any]]:
+    parsed = parse_json_object(content)
+    return parsed if parsed is not None else parse_json_object(content, partial=True)
+
+# Call the stage's models in turn through the provider-call governor (rate limits, adaptive
+# concurrency, timeouts, hedging), returning the response and the model that produced it
+def invoke_llm(state: AgentState, stage: str, messages: List[Any], json_mode: bool = False) -> Tuple[Any, str]:
+    prefix = messages[0].content if isinstance(messages[0], SystemMessage) else None
+    models = route_models(stage, state["source_text"], prefix)
+    for index, model in enumerate(models):
+        # Do not start another model call for a client that went away
+        raise_if_cancelled()
         try:
-            # Use the official import pattern for DeepSeek
-            try:
-                from langchain_deepseek import ChatDeepSeek
-                print(f"Successfully imported ChatDeepSeek from langchain_deepseek")
-                return ChatDeepSeek(
-                    model=model_name,
-                    temperature=0.1
-                )
-            except (ImportError, AttributeError) as e:
-                print(f"Import attempt failed: {str(e)}")
-                print(f"Installed packages in site-packages directory:")
-                import os, sys
-                site_packages = next((p for p in sys.path if p.endswith('site-packages')), None)
-                if site_packages:
-                    for pkg in os.listdir(site_packages):
-                        if 'deepseek' in pkg.lower() or 'langchain' in pkg.lower():
-                            print(f"  - {pkg}")
-                
-                raise ImportError(f"Could not import ChatDeepSeek from langchain_deepseek. Please install the package using: pip install langchain-deepseek. Error: {str(e)}")
-        except ImportError as e:
-            error_message = f"""
-ERROR: DeepSeek integration not found. Please install the required packages:
-
-    pip install langchain-deepseek
-    pip install langchain-community
-
-If you've already installed these packages and still see this error, 
-you may need to check your Python environment or try:
-
-    pip install --upgrade langchain-deepseek langchain-community
-
-Error details: {str(e)}
-"""
-            print(error_message, file=sys.stderr)
-            raise ImportError(error_message)
-    else:
-        # Using OpenAI
-        openai_api_key = os.getenv("OPENAI_API_KEY")
-        if not openai_api_key:
-            raise ValueError(
-                "OpenAI API key not found. Please set OPENAI_API_KEY in your .env file, "
-                "or change DEFAULT_MODEL to a DeepSeek model."
-            )
-        return ChatOpenAI(
-            model=model_name,
-            temperature=0.1
-        )
+            llm = with_json_mode(get_llm(model)) if json_mode else get_llm(model)
+            response = get_governor().call(model, stage, lambda llm=llm: llm.invoke(messages))
+        except Exception:
+            if index == len(models) - 1:
+                raise
+            # Fall back to the next model of the chain
+            metrics.LLM_FALLBACKS.inc(stage=stage, model=model)
+            continue
+        if prefix is not None:
+            mark_prefix_warm(model, prefix)
+        return response, model
 
-# Create system prompt
-def create_system_prompt(frame_data: Dict[str, Any]) -> str:
-    frame_name = frame_data.get("frame_name", "")
-    frame_description = frame_data.get("description", "")
-    
-    system_prompt = f"""You are a professional translation assistant based on Frame semantic understanding.
-Your task is to perform high-quality translations between Japanese and English while maintaining consistency in the Frame semantic structure.
+# Collect token usage reported by the provider for one LLM call, with the prompt size and cached prefix tokens
+def record_usage(usage: Optional[Dict[str, Dict[str, Any]]], stage: str, response: Any, model: str, messages: Optional[List[Any]] = None) -> Dict[str, Dict[str, Any]]:
+    usage = dict(usage or {})
+    usage_metadata = getattr(response, "usage_metadata", None) or {}
+    response_metadata = getattr(response, "response_metadata", None) or {}
+    token_usage = response_metadata.get("token_usage") or {}
+    # Normalized by LangChain for OpenAI; DeepSeek also reports prompt_cache_hit_tokens
+    cached_input_tokens = (
+        (usage_metadata.get("input_token_details") or {}).get("cache_read")
+        or token_usage.get("prompt_cache_hit_tokens")
+        or (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        or 0
+    )
+    usage[stage] = {
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "output_tokens": usage_metadata.get("output_tokens", 0),
+        "total_tokens": usage_metadata.get("total_tokens", 0),
+        "cached_input_tokens": cached_input_tokens,
+        "model": model
+    }
+    if messages:
+        usage[stage].update(prompt_size(messages))
+    metrics.record_llm_usage(stage, model, usage[stage])
+    return usage
 
-You will work with the following Frame:
-- Frame name: {frame_name}
-- Frame description: {frame_description}
+# Build the static-prefix + dynamic-suffix messages of a stage for this request
+def build_stage_messages(state: AgentState, stage: str, suffix: str) -> List[Any]:
+    return build_messages(
+        stage, state["frame_paths"], state["frame_elements"],
+        state["source_language"], state["target_language"], suffix
+    )
+
+# Ask the model to fix an analysis that failed parsing or validation (sent as a follow-up turn)
+def build_repair_prompt(errors: List[str], frame_elements: List[Dict[str, Any]]) -> str:
+    if is_multi_frame(frame_elements):
+        allowed = "; ".join(
+            f'{frame}: {", ".join(el["name"] for el in frame_elements if el["frame"] == frame)}'
+            for frame in dict.fromkeys(el["frame"] for el in frame_elements)
+        )
+    else:
+        allowed = ", ".join(el["name"] for el in frame_elements)
+    problems = "\n".join(f"- {error}" for error in errors)
+    return f"""Your previous Frame analysis could not be used:
+{problems}
 
-During the translation process, you need to:
-1. Identify Frame elements in the source text
-2. Ensure the same Frame elements are preserved in the translated text
-3. Consider the grammar and cultural aspects of the target language
-4. Provide clear and natural translations
+Allowed Frame element names (plus "lexical_unit"): {allowed}
+Every value must be the corresponding part of the source text as a string.
 
-Remember, your goal is to create a translation that is both accurate and natural, while maintaining the Frame semantic structure of the original text.
+{build_analysis_format(frame_elements)}
+Return only JSON, without any additional explanation.
 """
-    return system_prompt
 
-# Analyze Frame elements in the source text
-def analyze_frame_elements(state: AgentState) -> AgentState:
-    llm = get_llm()
-    frame_data = state["frame_data"]
+# Run the analysis calls, returning (analysis, usage of these calls, prompt/response messages)
+def run_frame_analysis(state: AgentState) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]], List[Any]]:
     source_text = state["source_text"]
     source_language = state["source_language"]
     frame_elements = state["frame_elements"]
     
-    # Get few-shot prompts
-    few_shot_prompts = get_few_shot_prompts(frame_data)
+    # Static prefix per Frame and language, then the examples most relevant to the source text
+    examples = select_frame_examples(state["frame_paths"], source_text, source_language)
+    messages = build_stage_messages(state, "analysis", analysis_suffix(source_language, source_text, examples))
     
-    # Build prompt
-    frame_elements_str = "\n".join([f"- {el['name']}: {el['description']} ({el['type']} element)" for el in frame_elements])
+    # Call LLM for analysis in JSON mode
+    with metrics.stage("analyze_frame.llm"):
+        response, model = invoke_llm(state, "analyze_frame", messages, json_mode=True)
+    usage = record_usage({}, "analyze_frame", response, model, messages)
+    exchange = messages + [AIMessage(content=response.content)]
     
-    identification_example = ""
-    if "identification_prompt" in few_shot_prompts and "expected_response" in few_shot_prompts:
-        identification_example = f"""
-Example:
-Question: {few_shot_prompts['identification_prompt']}
-Answer: {json.dumps(few_shot_prompts['expected_response'], ensure_ascii=False, indent=2)}
-"""
+    # Parse and validate against the Frame element names
+    with metrics.stage("analyze_frame.parse"):
+        frame_analysis = parse_llm_json(response.content)
+        errors = validate_frame_analysis(frame_analysis, frame_elements)
     
-    prompt = f"""Please analyze the following {source_language} text and identify the Frame elements.
-
-Text: {source_text}
+    # One cheap repair call instead of retrying the whole request; continuing the
+    # conversation keeps the whole first call as a cacheable prefix
+    if errors:
+        repair_messages = exchange + [HumanMessage(content=build_repair_prompt(errors, frame_elements))]
+        with metrics.stage("analyze_frame.repair"):
+            repair_response, model = invoke_llm(state, "analyze_frame_repair", repair_messages, json_mode=True)
+        usage = record_usage(usage, "analyze_frame_repair", repair_response, model, repair_messages)
+        exchange = repair_messages + [AIMessage(content=repair_response.content)]
+        repaired = parse_llm_json(repair_response.content)
+        if not validate_frame_analysis(repaired, frame_elements) or frame_analysis is None:
+            frame_analysis = repaired
+    
+    if frame_analysis is None:
+        frame_analysis = {"error": "Unable to parse analysis result", "raw_response": response.content}
+    
+    return frame_analysis, usage, exchange
 
-Frame elements:
-{frame_elements_str}
+# Analyze Frame elements in the source text
+def analyze_frame_elements(state: AgentState) -> AgentState:
+    # A confident rule-based annotation replaces the LLM call
+    if pre_annotator.is_enabled():
+        with metrics.stage("analyze_frame.pre_annotate"):
+            analysis, confidence = pre_annotator.pre_annotate(state["frame_paths"], state["source_text"], state["source_language"])
+        used = analysis is not None and confidence >= pre_annotator.get_confidence_threshold()
+        metrics.PRE_ANNOTATIONS.inc(result="used" if used else "escalated")
+        pre_annotation = {"confidence": round(confidence, 3), "used": used}
+        if used:
+            return {"frame_analysis": analysis, "pre_annotation": pre_annotation}
+    else:
+        pre_annotation = None
+    
+    # Concurrent requests for the same text and Frames (e.g. other target languages) share one analysis
+    key = (
+        state["source_text"],
+        state["source_language"],
+        tuple(os.path.abspath(path) for path in state["frame_paths"]),
+        get_model_config_id(),
+        PROMPT_VERSION
+    )
+    start = time.perf_counter()
+    try:
+        (frame_analysis, call_usage, exchange), shared = analysis_flights.do(key, lambda: run_frame_analysis(state))
+    except Cancelled:
+        # Another request's client went away while we waited for its analysis
+        raise_if_cancelled()
+        (frame_analysis, call_usage, exchange), shared = run_frame_analysis(state), False
+    
+    # Return state updates; a shared analysis cost this request no tokens
+    usage = dict(state.get("usage") or {})
+    if shared:
+        metrics.record_timing("analyze_frame.coalesced", time.perf_counter() - start)
+    else:
+        usage.update(call_usage)
+    updates = {"frame_analysis": frame_analysis, "usage": usage, "pre_annotation": pre_annotation}
+    if state.get("messages") is not None:
+        updates["messages"] = state["messages"] + exchange
+    
+    return updates
 
-{identification_example}
+# Build the translation messages from the Frame analysis, optionally with a draft to correct
+def build_translation_messages(state: AgentState, draft_section: str = "") -> List[Any]:
+    return build_stage_messages(
+        state, "translation", translation_suffix(state["source_text"], state["frame_analysis"], draft_section)
+    )
 
-Please return the analysis results in JSON format, including each identified Frame element and its corresponding part in the text.
-Return only JSON, without any additional explanation.
-"""
+# Call the model for a plain-text translation (streamed token by token when the graph is streamed)
+def run_translation_call(state: AgentState, stage: str, messages: List[Any]) -> AgentState:
+    with metrics.stage(f"{stage}.llm"):
+        response, model = invoke_llm(state, stage, messages)
     
-    # Call LLM for analysis
-    response = llm.invoke([HumanMessage(content=prompt)])
+    # Return state updates
+    updates = {"translation_result": response.content.strip(), "usage": record_usage(state.get("usage"), stage, response, model, messages)}
+    if state.get("messages") is not None:
+        updates["messages"] = state["messages"] + messages + [AIMessage(content=response.content)]
     
-    # Parse JSON response
-    try:
-        frame_analysis = json.loads(response.content)
-    except:
-        # If parsing fails, try to extract JSON part
-        import re
-        json_match = re.search(r'```json\n(.*?)\n```', response.content, re.DOTALL)
-        if json_match:
-            frame_analysis = json.loads(json_match.group(1))
-        else:
-            frame_analysis = {"error": "Unable to parse analysis result", "raw_response": response.content}
-    
-    # Update state
-    new_state = state.copy()
-    new_state["frame_analysis"] = frame_analysis
-    new_state["messages"] = state["messages"] + [
-        HumanMessage(content=prompt),
-        AIMessage(content=response.content)
-    ]
-    
-    return new_state
+    return updates
 
 # Perform translation
 def translate_text(state: AgentState) -> AgentState:
-    llm = get_llm()
-    frame_data = state["frame_data"]
-    source_text = state["source_text"]
-    source_language = state["source_language"]
-    target_language = state["target_language"]
-    frame_analysis = state["frame_analysis"]
-    
-    # Get target language specific information
-    target_language_code = "Japanese" if target_language == "Japanese" else "English"
-    language_info = get_language_specific_info(frame_data, target_language_code)
-    
-    # Get few-shot translation examples
-    few_shot_prompts = get_few_shot_prompts(frame_data)
-    translation_example = ""
-    if "translation_prompt" in few_shot_prompts and "expected_translation" in few_shot_prompts:
-        # Format the expected translation to avoid direct JSON output
-        expected_translations = few_shot_prompts['expected_translation']
-        formatted_examples = []
-        
-        for lang, translation in expected_translations.items():
-            formatted_examples.append(f"{lang}: {translation}")
-        
-        translation_example = f"""
-Translation example:
-Original: {few_shot_prompts['translation_prompt']}
-Translation examples:
-{chr(10).join(formatted_examples)}
-"""
-    
-    # Build language specific information
-    language_specific_info = ""
-    if language_info:
-        lexical_units = language_info.get("lexical_units", [])
-        grammatical_notes = language_info.get("grammatical_notes", "")
-        cultural_notes = language_info.get("cultural_notes", "")
-        
-        language_specific_info = f"""
-Target language ({target_language}) specific information:
-- Lexical units: {', '.join(lexical_units) if lexical_units else 'No specific information'}
-- Grammatical notes: {grammatical_notes if grammatical_notes else 'No specific information'}
-- Cultural notes: {cultural_notes if cultural_notes else 'No specific information'}
-"""
+    return run_translation_call(state, "translate", build_translation_messages(state))
+
+# Translate without waiting for the analysis, marking Frame elements in the output (speculative mode)
+def draft_translate(state: AgentState) -> AgentState:
+    messages = build_stage_messages(state, "draft", draft_suffix(state["source_text"]))
     
-    # Build prompt
-    frame_analysis_str = json.dumps(frame_analysis, ensure_ascii=False, indent=2)
+    with metrics.stage("draft_translate.llm"):
+        response, model = invoke_llm(state, "draft_translate", messages)
     
-    prompt = f"""Please translate the following {source_language} text to {target_language}, while maintaining consistency of Frame elements.
+    # Kept apart from usage/messages, which the analysis branch updates in the same step
+    updates = {
+        "draft_translation": response.content.strip(),
+        "draft_usage": record_usage({}, "draft_translate", response, model, messages)
+    }
+    if state.get("messages") is not None:
+        updates["draft_messages"] = messages + [AIMessage(content=response.content)]
+    return updates
 
-Source text: {source_text}
+# Problems of a tagged draft relative to the Frame analysis (empty if the draft can be used as is)
+def find_draft_issues(draft: Optional[str], frame_analysis: Any) -> List[str]:
+    if not draft:
+        return ["the draft translation is empty"]
+    if not isinstance(frame_analysis, dict) or "error" in frame_analysis:
+        # Nothing to check against; the draft is as good as a translation without analysis
+        return []
+    
+    # Multi-Frame analyses nest the elements under Frame names
+    spans = {}
+    for key, value in frame_analysis.items():
+        spans.update(value if isinstance(value, dict) else {key: value})
+    tagged = set(_DRAFT_TAG_RE.findall(draft))
+    draft_digits = _NUMBER_SEPARATOR_RE.sub("", draft)
+    
+    issues = []
+    for element, span in spans.items():
+        if element == "lexical_unit":
+            continue
+        if element not in tagged:
+            issues.append(f'the Frame element "{element}" ({span}) is not marked in the draft')
+            continue
+        # Numbers carry over unchanged between English and Japanese
+        for number in _NUMBER_RE.findall(str(span)):
+            if _NUMBER_SEPARATOR_RE.sub("", number) not in draft_digits:
+                issues.append(f'the number {number} of "{element}" is missing from the draft')
+    return issues
 
-Frame analysis results:
-{frame_analysis_str}
+# Remove the element tags of a draft; a space is kept only between two ASCII words ("John bought", not "ジョンは")
+def strip_draft_tags(draft: str, element_names: set) -> str:
+    def replace(match):
+        if match.group(1) not in element_names:
+            return match.group(0)
+        before = draft[match.start() - 1] if match.start() else ""
+        after = draft[match.end()] if match.end() < len(draft) else ""
+        if before.isascii() and after.isascii() and before.strip() and after.strip() and after not in ",.;:!?)]}":
+            return " "
+        return ""
+    return _DRAFT_TAG_SPAN_RE.sub(replace, draft).strip()
 
-{language_specific_info}
+# Accept the speculative draft when it covers the analysis, otherwise hand over to refine
+def check_draft(state: AgentState) -> AgentState:
+    usage = dict(state.get("usage") or {})
+    usage.update(state.get("draft_usage") or {})
+    
+    with metrics.stage("check_draft"):
+        issues = find_draft_issues(state.get("draft_translation"), state.get("frame_analysis"))
+    
+    updates = {"usage": usage, "draft_issues": issues}
+    if state.get("messages") is not None:
+        updates["messages"] = state["messages"] + (state.get("draft_messages") or [])
+    if issues:
+        updates["mode"] = "speculative_refined"
+    else:
+        element_names = {element["name"] for element in state["frame_elements"]}
+        updates["translation_result"] = strip_draft_tags(state["draft_translation"], element_names)
+        updates["mode"] = "speculative"
+    return updates
 
-{translation_example}
+# Correct a rejected speculative draft using the Frame analysis
+def refine_translation(state: AgentState) -> AgentState:
+    issues = "\n".join(f"- {issue}" for issue in state.get("draft_issues") or [])
+    draft_section = f"""
+A draft translation made before the Frame analysis was known has these problems:
+{issues}
 
-Please provide an accurate and natural translation, ensuring all Frame elements from the original text are preserved. Also, follow the grammar and cultural conventions of the target language.
+Draft translation (Frame elements marked in square brackets):
+{state.get("draft_translation") or ""}
 
-IMPORTANT: Return ONLY the translation result as plain text, without any JSON formatting, without any additional explanation, and without annotations or markup.
+Correct the draft so that every Frame element in the analysis results is preserved.
 """
+    return run_translation_call(state, "refine", build_translation_messages(state, draft_section))
+
+# Analyze and translate in a single structured-output call (fast mode)
+def fast_translate(state: AgentState) -> AgentState:
+    source_text = state["source_text"]
+    frame_elements = state["frame_elements"]
     
-    # Call LLM for translation
-    response = llm.invoke([HumanMessage(content=prompt)])
+    examples = select_frame_examples(state["frame_paths"], source_text, state["source_language"])
+    messages = build_stage_messages(state, "fast", fast_suffix(source_text, examples))
     
-    # Update state
-    new_state = state.copy()
-    new_state["translation_result"] = response.content.strip()
-    new_state["messages"] = state["messages"] + [
-        HumanMessage(content=prompt),
-        AIMessage(content=response.content)
-    ]
+    # JSON mode keeps the output machine-readable
+    with metrics.stage("fast_translate.llm"):
+        response, model = invoke_llm(state, "fast_translate", messages, json_mode=True)
+    usage = record_usage(state.get("usage"), "fast_translate", response, model, messages)
     
-    return new_state
+    with metrics.stage("fast_translate.parse"):
+        parsed = parse_llm_json(response.content)
+    frame_analysis = parsed.get("frame_analysis") if isinstance(parsed, dict) else None
+    translation = parsed.get("translation") if isinstance(parsed, dict) else None
+    
+    updates = {"usage": usage}
+    if is_valid_frame_analysis(frame_analysis, frame_elements) and isinstance(translation, str) and translation.strip():
+        updates["frame_analysis"] = frame_analysis
+        updates["translation_result"] = translation.strip()
+        updates["mode"] = "fast"
+    else:
+        # Validation failed, the two-step path runs next
+        updates["mode"] = "fast_fallback"
+    
+    if state.get("messages") is not None:
+        updates["messages"] = state["messages"] + messages + [AIMessage(content=response.content)]
+    
+    return updates
+
+# Choose the first node(s) for the requested mode
+def route_entry(state: AgentState) -> Union[str, List[str]]:
+    if state.get("mode") == "fast":
+        return "fast_translate"
+    if state.get("mode") == "speculative":
+        # The draft runs in parallel with the analysis; check_draft joins them
+        return ["analyze_frame", "draft_translate"]
+    return "analyze_frame"
+
+# Translate after the analysis, unless a speculative draft is waiting for it
+def route_after_analysis(state: AgentState) -> str:
+    return END if state.get("mode") == "speculative" else "translate"
+
+# Finish with an accepted draft, refine a rejected one
+def route_after_check(state: AgentState) -> str:
+    return END if state.get("mode") == "speculative" else "refine"
+
+# Fall back to the two-step path when the fast result was rejected
+def route_after_fast(state: AgentState) -> str:
+    return END if state.get("mode") == "fast" else "analyze_frame"
 
 # Create workflow graph
-def create_workflow(frame_path: str):
-    # Load Frame data
-    frame_data = load_frame_data(frame_path)
-    frame_elements = extract_frame_elements(frame_data)
-    
+def create_workflow():
     # Create workflow graph
     workflow = StateGraph(AgentState)
     
     # Add nodes
+    workflow.add_node("fast_translate", fast_translate)
     workflow.add_node("analyze_frame", analyze_frame_elements)
     workflow.add_node("translate", translate_text)
+    workflow.add_node("draft_translate", draft_translate)
+    workflow.add_node("check_draft", check_draft)
+    workflow.add_node("refine", refine_translation)
     
     # Set edges
-    workflow.add_edge("analyze_frame", "translate")
+    workflow.add_conditional_edges("fast_translate", route_after_fast, ["analyze_frame", END])
+    workflow.add_conditional_edges("analyze_frame", route_after_analysis, ["translate", END])
     workflow.add_edge("translate", END)
+    # Speculative mode: wait for both the analysis and the draft
+    workflow.add_edge(["analyze_frame", "draft_translate"], "check_draft")
+    workflow.add_conditional_edges("check_draft", route_after_check, ["refine", END])
+    workflow.add_edge("refine", END)
     
     # Set entry point
-    workflow.set_entry_point("analyze_frame")
+    workflow.set_conditional_entry_point(route_entry, ["fast_translate", "analyze_frame", "draft_translate"])
     
     # Compile workflow
     return workflow.compile()
 
-# Execute translation
-def run_translation(
+# Total token usage across LLM calls, keeping the per-stage breakdown
+def summarize_usage(usage: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    totals = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_input_tokens": 0, "prompt_chars": 0}
+    for stage_usage in usage.values():
+        for key in totals:
+            totals[key] += stage_usage.get(key, 0)
+    return dict(totals, llm_calls=len(usage), stages=usage)
+
+# Compiled workflow shared by all requests (the graph does not depend on the Frame)
+_workflow = None
+_workflow_lock = threading.Lock()
+
+def get_workflow():
+    global _workflow
+    if _workflow is None:
+        with _workflow_lock:
+            if _workflow is None:
+                with metrics.stage("graph_compile"):
+                    _workflow = create_workflow()
+    return _workflow
+
+# Create the initial graph state for one translation
+def build_initial_state(
     source_text: str,
-    source_language: Literal["English", "Japanese"],
-    target_language: Literal["English", "Japanese"],
-    frame_path: str
+    source_language: str,
+    target_language: str,
+    frame_path: Union[str, List[str]],
+    include_messages: bool = False,
+    mode: str = "standard"
 ) -> Dict[str, Any]:
-    # Load Frame data
-    frame_data = load_frame_data(frame_path)
-    frame_elements = extract_frame_elements(frame_data)
+    if mode not in TRANSLATION_MODES:
+        raise ValueError(f"Unknown translation mode '{mode}'")
+    frame_paths = as_frame_paths(frame_path)
     
-    # Create workflow
-    app = create_workflow(frame_path)
+    # Load Frame data (served from the in-memory Frame cache)
+    with metrics.stage("frame_load"):
+        frames = [load_frame_data(path) for path in frame_paths]
+        frame_elements = extract_frame_elements(frames[0]) if len(frames) == 1 else merge_frame_elements(frames)
     
-    # Create initial state
-    initial_state = {
-        "messages": [SystemMessage(content=create_system_prompt(frame_data))],
-        "frame_data": frame_data,
+    return {
+        "messages": [] if include_messages else None,
+        "frame_path": frame_paths[0],
+        "frame_paths": frame_paths,
         "source_text": source_text,
         "source_language": source_language,
         "target_language": target_language,
         "frame_elements": frame_elements,
         "translation_result": None,
-        "frame_analysis": None
+        "frame_analysis": None,
+        "mode": mode,
+        "usage": {},
+        "draft_translation": None,
+        "draft_usage": {},
+        "draft_messages": None,
+        "draft_issues": None,
+        "pre_annotation": None
+    }
+
+# Build the public result from the final graph state
+def build_result(state: Dict[str, Any], include_messages: bool = False) -> Dict[str, Any]:
+    output = {
+        "source_text": state["source_text"],
+        "source_language": state["source_language"],
+        "target_language": state["target_language"],
+        "translation": state["translation_result"],
+        "frame_analysis": state["frame_analysis"],
+        "mode": state["mode"],
+        "usage": summarize_usage(state["usage"]),
+        # Model that answered each LLM call, keyed by stage
+        "models": {stage: stage_usage.get("model") for stage, stage_usage in state["usage"].items()}
     }
+    if state.get("pre_annotation") is not None:
+        output["pre_annotation"] = state["pre_annotation"]
+    if include_messages:
+        output["messages"] = state["messages"]
+    return output
+
+# Execute translation
+def run_translation(
+    source_text: str,
+    source_language: Literal["English", "Japanese"],
+    target_language: Literal["English", "Japanese"],
+    frame_path: Union[str, List[str]],
+    include_messages: bool = False,
+    mode: str = "standard"
+) -> Dict[str, Any]:
+    # Create initial state
+    initial_state = build_initial_state(source_text, source_language, target_language, frame_path, include_messages, mode)
     
     # Execute workflow
-    result = app.invoke(initial_state)
+    workflow = get_workflow()
+    with metrics.stage("workflow"):
+        result = workflow.invoke(initial_state)
     
     # Return results
+    return build_result(result, include_messages)
+
+# Execute translation, yielding progress events as they happen
+def stream_translation(
+    source_text: str,
+    source_language: Literal["English", "Japanese"],
+    target_language: Literal["English", "Japanese"],
+    frame_path: Union[str, List[str]],
+    mode: str = "standard"
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Stream a translation as (event, data) tuples
+    
+    Events:
+        analysis: {"frame_analysis": ...} as soon as the Frame analysis is known
+        token: {"text": ...} for each translation chunk produced by the model
+        done: the same result run_translation returns
+    """
+    state = build_initial_state(source_text, source_language, target_language, frame_path, False, mode)
+    workflow = get_workflow()
+    
+    with metrics.stage("workflow"):
+        yield from _stream_workflow(workflow, state)
+    
+    yield "done", build_result(state)
+
+# Translate graph stream chunks into analysis/token events, updating state in place
+def _stream_workflow(workflow: Any, state: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    streamed_tokens = False
+    for stream_mode, chunk in workflow.stream(state, stream_mode=["updates", "messages"]):
+        if stream_mode == "messages":
+            message_chunk, metadata = chunk
+            # Only the translate and refine nodes produce plain-text output worth streaming
+            if metadata.get("langgraph_node") in ("translate", "refine") and message_chunk.content:
+                streamed_tokens = True
+                yield "token", {"text": message_chunk.content}
+            continue
+        
+        for node, updates in chunk.items():
+            if not updates:
+                continue
+            state.update(updates)
+            if updates.get("frame_analysis") is not None:
+                yield "analysis", {"frame_analysis": updates["frame_analysis"]}
+            if node in ("fast_translate", "check_draft") and updates.get("translation_result"):
+                yield "token", {"text": updates["translation_result"]}
+            elif node in ("translate", "refine") and not streamed_tokens:
+                # The model did not stream, send the whole translation at once
+                yield "token", {"text": updates["translation_result"]}
+
+# Execute many translations with bounded concurrency
+def run_batch_translation(
+    items: List[Dict[str, Any]],
+    max_concurrency: Optional[int] = None,
+    translate_fn: Optional[Callable[..., Dict[str, Any]]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Translate many items, running at most max_concurrency pipelines at once
+    
+    Identical items are translated once and their result is shared.
+    
+    Args:
+        items: Keyword arguments for translate_fn, one dict per item
+        max_concurrency: Concurrent pipelines (defaults to BATCH_MAX_CONCURRENCY)
+        translate_fn: Function executing one item (defaults to run_translation)
+        
+    Returns:
+        One {"status": "success", "data": ...} or {"status": "error", "message": ...}
+        dict per item, in input order
+    """
+    translate_fn = translate_fn or run_translation
+    max_concurrency = max_concurrency or BATCH_MAX_CONCURRENCY
+    
+    # Deduplicate identical inputs
+    unique_items = {}
+    item_keys = []
+    for item in items:
+        key = json.dumps(item, sort_keys=True, default=str)
+        unique_items.setdefault(key, item)
+        item_keys.append(key)
+    
+    def execute(item):
+        try:
+            return {"status": "success", "data": translate_fn(**item)}
+        except Exception as e:
+            return {"status": "error", "message": f"Error during translation: {str(e)}"}
+    
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(unique_items)) or 1) as executor:
+        futures = {key: executor.submit(execute, item) for key, item in unique_items.items()}
+        unique_results = {key: future.result() for key, future in futures.items()}
+    
+    results = []
+    seen = set()
+    for key in item_keys:
+        result = dict(unique_results[key])
+        if key in seen:
+            result["deduplicated"] = True
+        seen.add(key)
+        results.append(result)
+    return results
+
+# Assemble a document result from per-segment results
+def build_document_result(
+    source_text: str,
+    source_language: str,
+    target_language: str,
+    segments: List[Dict[str, Any]],
+    separators: List[str],
+    segment_results: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    segment_outputs = []
+    translations = []
+    usage = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_input_tokens": 0, "llm_calls": 0}
+    for segment, segment_result in zip(segments, segment_results):
+        output = {"index": segment["index"], "paragraph": segment["paragraph"], "source_text": segment["text"]}
+        if segment_result["status"] == "success":
+            data = segment_result["data"]
+            output.update(status="success", translation=data["translation"], frame_analysis=data["frame_analysis"])
+            if "cache" in data:
+                output["cache"] = data["cache"]
+            # Deduplicated segments share one pipeline run, count its tokens once
+            if not segment_result.get("deduplicated"):
+                for key in usage:
+                    usage[key] += data.get("usage", {}).get(key, 0)
+            translations.append(data["translation"] or "")
+        else:
+            # Keep the source sentence in place so the layout stays intact
+            output.update(status="error", message=segment_result["message"])
+            translations.append(segment["text"])
+        segment_outputs.append(output)
+    
     return {
         "source_text": source_text,
         "source_language": source_language,
         "target_language": target_language,
-        "translation": result["translation_result"],
-        "frame_analysis": result["frame_analysis"]
+        "translation": reassemble(translations, segments, separators, target_language),
+        "frame_analysis": merge_frame_analyses([o.get("frame_analysis") for o in segment_outputs]),
+        "segments": segment_outputs,
+        "failed_segments": sum(1 for o in segment_outputs if o["status"] == "error"),
+        "usage": usage
     }
+
+# Translate a multi-sentence document segment by segment
+def run_document_translation(
+    source_text: str,
+    source_language: Literal["English", "Japanese"],
+    target_language: Literal["English", "Japanese"],
+    frame_path: Union[str, List[str]],
+    mode: str = "standard",
+    max_concurrency: Optional[int] = None,
+    translate_fn: Optional[Callable[..., Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Segment a document into sentences, translate them concurrently and reassemble
+    
+    Latency follows the slowest segment rather than the document length, and
+    repeated sentences are translated once.
+    
+    Args:
+        source_text: Document to translate
+        source_language: Source language
+        target_language: Target language
+        frame_path: Path to the Frame JSON file, or a list of paths for multi-Frame analysis
+        mode: Translation mode for every segment
+        max_concurrency: Concurrent segment pipelines (defaults to BATCH_MAX_CONCURRENCY)
+        translate_fn: Function translating one segment (defaults to run_translation)
+        
+    Returns:
+        Document result with the reassembled translation, the merged Frame
+        analysis and per-segment results
+    """
+    segments, separators = segment_text(source_text)
+    items = [
+        {
+            "source_text": segment["text"],
+            "source_language": source_language,
+            "target_language": target_language,
+            "frame_path": frame_path,
+            "mode": mode
+        }
+        for segment in segments
+    ]
+    segment_results = run_batch_translation(items, max_concurrency=max_concurrency, translate_fn=translate_fn)
+    return build_document_result(source_text, source_language, target_language, segments, separators, segment_results)
@@ -1,9 +1,18 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 import os
 import json
+import functools
+import threading
+import time
 from dotenv import load_dotenv
-from backend.agent import run_translation
-from backend.utils import load_frame_data, list_available_frames, get_frame_by_name
+from backend.translation_memory import translate_with_memory, stream_with_memory, get_translation_memory
+from backend.utils import get_frame_by_name
+from backend.frame_registry import DEFAULT_FRAME_PATH, get_frame_registry
+from backend.frame_detection import detect_frames
+from backend.llm import warm_up_llm_clients
+from backend.cancellation import iterate_cancellable
+from backend.jobs import get_job_manager
+from backend import metrics
 
 # Load environment variables
 load_dotenv()
@@ -12,23 +21,76 @@ app = Flask(__name__,
             static_folder='../frontend/static',
             template_folder='../frontend/templates')
 
-# Default Frame path
-DEFAULT_FRAME_PATH = 'frames/commerce-buy-frame.json'
+# Maximum number of items accepted by /api/translate/batch
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '1000'))
+
+# Seconds between SSE heartbeats while a streamed translation waits for the model;
+# writing them is how a client that went away is noticed
+SSE_HEARTBEAT_INTERVAL = float(os.getenv('SSE_HEARTBEAT_INTERVAL', '1.0'))
+
+# Maximum number of items accepted by /api/jobs
+JOBS_MAX_ITEMS = int(os.getenv('JOBS_MAX_ITEMS', '100000'))
+
+@app.before_request
+def start_request_metrics():
+    """Start timing the request and collecting its stage timings"""
+    g.request_start = time.perf_counter()
+    g.timings = metrics.start_request_timings()
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request duration and status by route"""
+    start = g.get('request_start')
+    if start is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.HTTP_SECONDS.observe(time.perf_counter() - start, route=route, method=request.method)
+        metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=response.status_code)
+    return response
+
+def build_timings():
+    """Per-stage timings of the current request in milliseconds"""
+    stages = {name: round(seconds * 1000, 2) for name, seconds in g.timings.items()}
+    return {
+        'unit': 'ms',
+        'total': round((time.perf_counter() - g.request_start) * 1000, 2),
+        'stages': stages
+    }
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Expose metrics in the Prometheus text format"""
+    return Response(metrics.render_metrics(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
     """Render homepage"""
     return render_template('index.html')
 
+def cached_json_response(body, etag):
+    """Build a JSON response that clients revalidate with If-None-Match"""
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/api/frames', methods=['GET'])
 def get_available_frames():
     """Get list of available frames"""
     try:
-        frames = list_available_frames()
+        body, etag = get_frame_registry().frames_payload()
+        return cached_json_response(body, etag)
+    except Exception as e:
         return jsonify({
-            'status': 'success',
-            'data': frames
-        })
+            'status': 'error',
+            'message': f'Unable to list frames: {str(e)}'
+        }), 500
+
+@app.route('/api/bootstrap', methods=['GET'])
+def get_bootstrap():
+    """Get the frame list and the default frame's information in one response"""
+    try:
+        body, etag = get_frame_registry().bootstrap_payload()
+        return cached_json_response(body, etag)
     except Exception as e:
         return jsonify({
             'status': 'error',
@@ -45,104 +107,264 @@ def get_frame_info():
         if frame_name:
             # Get frame by name
             try:
-                frame_data, frame_path = get_frame_by_name(frame_name)
+                body, etag = get_frame_registry().frame_info_payload(frame_name=frame_name)
             except ValueError as e:
                 return jsonify({
                     'status': 'error',
                     'message': str(e)
                 }), 404
-        elif frame_path:
-            # Get frame by path
-            frame_data = load_frame_data(frame_path)
         else:
-            # Use default frame
-            frame_data = load_frame_data(DEFAULT_FRAME_PATH)
-            frame_path = DEFAULT_FRAME_PATH
+            # Get frame by path, or use default frame
+            body, etag = get_frame_registry().frame_info_payload(frame_path=frame_path or DEFAULT_FRAME_PATH)
             
-        return jsonify({
-            'status': 'success',
-            'data': {
-                'frame_name': frame_data.get('frame_name', ''),
-                'frame_id': frame_data.get('frame_id', ''),
-                'description': frame_data.get('description', ''),
-                'lexical_units': [lu.get('lemma', '') for lu in frame_data.get('lexical_units', [])],
-                'core_elements': [
-                    {'name': el.get('name', ''), 'description': el.get('description', '')}
-                    for el in frame_data.get('frame_elements', {}).get('core_elements', [])
-                ],
-                'non_core_elements': [
-                    {'name': el.get('name', ''), 'description': el.get('description', '')}
-                    for el in frame_data.get('frame_elements', {}).get('non_core_elements', [])
-                ],
-                'path': frame_path
-            }
-        })
+        return cached_json_response(body, etag)
     except Exception as e:
         return jsonify({
             'status': 'error',
             'message': f'Unable to load Frame data: {str(e)}'
         }), 500
 
-@app.route('/api/translate', methods=['POST'])
-def translate():
-    """Perform translation"""
-    data = request.json
+def detect_frame_path(source_text, source_language):
+    """
+    Choose the Frame for a text from the lexical units it contains
     
-    if not data:
-        return jsonify({
-            'status': 'error',
-            'message': 'Request data is empty'
-        }), 400
+    Args:
+        source_text: Text to translate
+        source_language: Language of the text
+        
+    Returns:
+        Tuple of (frame path, detection report); the default Frame is used when
+        no lexical unit matches
+    """
+    with metrics.stage('frame_detection'):
+        candidates = detect_frames(source_text, source_language)
+    
+    report = {
+        'candidates': [
+            {'frame_name': c['frame_name'], 'score': c['score'], 'matches': [m['text'] for m in c['matches']]}
+            for c in candidates
+        ],
+        'fallback': not candidates
+    }
+    if not candidates:
+        return DEFAULT_FRAME_PATH, dict(report, frame_name=None)
+    return candidates[0]['path'], dict(report, frame_name=candidates[0]['frame_name'])
+
+def parse_translation_request(data, defaults=None):
+    """
+    Validate the parameters of a single translation request
+    
+    Args:
+        data: Request parameters
+        defaults: Fallback values for parameters missing from data (used by batch items)
+        
+    Returns:
+        Tuple of (parameters, error) where error is (message, status code) or None.
+        When the Frame is detected automatically (frame, frame_name or frame_path
+        set to "auto"), the detection report is stored in g.frame_detection.
+    """
+    from backend.agent import TRANSLATION_MODES
+    
+    if defaults:
+        data = dict(defaults, **data)
     
     source_text = data.get('source_text', '')
     source_language = data.get('source_language', '')
     target_language = data.get('target_language', '')
     frame_path = data.get('frame_path')
-    frame_name = data.get('frame_name')
+    frame_name = data.get('frame_name') or data.get('frame')
+    # Several Frames are analyzed together: "frames": [name, ...] (or a list in frame_name/frame_path)
+    frame_names = data.get('frames')
+    if isinstance(frame_name, list):
+        frame_names, frame_name = frame_name, None
+    fuzzy_threshold = data.get('fuzzy_threshold')
+    mode = data.get('mode') or 'standard'
+    auto_frame = 'auto' in (frame_name, frame_path)
     
-    # Determine which frame to use
-    if frame_name:
+    # Determine which frame to use (automatic detection runs once the text is validated)
+    if auto_frame:
+        frame_path = None
+    elif frame_names is not None:
+        if not isinstance(frame_names, list) or not frame_names or not all(isinstance(name, str) for name in frame_names):
+            return None, ('frames must be a non-empty list of Frame names', 400)
+        try:
+            frame_path = [get_frame_by_name(name)[1] for name in dict.fromkeys(frame_names)]
+        except ValueError as e:
+            return None, (str(e), 404)
+        if len(frame_path) == 1:
+            frame_path = frame_path[0]
+    elif isinstance(frame_path, list):
+        if not frame_path or not all(isinstance(path, str) for path in frame_path):
+            return None, ('frame_path must be a path or a non-empty list of paths', 400)
+        frame_path = list(dict.fromkeys(frame_path))
+        if len(frame_path) == 1:
+            frame_path = frame_path[0]
+    elif frame_name:
         try:
             _, frame_path = get_frame_by_name(frame_name)
         except ValueError as e:
-            return jsonify({
-                'status': 'error',
-                'message': str(e)
-            }), 404
+            return None, (str(e), 404)
     elif not frame_path:
         frame_path = DEFAULT_FRAME_PATH
     
     if not source_text:
+        return None, ('Source text cannot be empty', 400)
+    
+    if source_language not in ['English', 'Japanese']:
+        return None, ('Source language must be English or Japanese', 400)
+    
+    if target_language not in ['English', 'Japanese']:
+        return None, ('Target language must be English or Japanese', 400)
+    
+    if source_language == target_language:
+        return None, ('Source and target languages cannot be the same', 400)
+    
+    if fuzzy_threshold is not None and not (
+        isinstance(fuzzy_threshold, (int, float)) and not isinstance(fuzzy_threshold, bool) and 0 < fuzzy_threshold <= 1
+    ):
+        return None, ('fuzzy_threshold must be a number between 0 and 1', 400)
+    
+    use_cache = data.get('use_cache', True)
+    if not isinstance(use_cache, bool):
+        return None, ('use_cache must be true or false', 400)
+    
+    if mode not in TRANSLATION_MODES:
+        return None, (f"Mode must be one of: {', '.join(TRANSLATION_MODES)}", 400)
+    
+    if auto_frame:
+        frame_path, g.frame_detection = detect_frame_path(source_text, source_language)
+    
+    return {
+        'source_text': source_text,
+        'source_language': source_language,
+        'target_language': target_language,
+        'frame_path': frame_path,
+        'use_cache': use_cache,
+        'fuzzy_threshold': fuzzy_threshold,
+        'mode': mode
+    }, None
+
+@app.route('/api/translate', methods=['POST'])
+def translate():
+    """Perform translation"""
+    data = request.json
+    
+    if not data:
         return jsonify({
             'status': 'error',
-            'message': 'Source text cannot be empty'
+            'message': 'Request data is empty'
         }), 400
     
-    if source_language not in ['English', 'Japanese']:
+    params, error = parse_translation_request(data)
+    if error:
+        return jsonify({
+            'status': 'error',
+            'message': error[0]
+        }), error[1]
+    
+    try:
+        # Execute translation (served from the translation memory when possible)
+        result = translate_with_memory(**params)
+        
+        if g.get('frame_detection') is not None:
+            result['frame_detection'] = g.frame_detection
+        
+        response = {
+            'status': 'success',
+            'data': result
+        }
+        if data.get('include_timings'):
+            response['timings'] = build_timings()
+        return jsonify(response)
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': f'Error during translation: {str(e)}'
+        }), 500
+
+def format_sse(event, data):
+    """Encode one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/translate/stream', methods=['POST'])
+def translate_stream():
+    """Perform translation, streaming the analysis and translation tokens as Server-Sent Events"""
+    data = request.json
+    
+    if not data:
         return jsonify({
             'status': 'error',
-            'message': 'Source language must be English or Japanese'
+            'message': 'Request data is empty'
         }), 400
     
-    if target_language not in ['English', 'Japanese']:
+    params, error = parse_translation_request(data)
+    if error:
         return jsonify({
             'status': 'error',
-            'message': 'Target language must be English or Japanese'
+            'message': error[0]
+        }), error[1]
+    
+    frame_detection = g.get('frame_detection')
+    
+    def generate():
+        # Closing this generator (client disconnect) cancels the translation before its next model call
+        try:
+            for item in iterate_cancellable(lambda: stream_with_memory(**params), SSE_HEARTBEAT_INTERVAL):
+                if item is None:
+                    yield ': keep-alive\n\n'
+                    continue
+                event, event_data = item
+                if event == 'done' and frame_detection is not None:
+                    event_data['frame_detection'] = frame_detection
+                yield format_sse(event, event_data)
+        except Exception as e:
+            yield format_sse('error', {'message': f'Error during translation: {str(e)}'})
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/translate/document', methods=['POST'])
+def translate_document():
+    """Translate a multi-sentence document segment by segment"""
+    data = request.json
+    
+    if not data:
+        return jsonify({
+            'status': 'error',
+            'message': 'Request data is empty'
         }), 400
     
-    if source_language == target_language:
+    params, error = parse_translation_request(data)
+    if error:
         return jsonify({
             'status': 'error',
-            'message': 'Source and target languages cannot be the same'
+            'message': error[0]
+        }), error[1]
+    
+    max_concurrency = data.get('max_concurrency')
+    if max_concurrency is not None and not (isinstance(max_concurrency, int) and max_concurrency > 0):
+        return jsonify({
+            'status': 'error',
+            'message': 'max_concurrency must be a positive integer'
         }), 400
     
     try:
-        # Execute translation
-        result = run_translation(
-            source_text=source_text,
-            source_language=source_language,
-            target_language=target_language,
-            frame_path=frame_path
+        from backend.agent import run_document_translation
+        result = run_document_translation(
+            source_text=params['source_text'],
+            source_language=params['source_language'],
+            target_language=params['target_language'],
+            frame_path=params['frame_path'],
+            mode=params['mode'],
+            max_concurrency=max_concurrency,
+            translate_fn=functools.partial(
+                translate_with_memory,
+                use_cache=params['use_cache'],
+                fuzzy_threshold=params['fuzzy_threshold']
+            )
         )
         
         return jsonify({
@@ -155,6 +377,205 @@ def translate():
             'message': f'Error during translation: {str(e)}'
         }), 500
 
+@app.route('/api/translate/batch', methods=['POST'])
+def translate_batch():
+    """Translate many items with bounded concurrency"""
+    data = request.json
+    
+    if not data or not isinstance(data.get('items'), list) or not data['items']:
+        return jsonify({
+            'status': 'error',
+            'message': 'Request must contain a non-empty items list'
+        }), 400
+    
+    items = data['items']
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({
+            'status': 'error',
+            'message': f'A batch may contain at most {BATCH_MAX_ITEMS} items'
+        }), 400
+    
+    max_concurrency = data.get('max_concurrency')
+    if max_concurrency is not None and not (isinstance(max_concurrency, int) and max_concurrency > 0):
+        return jsonify({
+            'status': 'error',
+            'message': 'max_concurrency must be a positive integer'
+        }), 400
+    
+    # Top-level parameters apply to every item that does not override them
+    defaults = {key: value for key, value in data.items() if key not in ('items', 'max_concurrency')}
+    
+    valid_items = []
+    results = [None] * len(items)
+    for index, item in enumerate(items):
+        params, error = parse_translation_request(item if isinstance(item, dict) else {}, defaults)
+        if error:
+            results[index] = {'index': index, 'status': 'error', 'message': error[0]}
+        else:
+            valid_items.append((index, params))
+    
+    if valid_items:
+        from backend.agent import run_batch_translation
+        batch_results = run_batch_translation(
+            [params for _, params in valid_items],
+            max_concurrency=max_concurrency,
+            translate_fn=translate_with_memory
+        )
+        for (index, _), item_result in zip(valid_items, batch_results):
+            item_result['index'] = index
+            results[index] = item_result
+    
+    return jsonify({
+        'status': 'success',
+        'data': {
+            'results': results,
+            'succeeded': sum(1 for r in results if r['status'] == 'success'),
+            'failed': sum(1 for r in results if r['status'] == 'error')
+        }
+    })
+
+@app.route('/api/translation-memory/stats', methods=['GET'])
+def get_translation_memory_stats():
+    """Get translation memory hit/miss statistics"""
+    memory = get_translation_memory()
+    if memory is None:
+        return jsonify({
+            'status': 'success',
+            'data': {'enabled': False}
+        })
+    return jsonify({
+        'status': 'success',
+        'data': dict(memory.get_stats(), enabled=True)
+    })
+
+@app.route('/api/jobs', methods=['POST'])
+def create_job():
+    """Queue a translation job and return its id"""
+    data = request.json
+    
+    if not data:
+        return jsonify({
+            'status': 'error',
+            'message': 'Request data is empty'
+        }), 400
+    
+    # A job is either a single translation request or a list of items sharing top-level defaults
+    if 'items' in data:
+        items = data['items']
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'status': 'error',
+                'message': 'items must be a non-empty list'
+            }), 400
+        defaults = {key: value for key, value in data.items() if key != 'items'}
+    else:
+        items = [data]
+        defaults = None
+    
+    if len(items) > JOBS_MAX_ITEMS:
+        return jsonify({
+            'status': 'error',
+            'message': f'A job may contain at most {JOBS_MAX_ITEMS} items'
+        }), 400
+    
+    job_items = []
+    for index, item in enumerate(items):
+        params, error = parse_translation_request(item if isinstance(item, dict) else {}, defaults)
+        if error:
+            return jsonify({
+                'status': 'error',
+                'message': f'Item {index}: {error[0]}'
+            }), error[1]
+        job_items.append(params)
+    
+    if data.get('document'):
+        # Long documents are split into sentences so progress is reported per sentence
+        if len(job_items) != 1:
+            return jsonify({
+                'status': 'error',
+                'message': 'A document job translates exactly one source_text'
+            }), 400
+        job_id = get_job_manager().submit_document(job_items[0])
+    else:
+        job_id = get_job_manager().submit(job_items)
+    return jsonify({
+        'status': 'success',
+        'data': get_job_manager().get(job_id, include_results=False)
+    }), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List recent jobs without their results"""
+    return jsonify({
+        'status': 'success',
+        'data': get_job_manager().store.list(limit=request.args.get('limit', 50, type=int))
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get job status, progress and (partial) results"""
+    job = get_job_manager().get(job_id, include_results=request.args.get('results', '1') != '0')
+    if job is None:
+        return jsonify({
+            'status': 'error',
+            'message': f"Job '{job_id}' not found"
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'data': job
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running job"""
+    status = get_job_manager().store.request_cancel(job_id)
+    if status is None:
+        return jsonify({
+            'status': 'error',
+            'message': f"Job '{job_id}' not found"
+        }), 404
+    return jsonify({
+        'status': 'success',
+        'data': get_job_manager().get(job_id, include_results=False)
+    })
+
+def preload():
+    """
+    Build state shared by all requests: the Frame index, the LLM clients and
+    the compiled workflow
+
+    Under a pre-forking server this runs once in the master process so
+    workers start with it already in (copy-on-write) memory. The job manager
+    is not started here: its threads would not survive the fork, so each
+    worker starts it after forking (see gunicorn.conf.py).
+    """
+    # LangChain/LangGraph are imported here rather than at module load so
+    # light routes (/, /api/bootstrap, /api/frames, /api/frame-info) do not wait on them
+    from backend.agent import get_workflow
+    
+    get_frame_registry().refresh(force=True)
+    warm_up_llm_clients()
+    get_workflow()
+
+def start_background_preload():
+    """
+    Resume interrupted jobs and run preload in a daemon thread so the server
+    can start accepting requests immediately
+    """
+    get_job_manager()
+    thread = threading.Thread(target=preload, name='preload', daemon=True)
+    thread.start()
+    return thread
+
+def warm_up():
+    """Serve one request on each read-only route so lazy per-process state is initialized"""
+    with app.test_client() as client:
+        for path in ('/', '/api/bootstrap', '/api/frames', '/api/frame-info'):
+            response = client.get(path)
+            if response.status_code != 200:
+                print(f"Warning: Warm-up request {path} returned {response.status_code}")
+
 if __name__ == '__main__':
     # Ensure frames directory exists
     frames_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'frames')
@@ -165,5 +586,9 @@ if __name__ == '__main__':
     if not os.path.exists(DEFAULT_FRAME_PATH):
         print(f"Warning: Default Frame file {DEFAULT_FRAME_PATH} does not exist")
     
+    # Resume jobs interrupted by a restart, and create shared LLM clients, the
+    # Frame index and the workflow while the server starts
+    start_background_preload()
+    
     # Start application
     app.run(debug=True, host='0.0.0.0', port=8080)
@@ -0,0 +1,416 @@
+"""
+Offline bulk translation of JSONL or CSV files
+
+Streams an input file through the translation pipeline (translate_with_memory,
+i.e. run_translation behind the translation memory) with bounded concurrency
+and appends one JSON line per record to the output as results arrive. Memory
+use does not depend on the input size: only the records in flight, and the
+finished ones waiting for a slower record before them, are held; reading
+pauses while either window is full.
+
+Progress is checkpointed next to the output (<output>.checkpoint) as a
+watermark: the input byte offset before which every record has been written,
+plus the offsets of the few records after it that are already done. An
+interrupted run started again with the same arguments resumes from the
+watermark without translating or writing any record twice.
+
+Input records (JSON objects or CSV rows with a header) need "source_text" and
+may set "id", "source_language", "target_language", "frame_name" (or "frame",
+"auto" for detection), "frames" (list, or comma-separated in CSV),
+"frame_path" and "mode"; missing values come from the command-line defaults.
+Output lines carry the record's "index", input "offset", "id" and the
+{"status", "data" | "message"} result; the exit status is 1 if any record failed.
+
+Usage:
+    python -m backend.bulk_translate catalogue.jsonl -o translations.jsonl \\
+        [--source-language English] [--target-language Japanese] [--frame auto] \\
+        [--concurrency 8] [--format jsonl|csv] [--no-cache] [--restart]
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from backend.frame_registry import DEFAULT_FRAME_PATH
+
+# Seconds between checkpoint writes and between progress lines
+CHECKPOINT_INTERVAL = 5.0
+PROGRESS_INTERVAL = 10.0
+# Records in flight, and records tracked after the watermark, per unit of concurrency
+IN_FLIGHT_WINDOW = 2
+WATERMARK_WINDOW = 4
+
+
+def read_jsonl_records(stream: BinaryIO) -> Iterator[Tuple[int, int, Union[Dict[str, Any], str]]]:
+    """
+    Read JSONL records with their byte offsets
+
+    Args:
+        stream: Binary input positioned at a record boundary
+
+    Yields:
+        (start offset, end offset, record) where record is the parsed object,
+        or an error message for a line that is not a JSON object; blank lines
+        are skipped
+    """
+    offset = stream.tell()
+    for line in iter(stream.readline, b''):
+        end = offset + len(line)
+        if line.strip():
+            try:
+                record = json.loads(line)
+                yield offset, end, record if isinstance(record, dict) else 'Line is not a JSON object'
+            except ValueError as e:
+                yield offset, end, f'Invalid JSON: {e}'
+        offset = end
+
+
+def read_csv_records(stream: BinaryIO, header: List[str]) -> Iterator[Tuple[int, int, Union[Dict[str, Any], str]]]:
+    """
+    Read CSV rows (after the header) with their byte offsets
+
+    Quoted fields may span lines.
+
+    Args:
+        stream: Binary input positioned at a row boundary after the header
+        header: Column names
+
+    Yields:
+        (start offset, end offset, row as a dict)
+    """
+    offset = stream.tell()
+    while True:
+        raw = stream.readline()
+        if not raw:
+            return
+        # A row is complete once its quotes are balanced
+        while raw.count(b'"') % 2:
+            more = stream.readline()
+            if not more:
+                break
+            raw += more
+        end = offset + len(raw)
+        text = raw.decode('utf-8-sig')
+        if text.strip():
+            values = next(csv.reader([text]), [])
+            yield offset, end, {name: value for name, value in zip(header, values) if value != ''}
+        offset = end
+
+
+def read_csv_header(stream: BinaryIO) -> List[str]:
+    """Read the CSV header row, leaving the stream at the first data row"""
+    stream.seek(0)
+    line = stream.readline().decode('utf-8-sig')
+    return [name.strip() for name in next(csv.reader([line]), [])]
+
+
+class Watermark:
+    """Tracks the input offset before which every record is finished"""
+
+    def __init__(self, offset: int, index: int, done_offsets: Optional[Set[int]] = None):
+        self.offset = offset
+        self.index = index
+        # Records in input order: [start offset, end offset, done]
+        self._records: Deque[List[Any]] = deque()
+        self._done_offsets = set(done_offsets or ())
+
+    def __len__(self) -> int:
+        """Number of records tracked after the watermark (finished or not)"""
+        return len(self._records)
+
+    def is_done(self, offset: int) -> bool:
+        """Whether a record after the watermark was finished by the previous run"""
+        return offset in self._done_offsets
+
+    def add(self, offset: int, end: int, done: bool = False) -> int:
+        """Register a record in input order, returning its index"""
+        self._records.append([offset, end, done])
+        index = self.index + len(self._records) - 1
+        self._advance()
+        return index
+
+    def finish(self, offset: int) -> None:
+        for record in self._records:
+            if record[0] == offset:
+                record[2] = True
+                break
+        self._advance()
+
+    def _advance(self) -> None:
+        while self._records and self._records[0][2]:
+            start, end, _ = self._records.popleft()
+            self._done_offsets.discard(start)
+            self.offset = end
+            self.index += 1
+
+    def done_after(self) -> List[int]:
+        """Offsets of finished records after the watermark"""
+        return [offset for offset, _, done in self._records if done]
+
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Write-then-rename so an interruption never leaves a torn checkpoint
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def resolve_frame_path(item: Dict[str, Any], source_text: str, source_language: str) -> Union[str, List[str]]:
+    """
+    Resolve the Frame(s) of an input record
+
+    Args:
+        item: Input record (with command-line defaults applied)
+        source_text: Text to translate
+        source_language: Language of the text
+
+    Returns:
+        Frame path, or a list of paths for multi-Frame analysis
+
+    Raises:
+        ValueError: If a Frame name is unknown
+    """
+    from backend.frame_detection import detect_frames
+    from backend.utils import get_frame_by_name
+
+    frames = item.get('frames')
+    if isinstance(frames, str):
+        frames = [name.strip() for name in frames.split(',') if name.strip()]
+    frame_name = item.get('frame_name') or item.get('frame')
+    frame_path = item.get('frame_path')
+
+    if frames:
+        paths = [get_frame_by_name(name)[1] for name in dict.fromkeys(frames)]
+        return paths[0] if len(paths) == 1 else paths
+    if 'auto' in (frame_name, frame_path):
+        candidates = detect_frames(source_text, source_language)
+        return candidates[0]['path'] if candidates else DEFAULT_FRAME_PATH
+    if frame_name:
+        return get_frame_by_name(frame_name)[1]
+    return frame_path or DEFAULT_FRAME_PATH
+
+
+def translate_record(item: Dict[str, Any], use_cache: bool) -> Dict[str, Any]:
+    """
+    Translate one input record
+
+    Args:
+        item: Input record with command-line defaults applied
+        use_cache: Use the translation memory
+
+    Returns:
+        {"status": "success", "data": ...} or {"status": "error", "message": ...}
+    """
+    from backend.agent import TRANSLATION_MODES
+    from backend.translation_memory import translate_with_memory
+
+    source_text = item.get('source_text') or ''
+    source_language = item.get('source_language')
+    target_language = item.get('target_language')
+    mode = item.get('mode') or 'standard'
+    if not source_text:
+        return {'status': 'error', 'message': 'Source text cannot be empty'}
+    if source_language not in ('English', 'Japanese') or target_language not in ('English', 'Japanese'):
+        return {'status': 'error', 'message': 'Source and target language must be English or Japanese'}
+    if source_language == target_language:
+        return {'status': 'error', 'message': 'Source and target languages cannot be the same'}
+    if mode not in TRANSLATION_MODES:
+        return {'status': 'error', 'message': f"Mode must be one of: {', '.join(TRANSLATION_MODES)}"}
+
+    try:
+        frame_path = resolve_frame_path(item, source_text, source_language)
+        result = translate_with_memory(
+            source_text=source_text,
+            source_language=source_language,
+            target_language=target_language,
+            frame_path=frame_path,
+            use_cache=use_cache,
+            mode=mode
+        )
+        return {'status': 'success', 'data': result}
+    except Exception as e:
+        return {'status': 'error', 'message': str(e)}
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}'
+
+
+class Progress:
+    """Throughput and ETA based on the input bytes processed"""
+
+    def __init__(self, total_bytes: int, start_offset: int):
+        self.total_bytes = total_bytes
+        self.start_offset = start_offset
+        self.started = time.monotonic()
+        self.records = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.tokens = 0
+        self.bytes = 0
+
+    def record(self, result: Dict[str, Any], size: int) -> None:
+        self.records += 1
+        self.bytes += size
+        if result['status'] != 'success':
+            self.errors += 1
+            return
+        data = result['data']
+        if (data.get('cache') or {}).get('hit'):
+            self.cache_hits += 1
+        self.tokens += (data.get('usage') or {}).get('total_tokens', 0)
+
+    def line(self, watermark: int) -> str:
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        rate = self.bytes / elapsed
+        remaining = max(0, self.total_bytes - watermark)
+        eta = _format_duration(remaining / rate) if rate > 0 else '?'
+        percent = 100.0 * watermark / self.total_bytes if self.total_bytes else 100.0
+        return (f'{percent:5.1f}% | {self.records} records ({self.errors} errors, {self.cache_hits} cache hits) '
+                f'| {self.records / elapsed:.2f} rec/s, {rate / 1024:.1f} KiB/s | {self.tokens} tokens '
+                f'| elapsed {_format_duration(elapsed)}, ETA {eta}')
+
+
+def run(args: argparse.Namespace) -> int:
+    input_path = os.path.abspath(args.input)
+    output_path = os.path.abspath(args.output)
+    checkpoint_path = f'{output_path}.checkpoint'
+    input_format = args.format or ('csv' if input_path.lower().endswith('.csv') else 'jsonl')
+    defaults = {key: value for key, value in {
+        'source_language': args.source_language,
+        'target_language': args.target_language,
+        'frame': args.frame,
+        'mode': args.mode
+    }.items() if value}
+
+    checkpoint = None if args.restart else load_checkpoint(checkpoint_path)
+    if checkpoint is not None and checkpoint.get('input') != input_path:
+        print(f"Checkpoint {checkpoint_path} belongs to {checkpoint.get('input')}; use --restart to start over", file=sys.stderr)
+        return 2
+
+    total_bytes = os.path.getsize(input_path)
+    with open(input_path, 'rb') as stream, open(output_path, 'ab') as output:
+        header = read_csv_header(stream) if input_format == 'csv' else []
+        if checkpoint is not None:
+            # Drop output written after the checkpoint; those records are translated again
+            output.truncate(checkpoint['output_size'])
+            watermark = Watermark(checkpoint['offset'], checkpoint['index'], set(checkpoint['done_after']))
+            stream.seek(checkpoint['offset'])
+            print(f"Resuming at byte {checkpoint['offset']} of {total_bytes} (record {checkpoint['index']})", file=sys.stderr)
+        else:
+            output.truncate(0)
+            watermark = Watermark(stream.tell(), 0)
+        # truncate() keeps the position at the old end; appends go to the new end
+        output.seek(0, os.SEEK_END)
+        records = read_csv_records(stream, header) if input_format == 'csv' else read_jsonl_records(stream)
+
+        progress = Progress(total_bytes, watermark.offset)
+        last_checkpoint = last_progress = time.monotonic()
+        # Output size covering exactly the records the watermark counts as done
+        output_size = output.tell()
+
+        def write_checkpoint(complete: bool = False) -> None:
+            output.flush()
+            os.fsync(output.fileno())
+            save_checkpoint(checkpoint_path, {
+                'input': input_path,
+                'offset': watermark.offset,
+                'index': watermark.index,
+                'done_after': watermark.done_after(),
+                'output_size': output_size,
+                'complete': complete
+            })
+
+        def collect(done_futures) -> None:
+            nonlocal last_checkpoint, last_progress, output_size
+            for future in done_futures:
+                offset, end, index, item = pending.pop(future)
+                result = future.result()
+                line = {'index': index, 'offset': offset}
+                if isinstance(item, dict) and 'id' in item:
+                    line['id'] = item['id']
+                line.update(result)
+                output.write(json.dumps(line, ensure_ascii=False).encode('utf-8') + b'\n')
+                watermark.finish(offset)
+                output_size = output.tell()
+                progress.record(result, end - offset)
+            now = time.monotonic()
+            if now - last_checkpoint >= args.checkpoint_interval:
+                write_checkpoint()
+                last_checkpoint = now
+            if now - last_progress >= args.progress_interval:
+                print(progress.line(watermark.offset), file=sys.stderr)
+                last_progress = now
+
+        pending: Dict[Any, Tuple[int, int, int, Any]] = {}
+        executor = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix='bulk')
+        try:
+            for offset, end, item in records:
+                # Keep bounded windows of records in flight and of finished records behind a stalled one
+                while pending and (len(pending) >= args.concurrency * IN_FLIGHT_WINDOW
+                                   or len(watermark) >= args.concurrency * WATERMARK_WINDOW):
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                if watermark.is_done(offset):
+                    watermark.add(offset, end, done=True)
+                    continue
+                index = watermark.add(offset, end)
+                if isinstance(item, str):
+                    future = executor.submit(lambda message=item: {'status': 'error', 'message': message})
+                else:
+                    future = executor.submit(translate_record, dict(defaults, **item), not args.no_cache)
+                pending[future] = (offset, end, index, item)
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        except KeyboardInterrupt:
+            executor.shutdown(wait=False, cancel_futures=True)
+            write_checkpoint()
+            print(f'\nInterrupted; {progress.line(watermark.offset)}', file=sys.stderr)
+            print(f'Run the same command again to resume from byte {watermark.offset}', file=sys.stderr)
+            return 130
+        executor.shutdown()
+        write_checkpoint(complete=True)
+
+    print(progress.line(watermark.offset), file=sys.stderr)
+    print(f'Wrote {output_path}', file=sys.stderr)
+    return 1 if progress.errors else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Input JSONL or CSV file')
+    parser.add_argument('-o', '--output', required=True, help='Output JSONL file (one result per input record)')
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help='Input format (default: from the file extension)')
+    parser.add_argument('--source-language', default='English')
+    parser.add_argument('--target-language', default='Japanese')
+    parser.add_argument('--frame', help='Default Frame name, or "auto" to detect it per record')
+    parser.add_argument('--mode', default='standard')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('BATCH_MAX_CONCURRENCY', '8')))
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the translation memory')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and overwrite the output')
+    parser.add_argument('--checkpoint-interval', type=float, default=CHECKPOINT_INTERVAL, help='Seconds between checkpoints')
+    parser.add_argument('--progress-interval', type=float, default=PROGRESS_INTERVAL, help='Seconds between progress lines')
+    args = parser.parse_args()
+    if args.concurrency <= 0:
+        parser.error('--concurrency must be a positive integer')
+    sys.exit(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Cancellation of translations whose client went away
+
+A streamed translation runs in a worker thread while the response generator
+waits for its events, sending an SSE comment as a heartbeat when none arrives
+in time. Writing to a closed connection makes the WSGI server close the
+response generator, which sets the translation's cancel event; every LLM call
+checks it first (see raise_if_cancelled), so the graph stops before its next
+model call instead of running to completion for nobody.
+"""
+import contextvars
+import queue
+import threading
+from typing import Any, Callable, Iterator, Optional
+
+from backend import metrics
+
+# Cancel event of the translation running in the current context
+_cancel_event: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar('cancel_event', default=None)
+
+_DONE = object()
+
+
+class Cancelled(Exception):
+    """The client of the translation went away"""
+
+
+def is_cancelled() -> bool:
+    """Whether the translation running in the current context was cancelled"""
+    event = _cancel_event.get()
+    return event is not None and event.is_set()
+
+
+def raise_if_cancelled() -> None:
+    """
+    Stop the current translation if its client went away
+
+    Raises:
+        Cancelled: If the translation was cancelled
+    """
+    if is_cancelled():
+        raise Cancelled('Translation cancelled by the client')
+
+
+def iterate_cancellable(make_iterator: Callable[[], Iterator[Any]], heartbeat_interval: float = 5.0) -> Iterator[Any]:
+    """
+    Run an iterator in a worker thread that is cancelled when this generator is closed
+
+    Args:
+        make_iterator: Creates the iterator; called in the worker thread with
+            a fresh cancel event bound to its context
+        heartbeat_interval: Seconds without an item after which None is
+            yielded, so the caller can write a heartbeat and notice a closed
+            connection
+
+    Yields:
+        The iterator's items, or None as a heartbeat
+
+    Raises:
+        Exception: Whatever the iterator raised
+    """
+    events: 'queue.Queue[Any]' = queue.Queue()
+    cancel_event = threading.Event()
+
+    def run() -> None:
+        _cancel_event.set(cancel_event)
+        try:
+            for item in make_iterator():
+                events.put((item, None))
+                if cancel_event.is_set():
+                    break
+        except BaseException as e:
+            events.put((_DONE, e))
+            return
+        events.put((_DONE, None))
+
+    # The worker inherits the request's context (stage timings) plus its cancel event
+    context = contextvars.copy_context()
+    threading.Thread(target=context.run, args=(run,), daemon=True).start()
+
+    finished = False
+    try:
+        while True:
+            try:
+                item, error = events.get(timeout=heartbeat_interval)
+            except queue.Empty:
+                yield None
+                continue
+            if item is _DONE:
+                finished = True
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        if not finished:
+            # Closed before the iterator finished: the client went away
+            cancel_event.set()
+            metrics.CANCELLED_TRANSLATIONS.inc()
@@ -0,0 +1,232 @@
+"""
+Relevance-ranked few-shot example selection
+
+Each Frame's annotated examples (example_sentences, the examples of its
+language_specific_variations and the few-shot identification example) are
+indexed once per Frame load with a small TF-IDF index over words and CJK
+character bigrams. Prompts then include only the examples most similar to
+the source text, within a token budget, instead of a fixed set.
+"""
+import math
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.utils import load_frame_data
+
+# Number of examples and estimated tokens spent on them per prompt
+EXAMPLES_TOP_K = int(os.getenv('EXAMPLES_TOP_K', '2'))
+EXAMPLES_TOKEN_BUDGET = int(os.getenv('EXAMPLES_TOKEN_BUDGET', '80'))
+
+# "[Buyer]" style element tags in annotated example texts
+_ELEMENT_TAG_RE = re.compile(r'\s?\[[A-Za-z_]+\]')
+_WORD_RE = re.compile(r'[a-z0-9]+(?:\'[a-z]+)?')
+_CJK_RUN_RE = re.compile(r'[぀-ヿ㐀-鿿ｦ-ﾟ]+')
+# Quoted sentence of the few-shot identification prompt
+_QUOTED_RE = re.compile(r"'(.+)'")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text
+
+    Roughly one token per 4 ASCII characters or per non-ASCII character.
+
+    Args:
+        text: Any text
+
+    Returns:
+        Estimated token count
+    """
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+def strip_element_tags(text: str) -> str:
+    """Remove [Element] tags from an annotated example text"""
+    return _ELEMENT_TAG_RE.sub('', text).strip()
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into index terms
+
+    Latin words are lowercased and stripped of common inflection suffixes;
+    Japanese runs are split into character bigrams.
+
+    Args:
+        text: English or Japanese text
+
+    Returns:
+        Terms (with repetitions)
+    """
+    lowered = text.lower()
+    terms = []
+    for word in _WORD_RE.findall(lowered):
+        for suffix in ('ing', 'ed', 'es', 's'):
+            if len(word) > len(suffix) + 2 and word.endswith(suffix):
+                word = word[:-len(suffix)]
+                break
+        terms.append(word)
+    for run in _CJK_RUN_RE.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def _term_weights(terms: List[str], idf: Dict[str, float]) -> Dict[str, float]:
+    counts: Dict[str, int] = {}
+    for term in terms:
+        counts[term] = counts.get(term, 0) + 1
+    weights = {term: (1 + math.log(count)) * idf.get(term, 0.0) for term, count in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {term: w / norm for term, w in weights.items()}
+
+
+def collect_examples(frame_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Collect the annotated examples of a Frame
+
+    Args:
+        frame_data: Loaded Frame data
+
+    Returns:
+        Examples as {"text", "annotation", "language"}; text has the
+        [Element] tags removed
+    """
+    examples = []
+    for example in frame_data.get('example_sentences', []):
+        if example.get('text') and example.get('annotation'):
+            examples.append({'text': strip_element_tags(example['text']), 'annotation': example['annotation'], 'language': 'English'})
+
+    for language, variation in frame_data.get('language_specific_variations', {}).items():
+        for example in variation.get('examples', []):
+            if example.get('text') and example.get('annotation'):
+                examples.append({'text': strip_element_tags(example['text']), 'annotation': example['annotation'], 'language': language})
+
+    few_shot_prompts = frame_data.get('few_shot_prompts', {})
+    quoted = _QUOTED_RE.search(few_shot_prompts.get('identification_prompt', ''))
+    if quoted and few_shot_prompts.get('expected_response'):
+        examples.append({'text': quoted.group(1), 'annotation': few_shot_prompts['expected_response'], 'language': 'English'})
+    return examples
+
+
+class ExampleIndex:
+    """TF-IDF index over the annotated examples of one Frame"""
+
+    def __init__(self, examples: List[Dict[str, Any]]):
+        self.examples = examples
+        terms_per_example = [tokenize(example['text']) for example in examples]
+
+        document_frequency: Dict[str, int] = {}
+        for terms in terms_per_example:
+            for term in set(terms):
+                document_frequency[term] = document_frequency.get(term, 0) + 1
+        count = len(examples)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in document_frequency.items()}
+
+        self.vectors = [_term_weights(terms, self.idf) for terms in terms_per_example]
+        self.token_counts = [estimate_tokens(example['text']) + estimate_tokens(str(example['annotation'])) for example in examples]
+
+    def rank(self, text: str, language: Optional[str] = None) -> List[Tuple[float, int]]:
+        """
+        Rank examples by cosine similarity to a text
+
+        Ties (including examples sharing no terms with the text) keep
+        examples in the given language first, then the Frame's order.
+
+        Args:
+            text: Source text
+            language: Language of the source text
+
+        Returns:
+            (score, example index) pairs, best first
+        """
+        query = _term_weights(tokenize(text), self.idf)
+        scored = []
+        for index, vector in enumerate(self.vectors):
+            score = sum(weight * vector.get(term, 0.0) for term, weight in query.items())
+            same_language = language is None or self.examples[index]['language'] == language
+            scored.append((score, same_language, -index))
+        scored.sort(reverse=True)
+        return [(score, -negative_index) for score, _, negative_index in scored]
+
+    def select(self, text: str, language: Optional[str] = None, k: Optional[int] = None,
+               token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Select the most relevant examples for a text
+
+        Args:
+            text: Source text
+            language: Language of the source text
+            k: Maximum number of examples (defaults to EXAMPLES_TOP_K)
+            token_budget: Maximum estimated tokens of the selected examples
+                (defaults to EXAMPLES_TOKEN_BUDGET); the best example is always kept
+
+        Returns:
+            Selected examples, best first
+        """
+        k = EXAMPLES_TOP_K if k is None else k
+        token_budget = EXAMPLES_TOKEN_BUDGET if token_budget is None else token_budget
+
+        selected = []
+        used_tokens = 0
+        for _, index in self.rank(text, language):
+            if len(selected) >= k:
+                break
+            tokens = self.token_counts[index]
+            if selected and used_tokens + tokens > token_budget:
+                continue
+            selected.append(self.examples[index])
+            used_tokens += tokens
+        return selected
+
+
+# Frame path -> (Frame data the index was built from, index)
+_indexes: Dict[str, Tuple[Dict[str, Any], ExampleIndex]] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_example_index(frame_path: str) -> ExampleIndex:
+    """
+    Get the example index of a Frame, built once per Frame load
+
+    The index is rebuilt when load_frame_data returns freshly loaded data
+    (i.e. after the Frame file changed).
+
+    Args:
+        frame_path: Path to the Frame JSON file
+
+    Returns:
+        ExampleIndex of the Frame
+    """
+    frame_data = load_frame_data(frame_path)
+    key = os.path.abspath(frame_path)
+    cached = _indexes.get(key)
+    if cached is not None and cached[0] is frame_data:
+        return cached[1]
+
+    index = ExampleIndex(collect_examples(frame_data))
+    with _indexes_lock:
+        _indexes[key] = (frame_data, index)
+    return index
+
+
+def select_examples(frame_path: str, text: str, language: Optional[str] = None, k: Optional[int] = None,
+                    token_budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Select the most relevant annotated examples of a Frame for a text
+
+    Args:
+        frame_path: Path to the Frame JSON file
+        text: Source text
+        language: Language of the source text
+        k: Maximum number of examples (defaults to EXAMPLES_TOP_K)
+        token_budget: Token budget for the examples (defaults to EXAMPLES_TOKEN_BUDGET)
+
+    Returns:
+        Selected examples as {"text", "annotation", "language"}
+    """
+    return get_example_index(frame_path).select(text, language, k, token_budget)
@@ -0,0 +1,202 @@
+"""
+Deterministic local stand-in for the chat model
+
+FakeChatModel answers with canned outputs after a configurable latency, jitter
+and token rate, so the pipeline can be benchmarked and exercised offline. It
+is selected with DEFAULT_MODEL=fake (see backend.llm) and configured with
+FAKE_LLM_LATENCY, FAKE_LLM_JITTER, FAKE_LLM_TOKENS_PER_SECOND and FAKE_LLM_SEED.
+Provider behaviour under load can be simulated with FAKE_LLM_CAPACITY (calls
+in flight beyond it are rejected with a 429), FAKE_LLM_RATE_LIMIT_RATE (share
+of calls rejected with a 429) and FAKE_LLM_TAIL_RATE / FAKE_LLM_TAIL_LATENCY
+(share of calls delayed by an extra latency). Like provider prompt caches, a
+repeated leading system message is reported as cached input tokens.
+"""
+import json
+import random
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+DEFAULT_ANALYSIS = {
+    "Buyer": "John",
+    "Goods": "a new car",
+    "Seller": "the dealership",
+    "Money": "$25,000",
+    "lexical_unit": "bought"
+}
+DEFAULT_TRANSLATION = "ジョンはディーラーから新しい車を25,000ドルで買いました。"
+# Speculative draft with Frame elements marked after their spans
+DEFAULT_DRAFT = "ジョン [Buyer] はディーラー [Seller] から新しい車 [Goods] を25,000ドル [Money] で買いました。"
+
+# Aggregate time spent inside fake model calls, used to separate model time from pipeline overhead
+_stats = {"calls": 0, "seconds": 0.0, "input_tokens": 0, "output_tokens": 0}
+_stats_lock = threading.Lock()
+
+
+def get_fake_llm_stats() -> Dict[str, Any]:
+    """Get call count, simulated seconds and tokens of all fake model calls so far"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_fake_llm_stats() -> None:
+    """Reset the aggregate fake model statistics"""
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+class FakeRateLimitError(Exception):
+    """Simulated provider rate limit response"""
+
+    status_code = 429
+
+
+def _estimate_tokens(text: str) -> int:
+    # Roughly one token per 4 ASCII characters or per non-ASCII character
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return max(1, ascii_chars // 4 + (len(text) - ascii_chars))
+
+
+def _split_tokens(text: str) -> List[str]:
+    tokens = []
+    current = ""
+    for char in text:
+        current += char
+        if ord(char) >= 128 or char == " " or len(current) >= 4:
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model returning canned outputs with simulated latency"""
+
+    latency: float = 0.5
+    jitter: float = 0.0
+    tokens_per_second: float = 0.0
+    seed: Optional[int] = None
+    analysis_response: Dict[str, Any] = DEFAULT_ANALYSIS
+    translation_response: str = DEFAULT_TRANSLATION
+    draft_response: str = DEFAULT_DRAFT
+    # Fixed outputs returned in turn instead of the prompt-based defaults
+    responses: Optional[List[str]] = None
+    # Calls in flight beyond capacity are rejected with a 429 (0 = unlimited)
+    capacity: int = 0
+    rate_limit_rate: float = 0.0
+    # Share of calls delayed by tail_latency extra seconds
+    tail_rate: float = 0.0
+    tail_latency: float = 0.0
+
+    _rng: Any = None
+    _response_index: int = 0
+    _lock: Any = None
+    _in_flight: int = 0
+    _seen_prefixes: Any = None
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._seen_prefixes = set()
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _pick_response(self, prompt: str) -> str:
+        if self.responses:
+            with self._lock:
+                response = self.responses[self._response_index % len(self.responses)]
+                self._response_index += 1
+            return response
+        if '"frame_analysis"' in prompt and '"translation"' in prompt:
+            return json.dumps({"frame_analysis": self.analysis_response, "translation": self.translation_response}, ensure_ascii=False)
+        if "Return only JSON" in prompt:
+            return json.dumps(self.analysis_response, ensure_ascii=False)
+        if "Return ONLY the marked-up translation" in prompt:
+            return self.draft_response
+        return self.translation_response
+
+    def _first_token_delay(self) -> float:
+        with self._lock:
+            jitter = self._rng.uniform(-self.jitter, self.jitter) if self.jitter else 0.0
+            tail = self.tail_latency if self.tail_rate and self._rng.random() < self.tail_rate else 0.0
+        return max(0.0, self.latency + jitter) + tail
+
+    def _admit(self) -> None:
+        # Reject the call like an overloaded provider would
+        with self._lock:
+            if (self.capacity and self._in_flight >= self.capacity) or (self.rate_limit_rate and self._rng.random() < self.rate_limit_rate):
+                raise FakeRateLimitError("Rate limit exceeded (simulated 429)")
+            self._in_flight += 1
+
+    def _leave(self) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    def _usage(self, messages: List[BaseMessage], prompt: str, output: str) -> Dict[str, Any]:
+        input_tokens = _estimate_tokens(prompt)
+        output_tokens = _estimate_tokens(output)
+        usage = {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+        # Simulated prompt cache: a system prefix sent before is served from cache
+        if messages and isinstance(messages[0], SystemMessage):
+            prefix = str(messages[0].content)
+            with self._lock:
+                cached = prefix in self._seen_prefixes
+                self._seen_prefixes.add(prefix)
+            if cached:
+                usage["input_token_details"] = {"cache_read": _estimate_tokens(prefix)}
+        return usage
+
+    def _record(self, seconds: float, usage: Dict[str, int]) -> None:
+        with _stats_lock:
+            _stats["calls"] += 1
+            _stats["seconds"] += seconds
+            _stats["input_tokens"] += usage["input_tokens"]
+            _stats["output_tokens"] += usage["output_tokens"]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._admit()
+        try:
+            prompt = "\n".join(str(m.content) for m in messages)
+            output = self._pick_response(prompt)
+            usage = self._usage(messages, prompt, output)
+
+            delay = self._first_token_delay()
+            if self.tokens_per_second > 0:
+                delay += len(_split_tokens(output)) / self.tokens_per_second
+            time.sleep(delay)
+            self._record(delay, usage)
+        finally:
+            self._leave()
+
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=output, usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        prompt = "\n".join(str(m.content) for m in messages)
+        output = self._pick_response(prompt)
+        usage = self._usage(messages, prompt, output)
+        tokens = _split_tokens(output)
+
+        self._admit()
+        try:
+            start = time.perf_counter()
+            time.sleep(self._first_token_delay())
+            for index, token in enumerate(tokens):
+                if index and self.tokens_per_second > 0:
+                    time.sleep(1.0 / self.tokens_per_second)
+                is_last = index == len(tokens) - 1
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage if is_last else None))
+                if run_manager:
+                    run_manager.on_llm_new_token(token, chunk=chunk)
+                yield chunk
+            self._record(time.perf_counter() - start, usage)
+        finally:
+            self._leave()
@@ -0,0 +1,284 @@
+"""
+Automatic Frame detection from lexical units
+
+The lexical units of every Frame (lexical_units and the language-specific
+ones) are expanded into surface forms (English inflections, Japanese verb
+stems) and compiled into a single Aho-Corasick automaton. Detecting the
+Frames of a text is one pass over the text, without an LLM call. The
+detector is rebuilt whenever the Frame registry version changes.
+"""
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from backend.frame_registry import get_frame_registry, normalize_lemma
+
+# Irregular English forms of common lexical units
+IRREGULAR_FORMS = {
+    'buy': ['bought'],
+    'sell': ['sold'],
+    'pay': ['paid'],
+    'spend': ['spent'],
+    'get': ['got', 'gotten'],
+    'go': ['went', 'gone', 'goes'],
+    'fly': ['flew', 'flown'],
+    'drive': ['drove', 'driven'],
+    'ride': ['rode', 'ridden'],
+    'take': ['took', 'taken'],
+    'make': ['made'],
+    'give': ['gave', 'given'],
+    'leave': ['left'],
+    'bring': ['brought'],
+    'catch': ['caught'],
+}
+
+# Japanese godan verb endings -> kana that follow the stem in other conjugations
+_GODAN_FORMS = {
+    'う': 'わいうえおっ',
+    'く': 'かきくけこい',
+    'ぐ': 'がぎぐげごい',
+    'す': 'さしすせそ',
+    'つ': 'たちつてとっ',
+    'ぬ': 'なにぬねのん',
+    'ぶ': 'ばびぶべぼん',
+    'む': 'まみむめもん',
+    'る': 'らりるれろっ',
+}
+# Kana before る in ichidan verbs (食べる, 仕入れる, 見る ...)
+_ICHIDAN_VOWELS = set('えけげせぜてでねへべぺめれいきぎしじちぢにひびぴみり')
+
+_LATIN_RE = re.compile(r'[a-z]')
+_VOWELS = set('aeiou')
+
+
+def english_forms(lemma: str) -> Set[str]:
+    """
+    Generate inflected forms of an English lemma
+
+    Multi-word lemmas ("hand over") are inflected on their first word.
+
+    Args:
+        lemma: Normalized lemma
+
+    Returns:
+        Surface forms including the lemma itself
+    """
+    head, _, rest = lemma.partition(' ')
+    tail = f' {rest}' if rest else ''
+    forms = {head}
+    forms.update(IRREGULAR_FORMS.get(head, []))
+
+    consonant_y = len(head) > 1 and head.endswith('y') and head[-2] not in _VOWELS
+    # Short consonant-vowel-consonant words double the last letter ("shop" -> "shopped")
+    doubles = len(head) <= 4 and len(head) >= 3 and head[-1] not in _VOWELS | set('wxy') and head[-2] in _VOWELS and head[-3] not in _VOWELS
+
+    if head.endswith(('s', 'x', 'z', 'ch', 'sh')):
+        forms.add(head + 'es')
+    elif consonant_y:
+        forms.add(head[:-1] + 'ies')
+    else:
+        forms.add(head + 's')
+
+    if head.endswith('e'):
+        forms.add(head + 'd')
+        forms.add((head if head.endswith('ee') else head[:-1]) + 'ing')
+    elif consonant_y:
+        forms.add(head[:-1] + 'ied')
+        forms.add(head + 'ing')
+    elif doubles:
+        forms.update({head + head[-1] + 'ed', head + head[-1] + 'ing', head + 'ed', head + 'ing'})
+    else:
+        forms.update({head + 'ed', head + 'ing'})
+        if head.endswith('l'):
+            # British spelling ("travelled")
+            forms.update({head + 'led', head + 'ling'})
+    return {form + tail for form in forms}
+
+
+def japanese_forms(lemma: str) -> Set[str]:
+    """
+    Generate the stems a Japanese lemma appears with in conjugated text
+
+    Args:
+        lemma: Normalized lemma in dictionary form
+
+    Returns:
+        Surface forms including the lemma itself
+    """
+    forms = {lemma}
+    if lemma.endswith('する') and len(lemma) > 2:
+        # Suru verbs: the noun part is enough (購入した, 購入の)
+        forms.add(lemma[:-2])
+    elif lemma.endswith('る') and len(lemma) > 1 and lemma[-2] in _ICHIDAN_VOWELS:
+        forms.add(lemma[:-1])
+    elif lemma[-1] in _GODAN_FORMS and len(lemma) > 1:
+        stem = lemma[:-1]
+        # Keep a kana after the stem so single-kanji stems (買) do not match unrelated words (売買)
+        forms.update(stem + kana for kana in _GODAN_FORMS[lemma[-1]])
+    return forms
+
+
+def surface_forms(lemma: str, language: str) -> Set[str]:
+    """Surface forms of a normalized lemma in the given language"""
+    if language == 'Japanese':
+        return japanese_forms(lemma)
+    if language == 'English':
+        return english_forms(lemma)
+    return {lemma}
+
+
+class _Automaton:
+    """Aho-Corasick automaton over a fixed set of patterns"""
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+
+        for pattern in patterns:
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(pattern)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> Iterator[Tuple[int, str]]:
+        """Yield (start index, pattern) for every occurrence of every pattern"""
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(char, 0)
+            for pattern in self._output[node]:
+                yield index - len(pattern) + 1, pattern
+
+
+class FrameDetector:
+    """Scores the Frames of a registry snapshot against a text"""
+
+    def __init__(self, entries: List[Dict[str, Any]], version: int = 0):
+        self.version = version
+        self.frames: Dict[str, Dict[str, str]] = {}
+        # Surface form -> [(frame path, lemma, language)]
+        self._targets: Dict[str, List[Tuple[str, str, str]]] = {}
+
+        for entry in entries:
+            frame_data = entry['data']
+            path = entry['path']
+            self.frames[path] = {'frame_name': frame_data.get('frame_name', ''), 'frame_id': frame_data.get('frame_id', ''), 'path': path}
+
+            lemmas = [(lu.get('lemma', ''), 'English') for lu in frame_data.get('lexical_units', [])]
+            for language, variation in frame_data.get('language_specific_variations', {}).items():
+                lemmas.extend((lemma, language) for lemma in variation.get('lexical_units', []))
+
+            for lemma, language in lemmas:
+                lemma = normalize_lemma(lemma)
+                if not lemma:
+                    continue
+                for form in surface_forms(lemma, language):
+                    targets = self._targets.setdefault(form, [])
+                    if (path, lemma, language) not in targets:
+                        targets.append((path, lemma, language))
+
+        self._automaton = _Automaton(list(self._targets))
+
+    @staticmethod
+    def _is_word_match(text: str, start: int, end: int) -> bool:
+        # Latin forms must match whole words ("buy" not in "buyout"); Japanese has no spaces
+        if start > 0 and text[start - 1].isalnum() and text[start - 1].isascii():
+            return False
+        if end < len(text) and text[end].isalnum() and text[end].isascii():
+            return False
+        return True
+
+    def detect(self, text: str, language: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Score the Frames evoked by a text
+
+        Args:
+            text: Source text
+            language: Only use lexical units of this language (all languages if None)
+
+        Returns:
+            Candidate Frames, best first, as {"frame_name", "frame_id", "path",
+            "score", "matches"}; score is the number of distinct lexical units found
+        """
+        lowered = text.lower()
+        # Frame path -> lemma -> longest matched form
+        found: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        for start, form in self._automaton.find_all(lowered):
+            end = start + len(form)
+            if _LATIN_RE.search(form) and not self._is_word_match(lowered, start, end):
+                continue
+            for path, lemma, lemma_language in self._targets[form]:
+                if language is not None and lemma_language != language:
+                    continue
+                matches = found.setdefault(path, {})
+                previous = matches.get(lemma)
+                if previous is None or len(form) > len(previous['text']):
+                    matches[lemma] = {'lemma': lemma, 'text': text[start:end], 'start': start}
+
+        candidates = []
+        for path, matches in found.items():
+            candidates.append(dict(
+                self.frames[path],
+                score=len(matches),
+                matches=sorted(matches.values(), key=lambda m: m['start'])
+            ))
+        candidates.sort(key=lambda c: (-c['score'], -sum(len(m['text']) for m in c['matches']), c['frame_name']))
+        return candidates
+
+
+_detector: Optional[FrameDetector] = None
+_detector_lock = threading.Lock()
+
+
+def get_frame_detector() -> FrameDetector:
+    """
+    Get a detector for the current set of Frames
+
+    Returns:
+        FrameDetector, rebuilt when the Frame registry version changes
+    """
+    global _detector
+    # Entries and version come from one snapshot, so a detector is never tagged with a newer version than its entries
+    snapshot = get_frame_registry().snapshot()
+    detector = _detector
+    if detector is None or detector.version < snapshot.version:
+        with _detector_lock:
+            if _detector is None or _detector.version < snapshot.version:
+                _detector = FrameDetector(snapshot.entries, snapshot.version)
+            detector = _detector
+    return detector
+
+
+def detect_frames(text: str, language: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Score all Frames against a text
+
+    Args:
+        text: Source text
+        language: Language of the text (restricts matching to its lexical units)
+
+    Returns:
+        Candidate Frames, best first (empty if no lexical unit matched)
+    """
+    return get_frame_detector().detect(text, language)
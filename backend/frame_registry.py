@@ -0,0 +1,409 @@
+"""
+Indexed registry of the Frame files in the frames directory
+
+Frame files are parsed once and indexed by name, id and lemma. The directory is
+re-scanned at most every FRAME_REGISTRY_REFRESH_INTERVAL seconds and only files
+whose mtime changed are parsed again. JSON payloads for /api/frames and
+/api/frame-info are precomputed together with their ETags.
+
+A refresh builds a new FrameSnapshot (entries, indexes, payloads, version)
+and swaps it in with a single assignment; readers take one snapshot and never
+see a refresh half-applied.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from backend.utils import load_frame_data
+
+FRAMES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frames')
+FRAME_FILE_PATTERN = '*-frame.json'
+# Frame used when a request names none, and preselected by /api/bootstrap
+DEFAULT_FRAME_PATH = os.path.join(FRAMES_DIR, 'commerce-buy-frame.json')
+
+# Romanization hints such as "買う (kau)" are dropped from lemmas
+_ROMANIZATION_RE = re.compile(r'\s*\(.*?\)\s*$')
+
+
+def _make_etag(body: bytes) -> str:
+    return hashlib.sha1(body).hexdigest()
+
+
+def _success_payload(data: Any) -> bytes:
+    return json.dumps({'status': 'success', 'data': data}, ensure_ascii=False).encode('utf-8')
+
+
+def normalize_lemma(lemma: str) -> str:
+    """
+    Normalize a lexical unit for lookups
+
+    Args:
+        lemma: Lemma as written in the Frame file
+
+    Returns:
+        Lower-cased lemma without romanization hints
+    """
+    return _ROMANIZATION_RE.sub('', lemma).strip().lower()
+
+
+def frame_lemmas(frame_data: Dict[str, Any]) -> Set[str]:
+    """
+    Collect all normalized lemmas of a Frame, including language-specific ones
+
+    Args:
+        frame_data: Loaded Frame data
+
+    Returns:
+        Set of normalized lemmas
+    """
+    lemmas = set()
+    for lu in frame_data.get('lexical_units', []):
+        if lu.get('lemma'):
+            lemmas.add(normalize_lemma(lu['lemma']))
+    for variation in frame_data.get('language_specific_variations', {}).values():
+        for lemma in variation.get('lexical_units', []):
+            lemmas.add(normalize_lemma(lemma))
+    lemmas.discard('')
+    return lemmas
+
+
+def build_frame_summary(frame_data: Dict[str, Any], frame_path: str) -> Dict[str, str]:
+    """
+    Build the short description used in Frame listings
+
+    Args:
+        frame_data: Loaded Frame data
+        frame_path: Path to the Frame JSON file
+
+    Returns:
+        Dictionary containing frame information (id, name, path, description)
+    """
+    description = frame_data.get('description', '')
+    return {
+        'id': frame_data.get('frame_id', ''),
+        'name': frame_data.get('frame_name', ''),
+        'path': frame_path,
+        'description': description[:100] + '...' if len(description) > 100 else description
+    }
+
+
+def build_frame_info(frame_data: Dict[str, Any], frame_path: str) -> Dict[str, Any]:
+    """
+    Build the detailed Frame information returned by /api/frame-info
+
+    Args:
+        frame_data: Loaded Frame data
+        frame_path: Path to the Frame JSON file
+
+    Returns:
+        Frame information
+    """
+    return {
+        'frame_name': frame_data.get('frame_name', ''),
+        'frame_id': frame_data.get('frame_id', ''),
+        'description': frame_data.get('description', ''),
+        'lexical_units': [lu.get('lemma', '') for lu in frame_data.get('lexical_units', [])],
+        'core_elements': [
+            {'name': el.get('name', ''), 'description': el.get('description', '')}
+            for el in frame_data.get('frame_elements', {}).get('core_elements', [])
+        ],
+        'non_core_elements': [
+            {'name': el.get('name', ''), 'description': el.get('description', '')}
+            for el in frame_data.get('frame_elements', {}).get('non_core_elements', [])
+        ],
+        'path': frame_path
+    }
+
+
+def build_entry(path: str, mtime: int, frame_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the registry entry of a Frame file
+
+    Args:
+        path: Absolute path to the Frame JSON file
+        mtime: Modification time of the file in nanoseconds
+        frame_data: Loaded Frame data
+
+    Returns:
+        Entry with the data, summary, lemmas and precomputed /api/frame-info payload
+    """
+    info_body = _success_payload(build_frame_info(frame_data, path))
+    return {
+        'path': path,
+        'mtime': mtime,
+        'data': frame_data,
+        'summary': build_frame_summary(frame_data, path),
+        'lemmas': frozenset(frame_lemmas(frame_data)),
+        'info_body': info_body,
+        'info_etag': _make_etag(info_body),
+    }
+
+
+class FrameSnapshot:
+    """Immutable state of the registry at one version; never modified after construction"""
+
+    def __init__(self, by_path: Dict[str, Dict[str, Any]], version: int, default_frame_path: Optional[str] = None):
+        self.version = version
+        # Entries keyed by absolute path, and ordered by file name
+        self.by_path = by_path
+        self.entries = [by_path[path] for path in sorted(by_path, key=os.path.basename)]
+
+        self.by_name: Dict[str, str] = {}
+        self.by_id: Dict[str, str] = {}
+        self.by_lemma: Dict[str, Set[str]] = {}
+        for entry in self.entries:
+            name = entry['data'].get('frame_name', '')
+            if name:
+                self.by_name[name.lower()] = entry['path']
+            frame_id = entry['data'].get('frame_id', '')
+            if frame_id:
+                self.by_id[frame_id] = entry['path']
+            for lemma in entry['lemmas']:
+                self.by_lemma.setdefault(lemma, set()).add(entry['path'])
+
+        self.frames_body = _success_payload([entry['summary'] for entry in self.entries])
+        self.frames_etag = _make_etag(self.frames_body)
+        # Frame list and the default frame's info in one response (the first frame if the default is missing)
+        default_entry = by_path.get(os.path.abspath(default_frame_path)) if default_frame_path else None
+        if default_entry is None and self.entries:
+            default_entry = self.entries[0]
+        self.bootstrap_body = _success_payload({
+            'frames': [entry['summary'] for entry in self.entries],
+            'default_frame': build_frame_info(default_entry['data'], default_entry['path']) if default_entry else None
+        })
+        self.bootstrap_etag = _make_etag(self.bootstrap_body)
+
+    def get_by_name(self, frame_name: str) -> Optional[Dict[str, Any]]:
+        """Entry of a frame name (case-insensitive), or None"""
+        return self.by_path.get(self.by_name.get(frame_name.lower(), ''))
+
+    def get_by_id(self, frame_id: str) -> Optional[Dict[str, Any]]:
+        """Entry of a frame id, or None"""
+        return self.by_path.get(self.by_id.get(frame_id, ''))
+
+
+class FrameRegistry:
+    """In-memory index of Frame files with O(1) lookups"""
+
+    def __init__(self, frames_dir: str = FRAMES_DIR, refresh_interval: Optional[float] = None,
+                 default_frame_path: Optional[str] = DEFAULT_FRAME_PATH):
+        self.frames_dir = frames_dir
+        self.default_frame_path = default_frame_path
+        if refresh_interval is None:
+            refresh_interval = float(os.getenv('FRAME_REGISTRY_REFRESH_INTERVAL', '2.0'))
+        self.refresh_interval = refresh_interval
+
+        self._snapshot = FrameSnapshot({}, 0, default_frame_path)
+        self._last_refresh = 0.0
+        # Serializes refreshes; readers never take it
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """Incremented whenever the set of Frames or their content changes"""
+        return self._snapshot.version
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-scan the frames directory and re-index changed files
+
+        Args:
+            force: Scan even if the refresh interval has not elapsed
+
+        Returns:
+            True if any Frame was added, changed or removed
+        """
+        if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+            return False
+
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return False
+
+            seen = {}
+            if os.path.isdir(self.frames_dir):
+                with os.scandir(self.frames_dir) as it:
+                    for dir_entry in it:
+                        if dir_entry.is_file() and fnmatch.fnmatch(dir_entry.name, FRAME_FILE_PATTERN):
+                            try:
+                                seen[os.path.abspath(dir_entry.path)] = dir_entry.stat().st_mtime_ns
+                            except FileNotFoundError:
+                                # Removed since the directory was listed
+                                continue
+
+            current = self._snapshot
+            by_path = {}
+            changed = any(path not in seen for path in current.by_path)
+            for path, mtime in seen.items():
+                entry = current.by_path.get(path)
+                if entry is not None and entry['mtime'] == mtime:
+                    by_path[path] = entry
+                    continue
+                try:
+                    frame_data = load_frame_data(path)
+                except Exception as e:
+                    print(f"Error loading frame file {path}: {str(e)}")
+                    if entry is not None:
+                        changed = True
+                    continue
+                by_path[path] = build_entry(path, mtime, frame_data)
+                changed = True
+
+            if changed:
+                self._snapshot = FrameSnapshot(by_path, current.version + 1, self.default_frame_path)
+
+            self._last_refresh = time.monotonic()
+            return changed
+
+    def snapshot(self) -> FrameSnapshot:
+        """
+        Get the current state of the registry after a refresh if one is due
+
+        Returns:
+            FrameSnapshot whose entries, indexes and version belong together
+        """
+        self.refresh()
+        return self._snapshot
+
+    def list_frames(self) -> List[Dict[str, str]]:
+        """
+        List all indexed Frames
+
+        Returns:
+            List of dictionaries containing frame information (id, name, path, description)
+        """
+        return [entry['summary'] for entry in self.snapshot().entries]
+
+    def get_by_name(self, frame_name: str) -> Tuple[Dict[str, Any], str]:
+        """
+        Get frame data by frame name (case-insensitive)
+
+        Args:
+            frame_name: Name of the frame to find
+
+        Returns:
+            Tuple of (frame data, frame path)
+
+        Raises:
+            ValueError: If frame not found
+        """
+        entry = self.snapshot().get_by_name(frame_name)
+        if entry is None:
+            raise ValueError(f"Frame '{frame_name}' not found")
+        return entry['data'], entry['path']
+
+    def get_by_id(self, frame_id: str) -> Tuple[Dict[str, Any], str]:
+        """
+        Get frame data by frame id
+
+        Args:
+            frame_id: Id of the frame to find (e.g. "FR0034")
+
+        Returns:
+            Tuple of (frame data, frame path)
+
+        Raises:
+            ValueError: If frame not found
+        """
+        entry = self.snapshot().get_by_id(frame_id)
+        if entry is None:
+            raise ValueError(f"Frame id '{frame_id}' not found")
+        return entry['data'], entry['path']
+
+    def find_by_lemma(self, lemma: str) -> List[str]:
+        """
+        Find the Frames evoked by a lexical unit
+
+        Args:
+            lemma: Lemma to look up (romanization hints are ignored)
+
+        Returns:
+            Names of the matching Frames
+        """
+        snapshot = self.snapshot()
+        paths = snapshot.by_lemma.get(normalize_lemma(lemma), ())
+        return sorted(snapshot.by_path[path]['data'].get('frame_name', '') for path in paths)
+
+    def entries(self) -> List[Dict[str, Any]]:
+        """
+        Get all indexed entries (path, data, lemmas, ...) ordered by file name
+
+        Returns:
+            List of registry entries
+        """
+        return list(self.snapshot().entries)
+
+    def frames_payload(self) -> Tuple[bytes, str]:
+        """
+        Get the precomputed /api/frames response body
+
+        Returns:
+            Tuple of (JSON body, ETag)
+        """
+        snapshot = self.snapshot()
+        return snapshot.frames_body, snapshot.frames_etag
+
+    def bootstrap_payload(self) -> Tuple[bytes, str]:
+        """
+        Get the precomputed /api/bootstrap response body (frame list and default frame info)
+
+        Returns:
+            Tuple of (JSON body, ETag)
+        """
+        snapshot = self.snapshot()
+        return snapshot.bootstrap_body, snapshot.bootstrap_etag
+
+    def frame_info_payload(self, frame_name: Optional[str] = None, frame_path: Optional[str] = None) -> Tuple[bytes, str]:
+        """
+        Get the precomputed /api/frame-info response body
+
+        Args:
+            frame_name: Name of the frame (takes precedence over frame_path)
+            frame_path: Path to the Frame JSON file
+
+        Returns:
+            Tuple of (JSON body, ETag)
+
+        Raises:
+            ValueError: If the frame name is not found
+        """
+        snapshot = self.snapshot()
+        if frame_name:
+            entry = snapshot.get_by_name(frame_name)
+            if entry is None:
+                raise ValueError(f"Frame '{frame_name}' not found")
+            return entry['info_body'], entry['info_etag']
+
+        entry = snapshot.by_path.get(os.path.abspath(frame_path))
+        if entry is not None:
+            return entry['info_body'], entry['info_etag']
+
+        # Frames outside the frames directory are served from the Frame cache
+        body = _success_payload(build_frame_info(load_frame_data(frame_path), frame_path))
+        return body, _make_etag(body)
+
+
+_registry: Optional[FrameRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_frame_registry() -> FrameRegistry:
+    """
+    Get the process-wide Frame registry, building its indexes on first use
+
+    Returns:
+        Shared FrameRegistry
+    """
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = FrameRegistry()
+                registry.refresh(force=True)
+                _registry = registry
+    return _registry
@@ -0,0 +1,510 @@
+"""
+Provider-call governor
+
+Every LLM call of the pipeline goes through Governor.call, which applies:
+
+- a token-bucket rate limit per model (LLM_RATE_LIMITS), optionally shared by
+  all worker processes of a host through a SQLite file (GOVERNOR_DB_PATH)
+- an AIMD adaptive concurrency limit per model: the limit grows by one call
+  per round trip and is halved on rate limit (HTTP 429) responses, timeouts
+  or calls slower than LLM_LATENCY_TARGET
+- retries with exponential backoff for rate limit responses only
+- a timeout per pipeline stage (LLM_TIMEOUT, LLM_STAGE_TIMEOUTS)
+- optional hedged requests (LLM_HEDGE_STAGES): when a call takes longer than
+  the stage's recent p95 latency, a duplicate is sent and the first result
+  wins; a loser that has not started yet is cancelled, one already running
+  finishes in the background and its result is dropped
+
+python -m benchmarks.governor_check exercises these against the fake model.
+"""
+import contextvars
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from backend import metrics
+
+
+class LLMTimeoutError(TimeoutError):
+    """A provider call (or the wait for a rate limit slot) exceeded the stage timeout"""
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Check whether a provider error is a rate limit (HTTP 429) response
+
+    Args:
+        error: Exception raised by a chat model call
+
+    Returns:
+        True for 429 responses of any provider SDK (and the fake model)
+    """
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    if getattr(getattr(error, 'response', None), 'status_code', None) == 429:
+        return True
+    return 'RateLimit' in type(error).__name__
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at rate tokens per second"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, tokens: float) -> float:
+        # Take tokens if available; otherwise return the seconds until they are
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take tokens without waiting"""
+        return self._take(tokens) <= 0
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None) -> bool:
+        """
+        Take tokens, waiting for the bucket to refill
+
+        Args:
+            tokens: Tokens to take
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if the tokens were taken, False if the timeout would be exceeded
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self._take(tokens)
+            if delay <= 0:
+                return True
+            if deadline is not None and time.monotonic() + delay > deadline:
+                return False
+            time.sleep(delay)
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """Token bucket whose state lives in a SQLite file shared by the processes of a host"""
+
+    def __init__(self, db_path: str, name: str, rate: float, burst: float):
+        super().__init__(rate, burst)
+        self.name = name
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        # Autocommit mode so the explicit BEGIN IMMEDIATE below controls the transaction
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30, isolation_level=None)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS token_buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )''')
+
+    def _take(self, tokens: float) -> float:
+        with self._lock:
+            # BEGIN IMMEDIATE serializes the read-modify-write across processes
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute('SELECT tokens, updated_at FROM token_buckets WHERE name = ?', (self.name,)).fetchone()
+                now = time.time()
+                available = self.burst if row is None else min(self.burst, row[0] + max(0.0, now - row[1]) * self.rate)
+                delay = 0.0
+                if available >= tokens:
+                    available -= tokens
+                else:
+                    delay = (tokens - available) / self.rate
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?)',
+                    (self.name, available, now)
+                )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return delay
+
+
+class AIMDLimiter:
+    """Concurrency limit with additive increase and multiplicative decrease"""
+
+    def __init__(self, initial: float = 8, min_limit: float = 1, max_limit: float = 64,
+                 decrease: float = 0.5, latency_target: float = 0.0, name: str = ''):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.decrease = decrease
+        self.latency_target = latency_target
+        self.name = name
+        self.in_flight = 0
+        # Smoothed call latency; calls failing within one round trip (one burst of 429s) decrease the limit once
+        self.round_trip = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        metrics.LLM_CONCURRENCY_LIMIT.set(self.limit, model=name)
+
+    def _has_capacity(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def try_acquire(self) -> bool:
+        """Take a call slot without waiting"""
+        with self._cond:
+            if not self._has_capacity():
+                return False
+            self.in_flight += 1
+            return True
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """
+        Take a call slot, waiting for one to free up
+
+        Args:
+            timeout: Maximum seconds to wait (None waits indefinitely)
+
+        Returns:
+            True if a slot was taken
+        """
+        with self._cond:
+            if not self._cond.wait_for(self._has_capacity, timeout):
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False) -> None:
+        """
+        Return a call slot and adapt the limit
+
+        Args:
+            latency: Duration of the call in seconds (None if it failed for
+                another reason, which leaves the limit unchanged)
+            overloaded: The provider signalled overload (rate limit or timeout)
+        """
+        with self._cond:
+            self.in_flight -= 1
+            slow = self.latency_target > 0 and latency is not None and latency > self.latency_target
+            if latency is not None:
+                self.round_trip = latency if not self.round_trip else 0.8 * self.round_trip + 0.2 * latency
+            if overloaded or slow:
+                now = time.monotonic()
+                if now - self._last_decrease >= self.round_trip:
+                    self.limit = max(self.min_limit, self.limit * self.decrease)
+                    self._last_decrease = now
+            elif latency is not None:
+                # About one more slot per round trip at the current limit
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            metrics.LLM_CONCURRENCY_LIMIT.set(self.limit, model=self.name)
+            self._cond.notify_all()
+
+
+class LatencyTracker:
+    """Recent call latencies per stage, for hedging delays"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def percentile(self, stage: str, fraction: float) -> Optional[float]:
+        """Latency below which the given fraction of recent calls finished (None until min_samples)"""
+        with self._lock:
+            samples = sorted(self._samples.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+def _env_json(name: str) -> Dict[str, Any]:
+    try:
+        value = json.loads(os.getenv(name, '{}'))
+        return value if isinstance(value, dict) else {}
+    except ValueError:
+        return {}
+
+
+class Governor:
+    """Applies rate limits, adaptive concurrency, timeouts, retries and hedging to provider calls"""
+
+    def __init__(self, rate_limits: Optional[Dict[str, Dict[str, float]]] = None, db_path: Optional[str] = None,
+                 timeout: Optional[float] = 90.0, stage_timeouts: Optional[Dict[str, float]] = None,
+                 hedge_stages: Iterable[str] = (), hedge_percentile: float = 0.95,
+                 max_retries: int = 2, backoff: float = 0.5,
+                 concurrency: Tuple[float, float, float] = (8, 1, 64), latency_target: float = 0.0,
+                 max_workers: int = 64):
+        """
+        Args:
+            rate_limits: Model name (or "*" for any model) -> {"rps": ..., "burst": ...}
+            db_path: SQLite file shared by the processes of a host for the rate
+                limits (per-process buckets if None)
+            timeout: Default seconds per provider call, including waits for a
+                slot (None or 0 disables timeouts)
+            stage_timeouts: Stage name -> seconds, overriding timeout
+            hedge_stages: Stages whose slow calls are hedged with a duplicate
+            hedge_percentile: Recent latency percentile after which to hedge
+            max_retries: Retries of calls rejected with a rate limit
+            backoff: Initial retry delay in seconds, doubled per retry
+            concurrency: (initial, minimum, maximum) concurrent calls per model
+            latency_target: Calls slower than this many seconds decrease the
+                concurrency limit (0 disables the latency signal)
+            max_workers: Threads running provider calls with a timeout
+        """
+        self.rate_limits = rate_limits or {}
+        self.db_path = db_path
+        self.timeout = timeout or None
+        self.stage_timeouts = stage_timeouts or {}
+        self.hedge_stages = set(hedge_stages)
+        self.hedge_percentile = hedge_percentile
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.concurrency = concurrency
+        self.latency_target = latency_target
+        self.latencies = LatencyTracker()
+
+        self._buckets: Dict[str, Optional[TokenBucket]] = {}
+        self._limiters: Dict[str, AIMDLimiter] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm-call')
+
+    def bucket(self, model: str) -> Optional[TokenBucket]:
+        """Rate limit bucket of a model (None if the model is not rate limited)"""
+        if model not in self._buckets:
+            with self._lock:
+                if model not in self._buckets:
+                    config = self.rate_limits.get(model) or self.rate_limits.get('*')
+                    bucket = None
+                    if config and config.get('rps'):
+                        rate = float(config['rps'])
+                        burst = float(config.get('burst', max(1.0, rate)))
+                        if self.db_path:
+                            bucket = SQLiteTokenBucket(self.db_path, model, rate, burst)
+                        else:
+                            bucket = TokenBucket(rate, burst)
+                    self._buckets[model] = bucket
+        return self._buckets[model]
+
+    def limiter(self, model: str) -> AIMDLimiter:
+        """Adaptive concurrency limiter of a model"""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self._limiters.get(model)
+                if limiter is None:
+                    initial, min_limit, max_limit = self.concurrency
+                    limiter = self._limiters[model] = AIMDLimiter(
+                        initial, min_limit, max_limit, latency_target=self.latency_target, name=model
+                    )
+        return limiter
+
+    def stage_timeout(self, stage: str) -> Optional[float]:
+        """Timeout in seconds of one call of a stage (None if disabled)"""
+        return self.stage_timeouts.get(stage, self.timeout) or None
+
+    def call(self, model: str, stage: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run one provider call under the governor
+
+        Args:
+            model: Model name (selects the rate limit and concurrency limiter)
+            stage: Pipeline stage (selects the timeout, hedging and latency window)
+            fn: Function making the call; may run in another thread and, when
+                hedged, more than once
+
+        Returns:
+            Result of fn
+
+        Raises:
+            LLMTimeoutError: If the stage timeout was exceeded
+        """
+        timeout = self.stage_timeout(stage)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._attempt(model, stage, fn, deadline)
+            except LLMTimeoutError:
+                metrics.LLM_TIMEOUTS.inc(model=model, stage=stage)
+                raise
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                metrics.LLM_RATE_LIMITED.inc(model=model)
+                delay = self.backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if attempt == self.max_retries or (deadline is not None and time.monotonic() + delay >= deadline):
+                    raise
+                time.sleep(delay)
+
+    def _remaining(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+    def _attempt(self, model: str, stage: str, fn: Callable[[], Any], deadline: Optional[float]) -> Any:
+        bucket = self.bucket(model)
+        limiter = self.limiter(model)
+        if bucket is not None and not bucket.acquire(timeout=self._remaining(deadline)):
+            raise LLMTimeoutError(f'{stage}: timed out waiting for the {model} rate limit')
+        if not limiter.acquire(timeout=self._remaining(deadline)):
+            raise LLMTimeoutError(f'{stage}: timed out waiting for a {model} call slot')
+
+        hedge_delay = self.latencies.percentile(stage, self.hedge_percentile) if stage in self.hedge_stages else None
+        if deadline is None and hedge_delay is None:
+            # Nothing to wait on concurrently, call in the current thread
+            start = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                limiter.release(overloaded=is_rate_limit_error(e))
+                raise
+            latency = time.monotonic() - start
+            limiter.release(latency)
+            self.latencies.observe(stage, latency)
+            return result
+
+        primary = self._submit(fn, stage, limiter)
+        calls = [primary]
+
+        def cancel_losers(done: Future) -> None:
+            # Runs in the winner's thread before it takes the next queued call, so a queued loser never starts
+            if not done.cancelled() and done.exception() is None:
+                self._cancel(calls, stage)
+
+        primary.add_done_callback(cancel_losers)
+        pending = {primary}
+        hedge: Optional[Future] = None
+        start = time.monotonic()
+        while True:
+            wait_for = self._remaining(deadline)
+            if hedge is None and hedge_delay is not None:
+                until_hedge = max(0.0, hedge_delay - (time.monotonic() - start))
+                wait_for = until_hedge if wait_for is None else min(wait_for, until_hedge)
+            done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                if not future.cancelled() and future.exception() is None:
+                    if future is hedge:
+                        metrics.LLM_HEDGES.inc(stage=stage, outcome='won')
+                    self._cancel(calls, stage)
+                    return future.result()
+            if done and not pending:
+                # Every call failed, report the primary's error if it has one
+                raise (primary.exception() if primary.done() and primary.exception() else next(iter(done)).exception())
+
+            if deadline is not None and time.monotonic() >= deadline:
+                # Abandoned calls keep their slot until they actually finish
+                self._cancel(calls, stage)
+                raise LLMTimeoutError(f'{stage}: no response from {model} within {self.stage_timeout(stage)}s')
+
+            if hedge is None and hedge_delay is not None and time.monotonic() - start >= hedge_delay:
+                if (bucket is None or bucket.try_acquire()) and limiter.try_acquire():
+                    hedge = self._submit(fn, stage, limiter)
+                    calls.append(hedge)
+                    hedge.add_done_callback(cancel_losers)
+                    pending.add(hedge)
+                    metrics.LLM_HEDGES.inc(stage=stage, outcome='fired')
+                else:
+                    # No spare capacity, do not add load to an overloaded provider
+                    hedge_delay = None
+
+    def _cancel(self, calls: List[Future], stage: str) -> None:
+        # Calls still queued for a thread never reach the provider; running ones cannot be interrupted
+        with self._lock:
+            for future in calls:
+                if not future.done() and future.cancel() and future is not calls[0]:
+                    metrics.LLM_HEDGES.inc(stage=stage, outcome='cancelled')
+
+    def _submit(self, fn: Callable[[], Any], stage: str, limiter: AIMDLimiter) -> Future:
+        # Each call runs in its own copy of the caller's context (metrics timings, callbacks)
+        start = time.monotonic()
+        future = self._executor.submit(contextvars.copy_context().run, fn)
+
+        timeout = self.stage_timeout(stage)
+
+        def release(done: Future) -> None:
+            if done.cancelled():
+                # Never ran, return the slot without adapting the limit
+                limiter.release()
+                return
+            error = done.exception()
+            latency = time.monotonic() - start
+            if error is None:
+                # A call that outlived the stage timeout was abandoned: treat it as overload
+                limiter.release(latency, overloaded=timeout is not None and latency >= timeout)
+                self.latencies.observe(stage, latency)
+            else:
+                limiter.release(overloaded=is_rate_limit_error(error))
+
+        future.add_done_callback(release)
+        return future
+
+    def shutdown(self) -> None:
+        """Stop the call threads (running calls are not interrupted)"""
+        self._executor.shutdown(wait=False)
+
+
+_governor: Optional[Governor] = None
+_governor_lock = threading.Lock()
+
+
+def get_governor() -> Governor:
+    """
+    Get the process-wide governor
+
+    Configured with LLM_RATE_LIMITS (JSON, e.g. {"deepseek-chat": {"rps": 5,
+    "burst": 10}}), GOVERNOR_DB_PATH, LLM_TIMEOUT, LLM_STAGE_TIMEOUTS (JSON),
+    LLM_HEDGE_STAGES (comma-separated), LLM_HEDGE_PERCENTILE, LLM_MAX_RETRIES,
+    LLM_RETRY_BACKOFF, LLM_CONCURRENCY_INITIAL/MIN/MAX and LLM_LATENCY_TARGET.
+
+    Returns:
+        Shared Governor
+    """
+    global _governor
+    if _governor is None:
+        with _governor_lock:
+            if _governor is None:
+                _governor = Governor(
+                    rate_limits=_env_json('LLM_RATE_LIMITS'),
+                    db_path=os.getenv('GOVERNOR_DB_PATH') or None,
+                    timeout=float(os.getenv('LLM_TIMEOUT', '90')),
+                    stage_timeouts={stage: float(seconds) for stage, seconds in _env_json('LLM_STAGE_TIMEOUTS').items()},
+                    hedge_stages=[stage.strip() for stage in os.getenv('LLM_HEDGE_STAGES', '').split(',') if stage.strip()],
+                    hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', '0.95')),
+                    max_retries=int(os.getenv('LLM_MAX_RETRIES', '2')),
+                    backoff=float(os.getenv('LLM_RETRY_BACKOFF', '0.5')),
+                    concurrency=(
+                        float(os.getenv('LLM_CONCURRENCY_INITIAL', '8')),
+                        float(os.getenv('LLM_CONCURRENCY_MIN', '1')),
+                        float(os.getenv('LLM_CONCURRENCY_MAX', '64'))
+                    ),
+                    latency_target=float(os.getenv('LLM_LATENCY_TARGET', '0')),
+                    max_workers=int(os.getenv('GOVERNOR_MAX_WORKERS', '64'))
+                )
+    return _governor
+
+
+def reset_governor() -> None:
+    """Drop the process-wide governor so the next call reads the configuration again"""
+    global _governor
+    with _governor_lock:
+        if _governor is not None:
+            _governor.shutdown()
+            _governor = None
@@ -0,0 +1,402 @@
+"""
+Background translation jobs
+
+Jobs are persisted in a local SQLite database and executed by an in-process
+worker pool, so long inputs do not hold a request thread and no external
+broker is needed. Each job is a list of translation items; results are stored
+per item as they finish so progress and partial results can be polled, and
+queued or interrupted jobs are picked up again after a restart.
+
+A running job is owned by the manager instance that claimed it through a
+lease that the manager renews while it runs. Jobs whose lease expired (their
+process died, on this host or before a container restart) are requeued by the
+next scan of any manager; PIDs are not used because restarted containers
+reuse them.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(PROJECT_DIR, 'data', 'jobs.sqlite3')
+
+JOB_STATUSES = ('queued', 'running', 'completed', 'failed', 'cancelled')
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+# Seconds a running job stays owned by its manager without a lease renewal
+DEFAULT_LEASE_SECONDS = 60.0
+
+
+class JobStore:
+    """SQLite persistence for jobs and their per-item results"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH):
+        self.db_path = db_path
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    worker_pid INTEGER,
+                    worker_id TEXT,
+                    lease_expires_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )''')
+            # Databases created before leases were introduced
+            columns = {row['name'] for row in self._conn.execute('PRAGMA table_info(jobs)')}
+            for column, column_type in (('worker_id', 'TEXT'), ('lease_expires_at', 'REAL')):
+                if column not in columns:
+                    self._conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {column_type}')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL,
+                    item_index INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    PRIMARY KEY (job_id, item_index)
+                )''')
+
+    def create(self, kind: str, payload: Dict[str, Any], total: int) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, status, payload, total, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, 'queued', json.dumps(payload, ensure_ascii=False), total, now, now)
+            )
+        return job_id
+
+    def claim(self, job_id: str, worker_id: str, lease_seconds: float) -> bool:
+        """Atomically move a queued job to running, leased to a manager instance"""
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                """UPDATE jobs SET status = 'running', worker_pid = ?, worker_id = ?, lease_expires_at = ?, updated_at = ?
+                   WHERE id = ? AND status = 'queued'""",
+                (os.getpid(), worker_id, now + lease_seconds, now, job_id)
+            )
+        return cursor.rowcount == 1
+
+    def renew_leases(self, worker_id: str, lease_seconds: float) -> int:
+        """Extend the leases of the running jobs of a manager instance, returning their number"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE worker_id = ? AND status = 'running'",
+                (time.time() + lease_seconds, worker_id)
+            )
+        return cursor.rowcount
+
+    def release(self, job_id: str, worker_id: str) -> None:
+        """Put a running job back in the queue, e.g. when its manager shuts down"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE jobs SET status = 'queued', worker_pid = NULL, worker_id = NULL, lease_expires_at = NULL
+                   WHERE id = ? AND worker_id = ? AND status = 'running'""",
+                (job_id, worker_id)
+            )
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?',
+                (status, error, time.time(), job_id)
+            )
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """
+        Cancel a job; queued jobs are cancelled at once, running jobs stop after the current items
+
+        Returns:
+            The job status after the request, or None if the job does not exist
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'queued'",
+                (time.time(), job_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND status = 'running'",
+                (time.time(), job_id)
+            )
+            row = self._conn.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['status'] if row else None
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute('SELECT cancel_requested FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def save_results(self, job_id: str, results: Dict[int, Dict[str, Any]]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO job_results (job_id, item_index, result) VALUES (?, ?, ?)',
+                [(job_id, index, json.dumps(result, ensure_ascii=False)) for index, result in results.items()]
+            )
+            self._conn.execute('UPDATE jobs SET updated_at = ? WHERE id = ?', (time.time(), job_id))
+
+    def completed_indexes(self, job_id: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute('SELECT item_index FROM job_results WHERE job_id = ?', (job_id,)).fetchall()
+        return [row['item_index'] for row in rows]
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None:
+                return None
+            result_rows = self._conn.execute(
+                'SELECT item_index, result FROM job_results WHERE job_id = ? ORDER BY item_index', (job_id,)
+            ).fetchall()
+        job = self._row_to_job(row, len(result_rows))
+        if include_results:
+            job['results'] = [dict(json.loads(r['result']), index=r['item_index']) for r in result_rows]
+        return job
+
+    def list(self, limit: int = 50) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute('''
+                SELECT j.*, (SELECT COUNT(*) FROM job_results r WHERE r.job_id = j.id) AS done
+                FROM jobs j ORDER BY created_at DESC LIMIT ?''', (limit,)).fetchall()
+        return [self._row_to_job(row, row['done']) for row in rows]
+
+    def get_payload(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            row = self._conn.execute('SELECT payload FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return json.loads(row['payload'])
+
+    def resumable_jobs(self) -> List[str]:
+        """Jobs left queued, or running without a valid lease (requeued here)"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                """UPDATE jobs SET status = 'queued', worker_pid = NULL, worker_id = NULL, lease_expires_at = NULL
+                   WHERE status = 'running' AND (worker_id IS NULL OR lease_expires_at IS NULL OR lease_expires_at < ?)""",
+                (time.time(),)
+            )
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row['id'] for row in rows]
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row, done: int) -> Dict[str, Any]:
+        return {
+            'id': row['id'],
+            'kind': row['kind'],
+            'status': row['status'],
+            'progress': {
+                'done': done,
+                'total': row['total'],
+                'percent': round(100.0 * done / row['total'], 1) if row['total'] else 100.0
+            },
+            'error': row['error'],
+            'cancel_requested': bool(row['cancel_requested']),
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+
+class JobManager:
+    """Executes persisted jobs on an in-process worker pool"""
+
+    def __init__(self, store: JobStore, max_workers: int = 2, item_concurrency: int = 4,
+                 translate_fn: Optional[Callable[..., Dict[str, Any]]] = None,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.store = store
+        self.item_concurrency = item_concurrency
+        self.translate_fn = translate_fn
+        self.lease_seconds = lease_seconds
+        # Identifies this manager in job leases; unlike a PID it is never reused
+        self.worker_id = uuid.uuid4().hex
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='translation-job')
+        self._stopping = threading.Event()
+        # Jobs submitted to the executor that have not started yet
+        self._scheduled = set()
+        self._scheduled_lock = threading.Lock()
+        self._heartbeat = threading.Thread(target=self._renew_leases, name='translation-job-lease', daemon=True)
+        self._heartbeat.start()
+
+    def submit(self, items: List[Dict[str, Any]], kind: str = 'translation') -> str:
+        """
+        Persist a job and schedule it
+
+        Args:
+            items: Keyword arguments for the translation function, one dict per item
+            kind: Job kind, stored for display
+
+        Returns:
+            Job id
+        """
+        job_id = self.store.create(kind, {'items': items}, len(items))
+        self._schedule(job_id)
+        return job_id
+
+    def submit_document(self, params: Dict[str, Any]) -> str:
+        """
+        Persist a document job whose items are the document's sentences
+
+        Progress and partial results are reported per sentence; the reassembled
+        document is available once the job completes.
+
+        Args:
+            params: Translation parameters, source_text being the whole document
+
+        Returns:
+            Job id
+        """
+        from backend.segmentation import segment_text
+        segments, separators = segment_text(params['source_text'])
+        items = [dict(params, source_text=segment['text']) for segment in segments]
+        document = {
+            'source_text': params['source_text'],
+            'source_language': params['source_language'],
+            'target_language': params['target_language'],
+            'segments': segments,
+            'separators': separators
+        }
+        job_id = self.store.create('document', {'items': items, 'document': document}, len(items))
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Get a job, adding the reassembled document to completed document jobs
+
+        Returns:
+            Job status, progress and results, or None if the job does not exist
+        """
+        job = self.store.get(job_id, include_results=include_results)
+        if job is not None and include_results and job['kind'] == 'document' and job['status'] == 'completed':
+            from backend.agent import build_document_result
+            document = self.store.get_payload(job_id)['document']
+            results = sorted(job['results'], key=lambda r: r['index'])
+            job['document'] = build_document_result(
+                document['source_text'],
+                document['source_language'],
+                document['target_language'],
+                document['segments'],
+                document['separators'],
+                results
+            )
+        return job
+
+    def resume(self) -> List[str]:
+        """Schedule queued jobs and jobs whose owner stopped renewing their lease"""
+        job_ids = self.store.resumable_jobs()
+        for job_id in job_ids:
+            self._schedule(job_id)
+        return job_ids
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop executing jobs
+
+        Running jobs stop after their current chunk and go back to the queue,
+        so another process resumes them without waiting for their lease to
+        expire.
+        """
+        self._stopping.set()
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _schedule(self, job_id: str) -> None:
+        with self._scheduled_lock:
+            if job_id in self._scheduled:
+                return
+            self._scheduled.add(job_id)
+        self._executor.submit(self._run, job_id)
+
+    def _renew_leases(self) -> None:
+        # Keep our leases alive and pick up jobs of managers that died
+        while not self._stopping.wait(self.lease_seconds / 3):
+            try:
+                self.store.renew_leases(self.worker_id, self.lease_seconds)
+                self.resume()
+            except Exception as e:
+                print(f"Warning: Renewing job leases failed: {e}")
+
+    def _run(self, job_id: str) -> None:
+        with self._scheduled_lock:
+            self._scheduled.discard(job_id)
+        if not self.store.claim(job_id, self.worker_id, self.lease_seconds):
+            return
+
+        from backend.agent import run_batch_translation
+        from backend.translation_memory import translate_with_memory
+        translate_fn = self.translate_fn or translate_with_memory
+
+        try:
+            items = self.store.get_payload(job_id)['items']
+            done = set(self.store.completed_indexes(job_id))
+            pending = [index for index in range(len(items)) if index not in done]
+
+            # Work in chunks so progress is persisted and cancellation is honoured between them
+            for start in range(0, len(pending), self.item_concurrency):
+                if self._stopping.is_set():
+                    self.store.release(job_id, self.worker_id)
+                    return
+                if self.store.is_cancel_requested(job_id):
+                    self.store.set_status(job_id, 'cancelled')
+                    return
+                chunk = pending[start:start + self.item_concurrency]
+                chunk_results = run_batch_translation(
+                    [items[index] for index in chunk],
+                    max_concurrency=self.item_concurrency,
+                    translate_fn=translate_fn
+                )
+                self.store.save_results(job_id, dict(zip(chunk, chunk_results)))
+
+            self.store.set_status(job_id, 'completed')
+        except Exception as e:
+            self.store.set_status(job_id, 'failed', error=str(e))
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """
+    Get the process-wide job manager, resuming interrupted jobs on first use
+
+    Configured with JOBS_DB_PATH, JOBS_MAX_WORKERS, JOBS_ITEM_CONCURRENCY and
+    JOBS_LEASE_SECONDS.
+
+    Returns:
+        Shared JobManager
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                manager = JobManager(
+                    JobStore(os.getenv('JOBS_DB_PATH', DEFAULT_DB_PATH)),
+                    max_workers=int(os.getenv('JOBS_MAX_WORKERS', '2')),
+                    item_concurrency=int(os.getenv('JOBS_ITEM_CONCURRENCY', '4')),
+                    lease_seconds=float(os.getenv('JOBS_LEASE_SECONDS', str(DEFAULT_LEASE_SECONDS)))
+                )
+                manager.resume()
+                _manager = manager
+    return _manager
+
+
+def shutdown_job_manager(wait: bool = True) -> None:
+    """Shut down the process-wide job manager, if it was started"""
+    if _manager is not None:
+        _manager.shutdown(wait=wait)
@@ -0,0 +1,311 @@
+"""
+Process-wide LLM client registry
+
+Chat model clients are created once per (model name, temperature) and shared by
+every graph node and request. All clients share a single keep-alive HTTP
+connection pool so TLS connections to the provider are reused across requests.
+
+Each pipeline stage can use its own model (ANALYSIS_MODEL, TRANSLATION_MODEL),
+given as a comma-separated fallback chain. With FAST_MODEL set, short inputs
+(and somewhat longer ones whose prompt prefix the fast model has cached) are
+routed to the cheaper model first; see route_models.
+"""
+import os
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    import httpx
+
+# Load environment variables once at import time
+load_dotenv()
+
+DEFAULT_TEMPERATURE = 0.1
+
+# Environment variable holding the model chain of each stage (graph node)
+STAGE_MODEL_ENV = {
+    "analyze_frame": "ANALYSIS_MODEL",
+    "analyze_frame_repair": "ANALYSIS_MODEL",
+    "translate": "TRANSLATION_MODEL",
+    "refine": "TRANSLATION_MODEL",
+    "draft_translate": "TRANSLATION_MODEL",
+    "fast_translate": "TRANSLATION_MODEL"
+}
+
+# Registry of created clients keyed by (model name, temperature)
+_clients: Dict[Tuple[str, float], Any] = {}
+_clients_lock = threading.Lock()
+
+# Shared HTTP client used by every chat model client
+_http_client: Optional['httpx.Client'] = None
+_http_client_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def get_default_model_name() -> str:
+    """
+    Get the configured default model name
+
+    Returns:
+        Model name from DEFAULT_MODEL (defaults to deepseek-chat)
+    """
+    return os.getenv("DEFAULT_MODEL", "deepseek-chat")
+
+
+def _model_chain(value: Optional[str]) -> List[str]:
+    return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+
+def get_stage_models(stage: str) -> List[str]:
+    """
+    Get the configured model chain of a stage
+
+    Args:
+        stage: Pipeline stage (graph node), e.g. "analyze_frame" or "translate"
+
+    Returns:
+        Model names to try in order; the stage's variable from STAGE_MODEL_ENV
+        (e.g. ANALYSIS_MODEL=deepseek-chat,gpt-4o-mini), else DEFAULT_MODEL
+    """
+    return _model_chain(os.getenv(STAGE_MODEL_ENV.get(stage, ""))) or [get_default_model_name()]
+
+
+def get_fast_model_stages() -> List[str]:
+    """Stages FAST_MODEL may be used for (FAST_MODEL_STAGES, defaults to all stages)"""
+    return _model_chain(os.getenv("FAST_MODEL_STAGES")) or list(STAGE_MODEL_ENV)
+
+
+# (model, prompt prefix) -> time of the last successful call, for routing to cache-warm models
+_warm_prefixes: Dict[Tuple[str, int], float] = {}
+_warm_prefixes_lock = threading.Lock()
+
+
+def mark_prefix_warm(model_name: str, prefix: str) -> None:
+    """
+    Remember that a model just served a prompt prefix (and likely cached it)
+
+    Args:
+        model_name: Model that served the call
+        prefix: Static prompt prefix of the call
+    """
+    ttl = _env_float("PROMPT_CACHE_TTL", 300.0)
+    now = time.monotonic()
+    with _warm_prefixes_lock:
+        _warm_prefixes[(model_name, hash(prefix))] = now
+        if len(_warm_prefixes) > 1024:
+            for key, seen in list(_warm_prefixes.items()):
+                if now - seen > ttl:
+                    del _warm_prefixes[key]
+
+
+def is_prefix_warm(model_name: str, prefix: str) -> bool:
+    """Whether the model served the prefix within PROMPT_CACHE_TTL seconds (default 300)"""
+    seen = _warm_prefixes.get((model_name, hash(prefix)))
+    return seen is not None and time.monotonic() - seen <= _env_float("PROMPT_CACHE_TTL", 300.0)
+
+
+def route_models(stage: str, source_text: str, prefix: Optional[str] = None) -> List[str]:
+    """
+    Choose the models to try for one call
+
+    With FAST_MODEL set, inputs of at most FAST_MODEL_MAX_CHARS characters
+    (default 80), or of at most FAST_MODEL_WARM_MAX_CHARS (default 4 times
+    that) when the fast model has the call's prompt prefix cached, try the
+    fast model first and fall back to the stage's chain.
+
+    Args:
+        stage: Pipeline stage (graph node)
+        source_text: Source text of the request
+        prefix: Static prompt prefix of the call, if any
+
+    Returns:
+        Model names to try in order
+    """
+    models = get_stage_models(stage)
+    fast_model = os.getenv("FAST_MODEL", "").strip()
+    if not fast_model or stage not in get_fast_model_stages():
+        return models
+
+    max_chars = _env_int("FAST_MODEL_MAX_CHARS", 80)
+    warm_max_chars = _env_int("FAST_MODEL_WARM_MAX_CHARS", max_chars * 4)
+    length = len(source_text)
+    if length <= max_chars or (length <= warm_max_chars and prefix is not None and is_prefix_warm(fast_model, prefix)):
+        return [fast_model] + [model for model in models if model != fast_model]
+    return models
+
+
+def get_model_config_id() -> str:
+    """
+    Identify the model configuration, e.g. for translation memory scopes
+
+    Returns:
+        DEFAULT_MODEL, followed by the stage chains and fast model routing
+        when any of them is configured
+    """
+    parts = [get_default_model_name()]
+    for env_name in dict.fromkeys(STAGE_MODEL_ENV.values()):
+        if os.getenv(env_name):
+            parts.append(f"{env_name}={','.join(_model_chain(os.getenv(env_name)))}")
+    if os.getenv("FAST_MODEL"):
+        parts.append(f"FAST_MODEL={os.getenv('FAST_MODEL').strip()}@{','.join(get_fast_model_stages())}")
+    return ";".join(parts)
+
+
+def get_http_client() -> 'httpx.Client':
+    """
+    Get the shared keep-alive HTTP client
+
+    The pool can be tuned with LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY (seconds) and LLM_HTTP_TIMEOUT (seconds).
+
+    Returns:
+        Shared httpx client
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                import httpx
+                limits = httpx.Limits(
+                    max_connections=_env_int("LLM_MAX_CONNECTIONS", 100),
+                    max_keepalive_connections=_env_int("LLM_MAX_KEEPALIVE_CONNECTIONS", 20),
+                    keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 60.0),
+                )
+                _http_client = httpx.Client(
+                    limits=limits,
+                    timeout=_env_float("LLM_HTTP_TIMEOUT", 120.0),
+                )
+    return _http_client
+
+
+def _create_llm(model_name: str, temperature: float):
+    # Offline stand-in for benchmarks and local development
+    if model_name.lower().startswith("fake"):
+        from backend.fake_llm import FakeChatModel
+        seed = os.getenv("FAKE_LLM_SEED")
+        return FakeChatModel(
+            latency=_env_float("FAKE_LLM_LATENCY", 0.5),
+            jitter=_env_float("FAKE_LLM_JITTER", 0.0),
+            tokens_per_second=_env_float("FAKE_LLM_TOKENS_PER_SECOND", 0.0),
+            seed=int(seed) if seed else None,
+            capacity=_env_int("FAKE_LLM_CAPACITY", 0),
+            rate_limit_rate=_env_float("FAKE_LLM_RATE_LIMIT_RATE", 0.0),
+            tail_rate=_env_float("FAKE_LLM_TAIL_RATE", 0.0),
+            tail_latency=_env_float("FAKE_LLM_TAIL_LATENCY", 0.0)
+        )
+
+    http_client = get_http_client()
+
+    # Check if using DeepSeek or OpenAI
+    if "deepseek" in model_name.lower():
+        try:
+            from langchain_deepseek import ChatDeepSeek
+        except (ImportError, AttributeError) as e:
+            error_message = f"""
+ERROR: DeepSeek integration not found. Please install the required packages:
+
+    pip install langchain-deepseek
+    pip install langchain-community
+
+If you've already installed these packages and still see this error,
+you may need to check your Python environment or try:
+
+    pip install --upgrade langchain-deepseek langchain-community
+
+Error details: {str(e)}
+"""
+            print(error_message, file=sys.stderr)
+            raise ImportError(error_message)
+        return ChatDeepSeek(
+            model=model_name,
+            temperature=temperature,
+            http_client=http_client,
+            # Rate limit retries are handled by backend.governor
+            max_retries=0
+        )
+
+    # Using OpenAI
+    if not os.getenv("OPENAI_API_KEY"):
+        raise ValueError(
+            "OpenAI API key not found. Please set OPENAI_API_KEY in your .env file, "
+            "or change DEFAULT_MODEL to a DeepSeek model."
+        )
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=model_name,
+        temperature=temperature,
+        http_client=http_client,
+        max_retries=0
+    )
+
+
+def get_llm(model_name: Optional[str] = None, temperature: float = DEFAULT_TEMPERATURE):
+    """
+    Get a shared chat model client
+
+    Args:
+        model_name: Model name (defaults to DEFAULT_MODEL)
+        temperature: Sampling temperature
+
+    Returns:
+        Chat model client, created on first use and reused afterwards
+    """
+    key = (model_name or get_default_model_name(), float(temperature))
+    llm = _clients.get(key)
+    if llm is not None:
+        return llm
+
+    with _clients_lock:
+        llm = _clients.get(key)
+        if llm is None:
+            # Build outside of the dict so a failed construction is not cached
+            llm = _create_llm(*key)
+            _clients[key] = llm
+    return llm
+
+
+def warm_up_llm_clients() -> None:
+    """
+    Create the clients of every configured model ahead of the first request
+
+    Failures are reported but not raised so the web UI can still start
+    without API credentials.
+    """
+    models = [model for stage in STAGE_MODEL_ENV for model in get_stage_models(stage)]
+    if os.getenv("FAST_MODEL", "").strip():
+        models.append(os.getenv("FAST_MODEL").strip())
+    for model_name in dict.fromkeys(models):
+        try:
+            get_llm(model_name)
+        except Exception as e:
+            print(f"Warning: Unable to initialize LLM client for {model_name}: {str(e)}", file=sys.stderr)
+
+
+def reset_llm_clients() -> None:
+    """Drop all cached clients and close the shared HTTP connection pool"""
+    global _http_client
+    with _clients_lock:
+        _clients.clear()
+    with _warm_prefixes_lock:
+        _warm_prefixes.clear()
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
@@ -0,0 +1,239 @@
+"""
+Lightweight metrics with Prometheus text exposition
+
+Stage timings, token counts, cache lookups and errors are recorded into
+process-wide counters and histograms rendered by /metrics. A per-request
+timings dict can be collected alongside (see start_request_timings) and
+returned to API callers.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: _LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = [(k, v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class Counter:
+    """Monotonically increasing value per label set"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[_LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return '\n'.join(lines)
+
+
+class Gauge:
+    """Current value per label set"""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[_LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return '\n'.join(lines)
+
+
+class Histogram:
+    """Cumulative bucket histogram per label set"""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., +Inf count, sum]
+        self._values: Dict[_LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            counts[len(self.buckets)] += 1
+            counts[-1] += value
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                for index, bound in enumerate(self.buckets):
+                    lines.append(f'{self.name}_bucket{_format_labels(key, ("le", repr(bound)))} {counts[index]}')
+                lines.append(f'{self.name}_bucket{_format_labels(key, ("le", "+Inf"))} {counts[len(self.buckets)]}')
+                lines.append(f'{self.name}_sum{_format_labels(key)} {counts[-1]}')
+                lines.append(f'{self.name}_count{_format_labels(key)} {counts[len(self.buckets)]}')
+        return '\n'.join(lines)
+
+
+STAGE_SECONDS = Histogram('translation_stage_seconds', 'Time spent in each translation pipeline stage')
+STAGE_ERRORS = Counter('translation_stage_errors_total', 'Exceptions raised by translation pipeline stages')
+LLM_TOKENS = Counter('llm_tokens_total', 'Tokens reported by the model provider')
+LLM_COST = Counter('llm_cost_usd_total', 'Estimated model cost from LLM_PRICES')
+CACHE_LOOKUPS = Counter('translation_cache_lookups_total', 'Translation memory lookups by result')
+HTTP_SECONDS = Histogram('http_request_duration_seconds', 'Flask request handling time (until the response body starts)')
+HTTP_REQUESTS = Counter('http_requests_total', 'Flask requests by route and status')
+LLM_RATE_LIMITED = Counter('llm_rate_limited_total', 'Provider calls rejected with a rate limit (HTTP 429)')
+LLM_TIMEOUTS = Counter('llm_timeouts_total', 'Provider calls abandoned after the stage timeout')
+LLM_HEDGES = Counter('llm_hedged_requests_total', 'Hedged duplicate provider calls by outcome')
+LLM_CONCURRENCY_LIMIT = Gauge('llm_concurrency_limit', 'Adaptive concurrency limit of provider calls per model')
+COALESCED_CALLS = Counter('coalesced_calls_total', 'Calls that waited for an identical in-flight execution instead of running')
+LLM_FALLBACKS = Counter('llm_fallbacks_total', 'Failed provider calls retried with the next model of the stage chain')
+PRE_ANNOTATIONS = Counter('pre_annotations_total', 'Rule-based analyses used instead of the LLM call or escalated to it')
+CANCELLED_TRANSLATIONS = Counter('cancelled_translations_total', 'Streamed translations stopped because the client went away')
+
+REGISTRY = (STAGE_SECONDS, STAGE_ERRORS, LLM_TOKENS, LLM_COST, CACHE_LOOKUPS, HTTP_SECONDS, HTTP_REQUESTS,
+            LLM_RATE_LIMITED, LLM_TIMEOUTS, LLM_HEDGES, LLM_CONCURRENCY_LIMIT, COALESCED_CALLS,
+            LLM_FALLBACKS, PRE_ANNOTATIONS, CANCELLED_TRANSLATIONS)
+
+# Timings of the request being handled, stage name -> seconds
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar('request_timings', default=None)
+
+
+def render_metrics() -> str:
+    """
+    Render all metrics in the Prometheus text exposition format
+
+    Returns:
+        Exposition text
+    """
+    return '\n'.join(metric.render() for metric in REGISTRY) + '\n'
+
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Start collecting stage timings for the current request (context)
+
+    Returns:
+        Dict that the stages of this request add their durations to
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def get_request_timings() -> Optional[Dict[str, float]]:
+    """Get the timings dict of the current request, if one was started"""
+    return _request_timings.get()
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """Record a stage duration in the histogram and the current request's timings"""
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """
+    Time a pipeline stage
+
+    Exceptions are counted per stage and re-raised.
+
+    Args:
+        name: Stage name, e.g. "analyze_frame.llm"
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+
+def _load_prices() -> Dict[str, Dict[str, float]]:
+    # LLM_PRICES='{"deepseek-chat": {"input": 0.27, "cached_input": 0.07, "output": 1.10}}' (USD per million tokens)
+    try:
+        return json.loads(os.getenv('LLM_PRICES', '{}'))
+    except ValueError:
+        return {}
+
+
+_prices = _load_prices()
+
+
+def record_llm_usage(stage_name: str, model: str, usage: Dict[str, int]) -> None:
+    """
+    Record provider-reported token usage (and estimated cost) for one LLM call
+
+    Args:
+        stage_name: Pipeline stage (graph node) that made the call
+        model: Model name
+        usage: Dict with input_tokens and output_tokens, optionally
+            cached_input_tokens (input tokens served from the provider's prompt cache)
+    """
+    input_tokens = usage.get('input_tokens', 0)
+    output_tokens = usage.get('output_tokens', 0)
+    cached_input_tokens = usage.get('cached_input_tokens', 0)
+    LLM_TOKENS.inc(input_tokens, stage=stage_name, model=model, kind='input')
+    LLM_TOKENS.inc(output_tokens, stage=stage_name, model=model, kind='output')
+    if cached_input_tokens:
+        LLM_TOKENS.inc(cached_input_tokens, stage=stage_name, model=model, kind='cached_input')
+
+    price = _prices.get(model)
+    if price:
+        # Cached input tokens are billed at the "cached_input" price when one is configured
+        cached_price = price.get('cached_input', price.get('input', 0.0))
+        cost = ((input_tokens - cached_input_tokens) * price.get('input', 0.0)
+                + cached_input_tokens * cached_price
+                + output_tokens * price.get('output', 0.0)) / 1e6
+        LLM_COST.inc(cost, stage=stage_name, model=model)
+
+
+def record_cache_lookup(result: str) -> None:
+    """Count a translation memory lookup ("exact", "fuzzy", "miss" or "bypass")"""
+    CACHE_LOOKUPS.inc(result=result)
@@ -0,0 +1,464 @@
+"""
+Rule-based Frame element pre-annotation
+
+Each Frame file is compiled once into lexical unit patterns (English
+inflections and Japanese stems, as in frame_detection) and element cues: the
+preposition or particle that introduces each element in the annotated
+examples, the Japanese particles named in the grammatical notes ("'を' marks
+the Goods") and the particles following tagged elements of the Japanese
+translation example. Annotating a sentence splits it at the lexical unit, the
+cues and time expressions and assigns each chunk to an element, without an
+LLM call. The confidence is the share of the sentence covered by the lexical
+unit and assigned chunks. Auxiliaries and negators belong to the verb group
+and never enter a span, and chunks end at clause boundaries ("and", "but",
+"who", "which" followed by a verb). Sentences whose structure the cues do not
+model (negation, questions, imperatives, passives, double objects, conjoined
+clauses sharing a subject) get a lowered confidence so they escalate to the
+LLM.
+
+With PRE_ANNOTATOR_ENABLED=1, analyze_frame uses a pre-annotation instead of
+the LLM call when its confidence reaches PRE_ANNOTATOR_THRESHOLD (default
+0.9). It is off by default; python -m benchmarks.pre_annotator_report shows
+its precision at the threshold on held-out sentences.
+"""
+import os
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from backend.example_selector import collect_examples
+from backend.frame_detection import english_forms, japanese_forms
+from backend.frame_registry import normalize_lemma
+from backend.utils import load_frame_data
+
+# Words that open a prepositional chunk even when no example shows them
+PREPOSITIONS = {
+    'about', 'across', 'after', 'along', 'around', 'at', 'before', 'by', 'during', 'for', 'from', 'in',
+    'into', 'near', 'of', 'on', 'onto', 'over', 'since', 'through', 'to', 'toward', 'towards', 'under',
+    'until', 'via', 'with', 'within', 'without'
+}
+# Words that end a chunk without starting one ("flew to Tokyo and bought a camera")
+CONJUNCTIONS = {'and', 'but', 'or', 'then', 'so'}
+# Verb group words, never part of an element span ("did not buy", "will buy")
+AUXILIARIES = {
+    'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being', 'do', 'does', 'did', 'have', 'has', 'had',
+    'will', 'would', 'shall', 'should', 'can', 'could', 'may', 'might', 'must'
+}
+_BE_FORMS = {'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being'}
+NEGATORS = {'not', 'never', 'no', 'nobody', 'nothing', 'none', 'neither', 'nor', 'nowhere'}
+WH_WORDS = {'who', 'whom', 'whose', 'what', 'which', 'where', 'when', 'why', 'how'}
+# Words outside the Frame elements ("Please buy ...")
+DISCOURSE_WORDS = {'please'}
+# Words that start a new clause when a verb follows ("bought tickets and flew to Paris")
+CLAUSE_MARKERS = {'and', 'but', 'who', 'which'}
+# Common irregular past forms, verbs without an -ed ending that can start a clause
+IRREGULAR_PAST = {
+    'bought', 'brought', 'came', 'drove', 'flew', 'gave', 'got', 'left', 'made', 'met', 'paid', 'ran', 'rode',
+    'said', 'sold', 'spent', 'took', 'told', 'went', 'won', 'wrote'
+}
+# Words that open a noun phrase; a second one after the verb means a second object ("bought Mary a ring")
+DETERMINERS = {
+    'a', 'an', 'the', 'some', 'any', 'every', 'each', 'my', 'your', 'his', 'her', 'its', 'our', 'their'
+}
+OBJECT_PRONOUNS = {'me', 'him', 'us', 'them'}
+PARTICLES = ('から', 'まで', 'より', 'が', 'は', 'を', 'に', 'で', 'へ', 'と')
+
+_ENGLISH_TIME_RE = re.compile(
+    r"\b(?:yesterday|today|tomorrow|tonight|recently|"
+    r"(?:last|next|this|every)\s+(?:day|night|week|weekend|month|year|morning|afternoon|evening|monday|tuesday|wednesday|thursday|friday|saturday|sunday))\b",
+    re.IGNORECASE
+)
+_JAPANESE_TIME_WORDS = ('昨日', '今日', '明日', '今朝', '昨夜', '今夜', '先週', '今週', '来週', '先月', '今月', '来月',
+                        '去年', '今年', '来年', '毎日', '毎週', '毎月', '毎朝', '週末')
+_JAPANESE_WH_WORDS = ('誰', '何', 'どこ', 'いつ', 'どれ', 'どの', 'なぜ', 'どう')
+# Conjugation endings of negated verbs (買わない, 買わなかった, 買いません)
+_JAPANESE_NEGATIVE_RE = re.compile(r'(?:な[いかく]|ません|ず)')
+# Conjugation endings of requests and commands at the end of a sentence (買ってください, 買え)
+_JAPANESE_IMPERATIVE_RE = re.compile(r'(?:ください|なさい|ましょう|て|え|ろ)$')
+# Tokens of English text: words, numbers and amounts ("$25,000", "787", "one's")
+_TOKEN_RE = re.compile(r"[\w$€£¥][\w$€£¥,.'’%-]*[\w%]|[\w$€£¥]")
+_TAG_RE = re.compile(r'\[([A-Za-z_]+)\]')
+_QUOTED_RE = re.compile(r"'([^']+)'")
+_MARKS_RE = re.compile(r'marks?\s+the\s+([A-Za-z_]+)')
+_AMOUNT_RE = re.compile(r'[$€£¥]|\b(?:dollars?|yen|euros?|cents?)\b|ドル|円|ユーロ', re.IGNORECASE)
+_CONTENT_RE = re.compile(r'[\w$€£¥%]')
+# Elements that only hold amounts
+_AMOUNT_TYPES = {'Asset', 'Quantity'}
+# Confidence factor of sentences the cues do not model, keeps them below any sensible threshold
+UNMODELED_PENALTY = 0.5
+
+
+def _is_hiragana(char: str) -> bool:
+    return 'ぁ' <= char <= 'ゟ'
+
+
+def _word(token: str) -> str:
+    return token.lower().replace('’', "'")
+
+
+def _is_negator(word: str) -> bool:
+    return word in NEGATORS or word.endswith("n't")
+
+
+def _is_function_word(word: str) -> bool:
+    # Verb group and discourse words, skipped when chunking ("didn't", "won't", "please")
+    return word in AUXILIARIES or word in DISCOURSE_WORDS or _is_negator(word)
+
+
+def _content_length(text: str) -> int:
+    # Characters that count towards coverage (no spaces or punctuation)
+    return len(_CONTENT_RE.findall(text))
+
+
+class FrameAnnotator:
+    """Pattern-based annotator compiled from one Frame"""
+
+    def __init__(self, frame_data: Dict[str, Any]):
+        self.frame_name = frame_data.get('frame_name', '')
+        groups = frame_data.get('frame_elements', {})
+        self.element_types = {
+            element['name']: element.get('semantic_type', '')
+            for group in ('core_elements', 'non_core_elements')
+            for element in groups.get(group, [])
+        }
+        self.core_elements = {element['name'] for element in groups.get('core_elements', [])}
+
+        english_lemmas = [normalize_lemma(lu.get('lemma', '')) for lu in frame_data.get('lexical_units', [])]
+        english = sorted({form for lemma in english_lemmas if lemma for form in english_forms(lemma)}, key=len, reverse=True)
+        self._english_lu_re = re.compile(r'\b(?:' + '|'.join(map(re.escape, english)) + r')\b', re.IGNORECASE) if english else None
+
+        japanese_info = frame_data.get('language_specific_variations', {}).get('Japanese', {})
+        japanese_lemmas = [normalize_lemma(lemma) for lemma in japanese_info.get('lexical_units', [])]
+        self._japanese_forms = sorted({form for lemma in japanese_lemmas if lemma for form in japanese_forms(lemma)}, key=len, reverse=True)
+
+        # Cue -> element -> (count, whether the cue is part of the span)
+        self.english_cues: Dict[str, Dict[str, List[Any]]] = {}
+        self.japanese_cues: Dict[str, Dict[str, List[Any]]] = {}
+        self._learn_english(collect_examples(frame_data))
+        self._learn_japanese(frame_data, japanese_info.get('grammatical_notes', ''))
+
+    def _add_cue(self, cues: Dict[str, Dict[str, List[Any]]], cue: str, element: str, include: bool = False) -> None:
+        if element not in self.element_types:
+            return
+        entry = cues.setdefault(cue, {}).setdefault(element, [0, include])
+        entry[0] += 1
+
+    def _learn_english(self, examples: List[Dict[str, Any]]) -> None:
+        for example in examples:
+            if example['language'] != 'English':
+                continue
+            text = example['text']
+            lexical_unit = example['annotation'].get('lexical_unit')
+            lu_start = text.find(lexical_unit) if isinstance(lexical_unit, str) else -1
+            if lu_start < 0:
+                continue
+            lu_end = lu_start + len(lexical_unit)
+            for element, span in example['annotation'].items():
+                start = text.find(span) if isinstance(span, str) and element != 'lexical_unit' else -1
+                if start < 0:
+                    continue
+                first_word = span.split()[0].lower()
+                preceding = text[:start].split()
+                if _ENGLISH_TIME_RE.fullmatch(span):
+                    self._add_cue(self.english_cues, '<time>', element)
+                elif first_word in PREPOSITIONS:
+                    self._add_cue(self.english_cues, first_word, element, include=True)
+                elif preceding and preceding[-1].lower() in PREPOSITIONS:
+                    self._add_cue(self.english_cues, preceding[-1].lower(), element)
+                elif start + len(span) <= lu_start:
+                    self._add_cue(self.english_cues, '<subject>', element)
+                elif not text[lu_end:start].strip():
+                    self._add_cue(self.english_cues, '<object>', element)
+                elif ' ' not in span:
+                    # A bare word after the object ("online")
+                    self._add_cue(self.english_cues, span.lower(), element, include=True)
+
+    def _learn_japanese(self, frame_data: Dict[str, Any], grammatical_notes: str) -> None:
+        # "'が' or 'は' often mark the Buyer, 'を' marks the Goods, ..."
+        for clause in re.split(r',|\band\b', grammatical_notes):
+            marked = _MARKS_RE.search(clause)
+            if marked:
+                for particle in _QUOTED_RE.findall(clause[:marked.start()]):
+                    self._add_cue(self.japanese_cues, particle, marked.group(1))
+
+        # "お客様[Buyer]は昨日[Time]オンラインストア[Seller]から..."
+        tagged = frame_data.get('few_shot_prompts', {}).get('expected_translation', {}).get('Japanese', '')
+        for match in _TAG_RE.finditer(tagged):
+            after = tagged[match.end():]
+            particle = next((p for p in PARTICLES if after.startswith(p)), None)
+            if particle:
+                self._add_cue(self.japanese_cues, particle, match.group(1))
+            elif self.element_types.get(match.group(1)) == 'Time':
+                self._add_cue(self.japanese_cues, '<time>', match.group(1))
+
+    def _choose(self, cues: Dict[str, Dict[str, List[Any]]], cue: str, chunk: str, used: set) -> Optional[Tuple[str, bool]]:
+        # Most frequent unused element of the cue that fits the chunk (amounts only for Asset/Quantity elements)
+        is_amount = bool(_AMOUNT_RE.search(chunk))
+        candidates = [
+            (count, element, include) for element, (count, include) in cues.get(cue, {}).items()
+            if element not in used and (self.element_types.get(element) in _AMOUNT_TYPES) == is_amount
+        ]
+        if not candidates:
+            if cue == '<time>':
+                time_elements = [name for name, kind in self.element_types.items() if kind == 'Time' and name not in used]
+                return (time_elements[0], True) if len(time_elements) == 1 else None
+            return None
+        _, element, include = max(candidates, key=lambda c: c[0])
+        return element, include
+
+    def _clause_boundaries(self, text: str) -> List[Tuple[int, int]]:
+        # Spans of the clause markers followed by a verb
+        tokens = list(_TOKEN_RE.finditer(text))
+        boundaries = []
+        for token, following in zip(tokens, tokens[1:]):
+            if _word(token.group(0)) not in CLAUSE_MARKERS:
+                continue
+            word = _word(following.group(0))
+            if (_is_function_word(word) or word in IRREGULAR_PAST or word.endswith('ed')
+                    or self._english_lu_re is not None and self._english_lu_re.fullmatch(following.group(0))):
+                boundaries.append(token.span())
+        return boundaries
+
+    def _english_chunks(self, text: str, start: int, end: int) -> List[Tuple[Optional[str], int, int, int]]:
+        # (cue, chunk start, content start after the cue, chunk end) for the tokens in text[start:end]
+        time_spans = [m.span() for m in _ENGLISH_TIME_RE.finditer(text, start, end)]
+        chunks: List[List[Any]] = []
+        closed = False
+        for token in _TOKEN_RE.finditer(text, start, end):
+            word = _word(token.group(0))
+            if word in CONJUNCTIONS or _is_function_word(word):
+                closed = True
+                continue
+            time_span = next((span for span in time_spans if span[0] <= token.start() < span[1]), None)
+            if time_span is not None:
+                if chunks and chunks[-1][0] == '<time>' and chunks[-1][1] >= time_span[0]:
+                    chunks[-1][3] = token.end()
+                else:
+                    chunks.append(['<time>', token.start(), token.start(), token.end()])
+            elif word in PREPOSITIONS or word in self.english_cues:
+                chunks.append([word, token.start(), token.end(), token.end()])
+            elif chunks and not closed and chunks[-1][0] != '<time>' and ',' not in text[chunks[-1][3]:token.start()]:
+                chunks[-1][3] = token.end()
+            else:
+                chunks.append([None, token.start(), token.start(), token.end()])
+            closed = False
+        return [tuple(chunk) for chunk in chunks]
+
+    def annotate_english(self, text: str) -> Tuple[Optional[Dict[str, str]], float]:
+        """
+        Annotate an English sentence
+
+        Returns:
+            (analysis, confidence); analysis is None if no lexical unit was found
+        """
+        match = self._english_lu_re.search(text) if self._english_lu_re else None
+        if match is None:
+            return None, 0.0
+        analysis = {'lexical_unit': match.group(0)}
+        covered = _content_length(match.group(0))
+        words = [(_word(token.group(0)), token.start()) for token in _TOKEN_RE.finditer(text)]
+        covered += sum(_content_length(word) for word, _ in words if _is_function_word(word))
+
+        # Only the clause of the lexical unit is annotated, its subject and object end at the clause boundaries
+        boundaries = self._clause_boundaries(text)
+        clause_start = max((end for start, end in boundaries if end <= match.start()), default=0)
+        clause_end = min((start for start, end in boundaries if start >= match.end()), default=len(text))
+        before = self._english_chunks(text, clause_start, match.start())
+        after = self._english_chunks(text, match.end(), clause_end)
+        bare_before = [chunk for chunk in before if chunk[0] is None]
+        object_chunk = after[0] if after and after[0][0] is None else None
+
+        for chunk in before + after:
+            cue, chunk_start, content_start, chunk_end = chunk
+            if cue is None:
+                cue = '<subject>' if chunk is (bare_before[-1] if bare_before else None) else '<object>' if chunk is object_chunk else None
+            if cue is None:
+                continue
+            chosen = self._choose(self.english_cues, cue, text[chunk_start:chunk_end], set(analysis))
+            if chosen is None:
+                continue
+            element, include = chosen
+            span = text[chunk_start if include or cue in ('<time>', '<subject>', '<object>') else content_start:chunk_end]
+            if not span.strip():
+                continue
+            analysis[element] = span.strip(' ,')
+            covered += _content_length(text[chunk_start:chunk_end])
+
+        before_lu = [word for word, start in words if start < match.start()]
+        unmodeled = (
+            any(_is_negator(word) for word, _ in words)
+            or text.rstrip().endswith('?')
+            or any(word in WH_WORDS for word, _ in words)
+            # Subject-auxiliary inversion ("Did John buy ...")
+            or bool(before_lu) and before_lu[0] in AUXILIARIES
+            # Imperative: nothing but discourse words before the verb ("Buy now!", "Please buy ...")
+            or all(word in DISCOURSE_WORDS for word in before_lu)
+            # Passive: the Goods come first ("The car was bought by John")
+            or bool(before_lu) and before_lu[-1] in _BE_FORMS and match.group(0).lower().endswith(('ed', 'ght', 'en'))
+            # Conjoined clause sharing an earlier subject ("We bought tickets and flew to Paris")
+            or clause_start > 0
+            # Double object: the recipient before the Goods ("John bought Mary a ring")
+            or object_chunk is not None and self._is_double_object(text, object_chunk)
+        )
+        return analysis, self._confidence(analysis, covered, text, unmodeled)
+
+    @staticmethod
+    def _is_double_object(text: str, chunk: Tuple[Optional[str], int, int, int]) -> bool:
+        words = [_word(token.group(0)) for token in _TOKEN_RE.finditer(text, chunk[1], chunk[3])]
+        if len(words) > 1 and words[0] in OBJECT_PRONOUNS:
+            return True
+        return any(word in DETERMINERS or word[0].isdigit() or _AMOUNT_RE.match(word) for word in words[1:])
+
+    def _japanese_lexical_unit(self, text: str) -> Optional[Tuple[int, int]]:
+        for form in self._japanese_forms:
+            start = text.find(form)
+            if start >= 0:
+                end = start + len(form)
+                # Conjugation: the hiragana that follow the stem (買いました, 購入した)
+                while end < len(text) and _is_hiragana(text[end]):
+                    end += 1
+                return start, end
+        return None
+
+    def annotate_japanese(self, text: str) -> Tuple[Optional[Dict[str, str]], float]:
+        """
+        Annotate a Japanese sentence
+
+        Returns:
+            (analysis, confidence); analysis is None if no lexical unit was found
+        """
+        lexical_unit = self._japanese_lexical_unit(text)
+        if lexical_unit is None:
+            return None, 0.0
+        lu_start, lu_end = lexical_unit
+        analysis = {'lexical_unit': text[lu_start:lu_end]}
+        covered = _content_length(analysis['lexical_unit'])
+
+        # Split the text before the lexical unit into "<phrase><particle>" chunks and time words
+        chunks: List[Tuple[str, int, int]] = []
+        chunk_start = index = 0
+        while index < lu_start:
+            time_word = next((w for w in _JAPANESE_TIME_WORDS if text.startswith(w, index)), None)
+            if time_word:
+                chunks.append(('<time>', index, index + len(time_word)))
+                index += len(time_word)
+                chunk_start = index
+                continue
+            particle = next((p for p in PARTICLES if text.startswith(p, index)), None)
+            if particle and index > chunk_start and not _is_hiragana(text[index - 1]):
+                following = index + len(particle)
+                if following >= lu_start or not _is_hiragana(text[following]):
+                    chunks.append((particle, chunk_start, index))
+                    index = chunk_start = following
+                    continue
+            index += 1
+
+        for cue, start, end in chunks:
+            chosen = self._choose(self.japanese_cues, cue, text[start:end], set(analysis))
+            if chosen is None:
+                continue
+            analysis[chosen[0]] = text[start:end]
+            covered += _content_length(text[start:end + (0 if cue == '<time>' else len(cue))])
+
+        lexical_unit_text = analysis['lexical_unit']
+        rest = text[lu_end:].strip().rstrip('。．.！!')
+        unmodeled = (
+            bool(_JAPANESE_NEGATIVE_RE.search(lexical_unit_text))
+            or rest.endswith(('か', '？', '?')) or lexical_unit_text.endswith('か')
+            or any(word in text for word in _JAPANESE_WH_WORDS)
+            or not rest and bool(_JAPANESE_IMPERATIVE_RE.search(lexical_unit_text))
+        )
+        return analysis, self._confidence(analysis, covered, text, unmodeled)
+
+    def _confidence(self, analysis: Dict[str, str], covered: int, text: str, unmodeled: bool = False) -> float:
+        if not self.core_elements.intersection(analysis):
+            return 0.0
+        confidence = min(1.0, covered / max(1, _content_length(text)))
+        return confidence * UNMODELED_PENALTY if unmodeled else confidence
+
+    def annotate(self, text: str, language: str) -> Tuple[Optional[Dict[str, str]], float]:
+        """
+        Annotate a sentence in the given language
+
+        Args:
+            text: Source sentence
+            language: "English" or "Japanese"
+
+        Returns:
+            (analysis, confidence) with the analysis in the LLM's format
+            ({element: span, "lexical_unit": ...}), or (None, 0.0) if the
+            Frame's lexical units do not occur
+        """
+        if language == 'Japanese':
+            return self.annotate_japanese(text)
+        return self.annotate_english(text)
+
+
+# Frame path -> (Frame data the annotator was compiled from, annotator)
+_annotators: Dict[str, Tuple[Dict[str, Any], FrameAnnotator]] = {}
+_annotators_lock = threading.Lock()
+
+
+def get_annotator(frame_path: str) -> FrameAnnotator:
+    """
+    Get the annotator of a Frame, compiled once per Frame load
+
+    Args:
+        frame_path: Path to the Frame JSON file
+
+    Returns:
+        FrameAnnotator of the Frame
+    """
+    frame_data = load_frame_data(frame_path)
+    key = os.path.abspath(frame_path)
+    cached = _annotators.get(key)
+    if cached is not None and cached[0] is frame_data:
+        return cached[1]
+
+    annotator = FrameAnnotator(frame_data)
+    with _annotators_lock:
+        _annotators[key] = (frame_data, annotator)
+    return annotator
+
+
+def pre_annotate(frame_paths: List[str], text: str, language: str) -> Tuple[Optional[Dict[str, Any]], float]:
+    """
+    Annotate a text with the rule-based annotators of its Frames
+
+    Multi-Frame analyses are keyed by the names of the Frames whose lexical
+    units occur, like LLM analyses; their confidence is the lowest one.
+
+    Args:
+        frame_paths: Paths to the Frame JSON files of the request
+        text: Source text
+        language: Source language
+
+    Returns:
+        (analysis, confidence); analysis is None if no Frame is evoked
+    """
+    if len(frame_paths) == 1:
+        return get_annotator(frame_paths[0]).annotate(text, language)
+
+    analysis, confidences = {}, []
+    for frame_path in frame_paths:
+        annotator = get_annotator(frame_path)
+        frame_analysis, confidence = annotator.annotate(text, language)
+        if frame_analysis is not None:
+            analysis[annotator.frame_name] = frame_analysis
+            confidences.append(confidence)
+    if not analysis:
+        return None, 0.0
+    return analysis, min(confidences)
+
+
+def get_confidence_threshold() -> float:
+    """Confidence a pre-annotation needs to replace the LLM analysis (PRE_ANNOTATOR_THRESHOLD)"""
+    try:
+        return float(os.getenv('PRE_ANNOTATOR_THRESHOLD', '0.9'))
+    except ValueError:
+        return 0.9
+
+
+def is_enabled() -> bool:
+    """Whether analyze_frame may use pre-annotations (PRE_ANNOTATOR_ENABLED, default off)"""
+    return os.getenv('PRE_ANNOTATOR_ENABLED', '0') == '1'
@@ -0,0 +1,303 @@
+"""
+Prompt assembly with per-Frame precompiled static prefixes
+
+Every LLM call is sent as a static SystemMessage followed by a dynamic
+HumanMessage. The static prefix holds everything that only depends on the
+stage, the Frames and the language pair (role, Frame descriptions, element
+lists, output format, translation example, target language notes) and is
+compiled once per (stage, Frames, source language, target language). The
+dynamic suffix holds what changes per request (examples selected for the
+text, the source text, the analysis). Identical leading tokens let the
+provider-side prompt caches of DeepSeek and OpenAI serve the prefix at a
+discount; the prefix is recompiled when a Frame file is reloaded.
+"""
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from backend.utils import load_frame_data, get_few_shot_prompts, get_language_specific_info
+
+# Prompt stages with a precompiled static prefix
+PROMPT_STAGES = ("analysis", "translation", "fast", "draft")
+
+# Asks speculative drafts to mark Frame elements the way annotated Frame examples do
+DRAFT_TAG_INSTRUCTION = 'Mark each Frame element of your translation by adding its name in square brackets right after it, for example "John [Buyer] bought a new car [Goods]".'
+
+
+def create_system_prompt(frames: List[Dict[str, Any]]) -> str:
+    """Role description shared by every stage, listing the Frames of the request"""
+    frame_lines = "\n".join(
+        f"- Frame name: {frame_data.get('frame_name', '')}\n- Frame description: {frame_data.get('description', '')}"
+        for frame_data in frames
+    )
+    return f"""You are a professional translation assistant based on Frame semantic understanding.
+Your task is to perform high-quality translations between Japanese and English while maintaining consistency in the Frame semantic structure.
+
+You will work with the following Frame{'s' if len(frames) > 1 else ''}:
+{frame_lines}
+
+During the translation process, you need to:
+1. Identify Frame elements in the source text
+2. Ensure the same Frame elements are preserved in the translated text
+3. Consider the grammar and cultural aspects of the target language
+4. Provide clear and natural translations
+
+Remember, your goal is to create a translation that is both accurate and natural, while maintaining the Frame semantic structure of the original text.
+"""
+
+
+def is_multi_frame(frame_elements: List[Dict[str, Any]]) -> bool:
+    """Whether the elements come from several Frames (tagged with their Frame name)"""
+    return any("frame" in el for el in frame_elements)
+
+
+def format_frame_elements(frame_elements: List[Dict[str, Any]]) -> str:
+    """Format Frame elements for prompts, grouped by Frame when several Frames are merged"""
+    if not is_multi_frame(frame_elements):
+        return "\n".join([f"- {el['name']}: {el['description']} ({el['type']} element)" for el in frame_elements])
+    groups = {}
+    for el in frame_elements:
+        groups.setdefault(el["frame"], []).append(f"  - {el['name']}: {el['description']} ({el['type']} element)")
+    return "\n".join(f"{frame}:\n" + "\n".join(lines) for frame, lines in groups.items())
+
+
+def build_analysis_format(frame_elements: List[Dict[str, Any]]) -> str:
+    """Describe the expected analysis JSON"""
+    if not is_multi_frame(frame_elements):
+        return "Please return the analysis results in JSON format, including each identified Frame element and its corresponding part in the text."
+    frame_names = ", ".join(dict.fromkeys(el["frame"] for el in frame_elements))
+    return f"""The text may evoke several Frames ({frame_names}). Please return the analysis results as a JSON object with one key per evoked Frame name; each value maps that Frame's identified elements (and "lexical_unit") to their corresponding part in the text. Omit Frames the text does not evoke."""
+
+
+def build_identification_examples(examples: List[Dict[str, Any]]) -> str:
+    """Few-shot identification examples from the examples selected for the source text"""
+    if not examples:
+        return ""
+    formatted_examples = [
+        f"Text: {example['text']}\nAnswer: {json.dumps(example['annotation'], ensure_ascii=False)}"
+        for example in examples
+    ]
+    return f"""Examples:
+{(chr(10) * 2).join(formatted_examples)}
+
+"""
+
+
+def build_translation_example(few_shot_prompts: Dict[str, Any], languages: Optional[List[str]] = None) -> str:
+    """Few-shot translation example, limited to the given languages"""
+    if "translation_prompt" in few_shot_prompts and "expected_translation" in few_shot_prompts:
+        # Format the expected translation to avoid direct JSON output
+        formatted_examples = [
+            f"{lang}: {translation}"
+            for lang, translation in few_shot_prompts["expected_translation"].items()
+            if languages is None or lang in languages
+        ]
+        return f"""
+Translation example:
+Original: {few_shot_prompts['translation_prompt']}
+Translation examples:
+{chr(10).join(formatted_examples)}
+"""
+    return ""
+
+
+def build_language_specific_info(frame_data: Dict[str, Any], target_language: str, frame_label: Optional[str] = None) -> str:
+    """Target language notes (lexical units, grammar, culture) of one Frame"""
+    target_language_code = "Japanese" if target_language == "Japanese" else "English"
+    language_info = get_language_specific_info(frame_data, target_language_code)
+    if not language_info:
+        return ""
+
+    lexical_units = language_info.get("lexical_units", [])
+    grammatical_notes = language_info.get("grammatical_notes", "")
+    cultural_notes = language_info.get("cultural_notes", "")
+
+    label = f" for {frame_label}" if frame_label else ""
+    return f"""
+Target language ({target_language}) specific information{label}:
+- Lexical units: {', '.join(lexical_units) if lexical_units else 'No specific information'}
+- Grammatical notes: {grammatical_notes if grammatical_notes else 'No specific information'}
+- Cultural notes: {cultural_notes if cultural_notes else 'No specific information'}
+"""
+
+
+def build_frames_language_info(frames: List[Dict[str, Any]], target_language: str) -> str:
+    """Target language notes for every Frame of the request"""
+    if len(frames) == 1:
+        return build_language_specific_info(frames[0], target_language)
+    return "".join(build_language_specific_info(frame_data, target_language, frame_data.get("frame_name")) for frame_data in frames)
+
+
+def _compile_prefix(stage: str, frames: List[Dict[str, Any]], frame_elements: List[Dict[str, Any]],
+                    source_language: str, target_language: str) -> str:
+    # Only Frame- and language-dependent content goes here, never request data
+    system_prompt = create_system_prompt(frames)
+    frame_elements_str = format_frame_elements(frame_elements)
+    languages = [source_language, target_language]
+
+    if stage == "analysis":
+        return f"""{system_prompt}
+Current task: identify the Frame elements in {source_language} texts.
+
+Frame elements:
+{frame_elements_str}
+
+{build_analysis_format(frame_elements)}
+Return only JSON, without any additional explanation.
+"""
+
+    translation_example = build_translation_example(get_few_shot_prompts(frames[0]), languages)
+    language_specific_info = build_frames_language_info(frames, target_language)
+
+    if stage == "translation":
+        return f"""{system_prompt}
+Current task: translate {source_language} texts to {target_language}, while maintaining consistency of Frame elements, using the Frame analysis results given with each text.
+{language_specific_info}
+{translation_example}
+Please provide an accurate and natural translation, ensuring all Frame elements from the original text are preserved. Also, follow the grammar and cultural conventions of the target language.
+
+IMPORTANT: Return ONLY the translation result as plain text, without any JSON formatting, without any additional explanation, and without annotations or markup.
+"""
+
+    if stage == "fast":
+        if is_multi_frame(frame_elements):
+            fast_analysis_format = 'an object with one key per evoked Frame name, each mapping that Frame\'s identified elements (and "lexical_unit") to their part of the source text'
+        else:
+            fast_analysis_format = 'an object mapping each identified Frame element name (and "lexical_unit") to its part of the source text'
+        return f"""{system_prompt}
+Current task: identify the Frame elements in {source_language} texts, then translate them to {target_language} while preserving all identified Frame elements.
+
+Frame elements:
+{frame_elements_str}
+{language_specific_info}
+{translation_example}
+Return a single JSON object with exactly two keys:
+- "frame_analysis": {fast_analysis_format}
+- "translation": the accurate and natural {target_language} translation as plain text, without annotations or markup
+Return only JSON, without any additional explanation.
+"""
+
+    if stage == "draft":
+        return f"""{system_prompt}
+Current task: translate {source_language} texts to {target_language}, while maintaining consistency of Frame elements.
+
+Frame elements:
+{frame_elements_str}
+{language_specific_info}
+{translation_example}
+Please provide an accurate and natural translation that preserves every Frame element of the source text.
+{DRAFT_TAG_INSTRUCTION}
+Return ONLY the marked-up translation, without any additional explanation.
+"""
+
+    raise ValueError(f"Unknown prompt stage '{stage}'")
+
+
+# (stage, Frame paths, source language, target language) -> (Frame data compiled from, prefix message)
+_prefixes: Dict[Tuple[str, Tuple[str, ...], str, str], Tuple[List[Dict[str, Any]], SystemMessage]] = {}
+_prefixes_lock = threading.Lock()
+
+
+def get_static_prefix(stage: str, frame_paths: List[str], frame_elements: List[Dict[str, Any]],
+                      source_language: str, target_language: str) -> SystemMessage:
+    """
+    Get the precompiled static prefix of a stage
+
+    The prefix is compiled once per (stage, Frames, language pair) and
+    recompiled when load_frame_data returns freshly loaded data.
+
+    Args:
+        stage: One of PROMPT_STAGES
+        frame_paths: Paths to the Frame JSON files of the request
+        frame_elements: Elements of those Frames (see agent.merge_frame_elements)
+        source_language: Source language
+        target_language: Target language
+
+    Returns:
+        SystemMessage with the static prefix, shared by all requests
+    """
+    frames = [load_frame_data(path) for path in frame_paths]
+    key = (stage, tuple(os.path.abspath(path) for path in frame_paths), source_language, target_language)
+    cached = _prefixes.get(key)
+    if cached is not None and all(a is b for a, b in zip(cached[0], frames)):
+        return cached[1]
+
+    message = SystemMessage(content=_compile_prefix(stage, frames, frame_elements, source_language, target_language))
+    with _prefixes_lock:
+        _prefixes[key] = (frames, message)
+    return message
+
+
+def clear_prefix_cache() -> None:
+    """Drop all compiled prefixes"""
+    with _prefixes_lock:
+        _prefixes.clear()
+
+
+def build_messages(stage: str, frame_paths: List[str], frame_elements: List[Dict[str, Any]],
+                   source_language: str, target_language: str, suffix: str) -> List[Any]:
+    """
+    Build the messages of one call: the static prefix, then the dynamic suffix
+
+    Args:
+        stage: One of PROMPT_STAGES
+        frame_paths: Paths to the Frame JSON files of the request
+        frame_elements: Elements of those Frames
+        source_language: Source language
+        target_language: Target language
+        suffix: Request-specific part of the prompt
+
+    Returns:
+        [SystemMessage, HumanMessage]
+    """
+    prefix = get_static_prefix(stage, frame_paths, frame_elements, source_language, target_language)
+    return [prefix, HumanMessage(content=suffix)]
+
+
+def format_analysis(frame_analysis: Any) -> str:
+    """Compact JSON of a Frame analysis for prompts"""
+    return json.dumps(frame_analysis, ensure_ascii=False, separators=(", ", ": "))
+
+
+def analysis_suffix(source_language: str, source_text: str, examples: List[Dict[str, Any]]) -> str:
+    """Dynamic part of the analysis prompt"""
+    return f"""{build_identification_examples(examples)}Please analyze the following {source_language} text and identify the Frame elements.
+
+Text: {source_text}"""
+
+
+def translation_suffix(source_text: str, frame_analysis: Any, draft_section: str = "") -> str:
+    """Dynamic part of the translation prompt, optionally with a draft to correct"""
+    return f"""Source text: {source_text}
+
+Frame analysis results:
+{format_analysis(frame_analysis)}
+{draft_section}"""
+
+
+def fast_suffix(source_text: str, examples: List[Dict[str, Any]]) -> str:
+    """Dynamic part of the fast-mode prompt"""
+    return f"""{build_identification_examples(examples)}Text: {source_text}"""
+
+
+def draft_suffix(source_text: str) -> str:
+    """Dynamic part of the speculative draft prompt"""
+    return f"Source text: {source_text}"
+
+
+def prompt_size(messages: List[Any]) -> Dict[str, int]:
+    """
+    Characters of a prompt and of its static prefix
+
+    Args:
+        messages: Messages sent to the model
+
+    Returns:
+        Dict with prompt_chars and prefix_chars
+    """
+    prompt_chars = sum(len(str(message.content)) for message in messages)
+    prefix_chars = len(str(messages[0].content)) if messages and isinstance(messages[0], SystemMessage) else 0
+    return {"prompt_chars": prompt_chars, "prefix_chars": prefix_chars}
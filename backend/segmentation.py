@@ -0,0 +1,175 @@
+"""
+Sentence segmentation for English and Japanese documents
+
+Documents are split into paragraphs (keeping the exact separators between
+them) and paragraphs into sentences, so segments can be translated
+independently and reassembled with the original layout.
+"""
+import re
+from typing import Any, Dict, List, Tuple
+
+# Blank lines separate paragraphs; single line breaks are kept as their own separators
+_PARAGRAPH_SEPARATOR_RE = re.compile(r'\s*\n\s*')
+
+# Sentence terminators with any closing quotes/brackets that belong to the sentence
+_TERMINATOR_RE = re.compile(r'([.!?。！？．]+)([」』）)\]"\'”’]*)')
+
+_CJK_TERMINATORS = set('。！？．')
+
+# Abbreviations placed before a name or number, which never end a sentence ("Dr. Smith", "No. 5")
+TITLE_ABBREVIATIONS = {
+    'mr', 'mrs', 'ms', 'dr', 'prof', 'st', 'mt', 'vs', 'no', 'vol', 'fig', 'approx', 'e.g', 'i.e'
+}
+# Abbreviations that may also end a sentence ("... moved to the U.S. He ..."): one ends when a capitalized word follows
+ABBREVIATIONS = {
+    'sr', 'jr', 'etc', 'inc', 'ltd', 'co', 'corp', 'dept', 'u.s', 'u.k', 'a.m', 'p.m', 'jan', 'feb', 'mar',
+    'apr', 'jun', 'jul', 'aug', 'sep', 'sept', 'oct', 'nov', 'dec'
+}
+
+_WORD_BEFORE_RE = re.compile(r'([A-Za-z](?:[A-Za-z.]*[A-Za-z])?)$')
+
+
+def _is_abbreviation(text: str, period_index: int) -> bool:
+    # Whether the period at period_index belongs to an abbreviation that does not end the sentence
+    match = _WORD_BEFORE_RE.search(text, 0, period_index)
+    if not match:
+        return False
+    word = match.group(1)
+    # Single capital letters are initials ("J. Smith")
+    if word.lower() in TITLE_ABBREVIATIONS or (len(word) == 1 and word.isupper()):
+        return True
+    if word.lower() in ABBREVIATIONS:
+        return not text[period_index + 1:].lstrip()[:1].isupper()
+    return False
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    """
+    Split a paragraph into sentences
+
+    Japanese terminators (。！？) always end a sentence. English terminators
+    (.!?) end a sentence only when followed by whitespace or the end of the
+    paragraph, never after a title abbreviation ("Mr.", "Dr.") or an
+    initial, and after other abbreviations ("U.S.", "etc.") only when a
+    capitalized word follows.
+
+    Args:
+        paragraph: Paragraph without line breaks
+
+    Returns:
+        Non-empty sentences with surrounding whitespace removed
+    """
+    sentences = []
+    start = 0
+    for match in _TERMINATOR_RE.finditer(paragraph):
+        end = match.end()
+        terminators = match.group(1)
+        if match.group(2) and end < len(paragraph) and not paragraph[end].isspace() and paragraph[end] not in '「『（(':
+            # Quoted sentence embedded in a longer one ("「本当？」と聞いた")
+            continue
+        if terminators[-1] not in _CJK_TERMINATORS:
+            if end < len(paragraph) and not paragraph[end].isspace():
+                # "3.5", "example.com", "U.S.A" ...
+                continue
+            if terminators == '.' and _is_abbreviation(paragraph, match.start()):
+                continue
+        sentence = paragraph[start:end].strip()
+        if sentence:
+            sentences.append(sentence)
+        start = end
+
+    rest = paragraph[start:].strip()
+    if rest:
+        sentences.append(rest)
+    return sentences
+
+
+def segment_text(text: str) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Segment a document into sentences while recording its paragraph layout
+
+    Args:
+        text: Source document
+
+    Returns:
+        Tuple of (segments, separators). Each segment is
+        {"index", "paragraph", "text"}; separators[i] is the exact whitespace
+        that followed paragraph i in the source (empty for the last one).
+    """
+    text = text.strip()
+    segments = []
+    separators = []
+
+    position = 0
+    paragraphs = []
+    for match in _PARAGRAPH_SEPARATOR_RE.finditer(text):
+        paragraphs.append(text[position:match.start()])
+        # Keep only the line breaks, indentation is not part of the layout
+        separators.append('\n' * match.group(0).count('\n'))
+        position = match.end()
+    paragraphs.append(text[position:])
+    separators.append('')
+
+    for paragraph_index, paragraph in enumerate(paragraphs):
+        for sentence in split_sentences(paragraph):
+            segments.append({'index': len(segments), 'paragraph': paragraph_index, 'text': sentence})
+    return segments, separators
+
+
+def join_sentences(sentences: List[str], language: str) -> str:
+    """
+    Join translated sentences of one paragraph
+
+    Args:
+        sentences: Sentences in order
+        language: Language of the sentences
+
+    Returns:
+        Paragraph text (no spaces between Japanese sentences)
+    """
+    return ('' if language == 'Japanese' else ' ').join(s for s in sentences if s)
+
+
+def reassemble(segment_texts: List[str], segments: List[Dict[str, Any]], separators: List[str], language: str) -> str:
+    """
+    Rebuild a document from per-segment texts
+
+    Args:
+        segment_texts: Text for each segment, in segment order
+        segments: Segments returned by segment_text
+        separators: Separators returned by segment_text
+        language: Language of segment_texts
+
+    Returns:
+        Document with the original paragraph layout
+    """
+    paragraphs = [[] for _ in separators]
+    for segment, segment_text in zip(segments, segment_texts):
+        paragraphs[segment['paragraph']].append(segment_text)
+
+    parts = []
+    for sentences, separator in zip(paragraphs, separators):
+        parts.append(join_sentences(sentences, language))
+        parts.append(separator)
+    return ''.join(parts)
+
+
+def merge_frame_analyses(analyses: List[Any]) -> Dict[str, Any]:
+    """
+    Merge per-segment Frame analyses
+
+    Args:
+        analyses: Frame analysis of each segment (failed analyses are skipped)
+
+    Returns:
+        Element name -> value, or a list of distinct values when segments disagree
+    """
+    merged: Dict[str, List[Any]] = {}
+    for analysis in analyses:
+        if not isinstance(analysis, dict) or 'error' in analysis:
+            continue
+        for key, value in analysis.items():
+            values = merged.setdefault(key, [])
+            if value not in values:
+                values.append(value)
+    return {key: values[0] if len(values) == 1 else values for key, values in merged.items()}
@@ -0,0 +1,96 @@
+"""
+In-flight call coalescing (single-flight)
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function, later callers wait for it and receive a copy of its
+result (or its exception). Keys are only held while the call is in flight;
+finished results are the translation memory's job. Coalescing is per process.
+Set SINGLEFLIGHT_ENABLED=0 to disable it.
+
+python -m benchmarks.singleflight_check exercises this against the fake model.
+"""
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from backend import metrics
+
+
+class _Call:
+    """One in-flight execution and the callers waiting for it"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.followers = 0
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+    def in_flight(self) -> int:
+        """Number of keys currently being executed"""
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers with the same key
+
+        Args:
+            key: Hashable identity of the call
+            fn: Function producing the result
+
+        Returns:
+            (result, shared) where shared is True if the result came from
+            another caller's execution; shared results are deep copies, so
+            callers may modify what they receive
+
+        Raises:
+            Exception: Whatever fn raised, for the caller and every waiter
+        """
+        if os.getenv('SINGLEFLIGHT_ENABLED', '1') == '0':
+            return fn(), False
+
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                leader = True
+            else:
+                call.followers += 1
+                leader = False
+
+        if not leader:
+            metrics.COALESCED_CALLS.inc(flight=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return copy.deepcopy(call.result), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # No follower can join after the key is removed, so the count is final
+                del self._calls[key]
+                shared = call.followers > 0
+            if call.error is None and shared:
+                # Followers copy a snapshot the leader's caller cannot modify
+                call.result = copy.deepcopy(result)
+            call.done.set()
+        return result, False
+
+
+# Whole translations keyed by the request, and Frame analyses keyed by source text and Frames
+request_flights = SingleFlight('request')
+analysis_flights = SingleFlight('analysis')
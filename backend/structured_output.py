@@ -0,0 +1,208 @@
+"""
+Structured (JSON) model output
+
+Model responses are requested in the provider's JSON mode and parsed with a
+tolerant parser that accepts Markdown fences, prose around the object,
+trailing commas and (optionally) objects cut off mid-stream. Frame analyses
+are validated against the Frame's element names so callers can decide to
+ask the model for a repair.
+"""
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+# Body of a ``` / ```json fence; the closing fence may be missing in a truncated response
+_FENCE_RE = re.compile(r'```(?:json|JSON)?[ \t]*\n?(.*?)(?:```|$)', re.DOTALL)
+
+# Opening braces tried before giving up on prose containing stray braces
+MAX_OBJECT_CANDIDATES = 3
+
+_CLOSING = {'}': '{', ']': '['}
+
+
+def with_json_mode(llm: Any) -> Any:
+    """
+    Bind the provider's JSON mode to a chat model
+
+    The prompt must mention JSON (required by OpenAI-compatible providers).
+
+    Args:
+        llm: Chat model
+
+    Returns:
+        Runnable that makes the model answer with a JSON object
+    """
+    return llm.bind(response_format={"type": "json_object"})
+
+
+def _strip_trailing(out: List[str]) -> None:
+    # Drop whitespace and a dangling comma before a closing bracket
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ',':
+        out.pop()
+        while out and out[-1].isspace():
+            out.pop()
+
+
+def _scan_object(text: str, start: int, partial: bool) -> Optional[str]:
+    """
+    Extract the JSON object starting at text[start] ("{")
+
+    Commas before closing brackets are removed. With partial=True an object
+    cut off before its end is closed (an unfinished key is dropped, an
+    unfinished string value is terminated).
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    last_significant = ''
+    key_start: Optional[int] = None
+
+    for char in text[start:]:
+        if in_string:
+            out.append(char)
+            if escape:
+                escape = False
+            elif char == '\\':
+                escape = True
+            elif char == '"':
+                in_string = False
+                last_significant = '"'
+            continue
+
+        if char == '"':
+            if stack and stack[-1] == '{' and last_significant in ('{', ','):
+                # An object key starts; remembered so an unfinished key can be dropped
+                key_start = len(out)
+            elif last_significant == ':':
+                key_start = None
+            in_string = True
+            out.append(char)
+        elif char in '{[':
+            if last_significant == ':':
+                key_start = None
+            stack.append(char)
+            out.append(char)
+            last_significant = char
+        elif char in '}]':
+            if not stack or stack[-1] != _CLOSING[char]:
+                return None
+            _strip_trailing(out)
+            stack.pop()
+            out.append(char)
+            last_significant = char
+            key_start = None
+            if not stack:
+                return ''.join(out)
+        else:
+            out.append(char)
+            if not char.isspace():
+                if last_significant == ':':
+                    key_start = None
+                last_significant = char
+
+    if not partial or not stack:
+        return None
+
+    if in_string:
+        if escape:
+            out.pop()
+        out.append('"')
+    if key_start is not None:
+        del out[key_start:]
+    _strip_trailing(out)
+    if out and out[-1] == ':':
+        return None
+    out.extend('}' if opener == '{' else ']' for opener in reversed(stack))
+    return ''.join(out)
+
+
+def parse_json_object(content: str, partial: bool = False) -> Optional[Dict[str, Any]]:
+    """
+    Parse a JSON object from a model response
+
+    Accepts plain JSON, JSON inside a Markdown fence, JSON surrounded by prose
+    and trailing commas.
+
+    Args:
+        content: Model response text
+        partial: Also accept an object cut off before its end (streaming or
+            truncated output), closing it where it stops
+
+    Returns:
+        Parsed object, or None if no JSON object could be recovered
+    """
+    text = content.strip()
+    try:
+        value = json.loads(text)
+        return value if isinstance(value, dict) else None
+    except ValueError:
+        pass
+
+    fenced = _FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+
+    start = text.find('{')
+    for _ in range(MAX_OBJECT_CANDIDATES):
+        if start == -1:
+            break
+        candidate = _scan_object(text, start, partial)
+        if candidate is not None:
+            try:
+                value = json.loads(candidate)
+                if isinstance(value, dict):
+                    return value
+            except ValueError:
+                pass
+        start = text.find('{', start + 1)
+    return None
+
+
+def _validate_element_mapping(mapping: Dict[str, Any], element_names: Set[str], prefix: str = '') -> List[str]:
+    errors = []
+    for key, value in mapping.items():
+        if key != 'lexical_unit' and key not in element_names:
+            errors.append(f'unknown Frame element "{prefix}{key}"')
+        elif not isinstance(value, str):
+            errors.append(f'value of "{prefix}{key}" is not a string')
+    return errors
+
+
+def validate_frame_analysis(frame_analysis: Any, frame_elements: List[Dict[str, Any]]) -> List[str]:
+    """
+    Validate a Frame analysis against the Frame's element names
+
+    Elements tagged with a "frame" key (multi-Frame requests) expect the
+    analysis to be keyed by Frame name first.
+
+    Args:
+        frame_analysis: Parsed analysis
+        frame_elements: Frame elements of the request
+
+    Returns:
+        Problems found (empty if the analysis is valid)
+    """
+    if not isinstance(frame_analysis, dict):
+        return ['the response is not a JSON object']
+    if not frame_analysis:
+        return ['no Frame elements were identified']
+
+    names_by_frame: Dict[Optional[str], Set[str]] = {}
+    for element in frame_elements:
+        names_by_frame.setdefault(element.get('frame'), set()).add(element['name'])
+
+    if None in names_by_frame or not names_by_frame:
+        return _validate_element_mapping(frame_analysis, names_by_frame.get(None, set()))
+
+    errors = []
+    for frame, frame_part in frame_analysis.items():
+        if frame not in names_by_frame:
+            errors.append(f'unknown Frame "{frame}"')
+        elif not isinstance(frame_part, dict) or not frame_part:
+            errors.append(f'"{frame}" must be a non-empty object of Frame elements')
+        else:
+            errors.extend(_validate_element_mapping(frame_part, names_by_frame[frame], f'{frame}.'))
+    return errors
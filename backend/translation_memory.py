@@ -0,0 +1,465 @@
+"""
+Translation memory in front of run_translation
+
+Finished translations are stored in a local SQLite database keyed by the
+normalized source text, Frame id, language pair, model and prompt version.
+Exact keys keep the case of the source ("Bill" and "bill" are translated
+differently). Entries are evicted least-recently-used beyond TM_MAX_ENTRIES
+and expire after TM_TTL_SECONDS. An optional fuzzy lookup uses a case-folded
+character n-gram index and returns near-duplicate sources whose Dice
+similarity passes a threshold.
+
+A hit made no provider call, so its "usage" is zero and its "models" empty;
+what the stored translation cost is reported as cache.original_usage.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from backend.utils import load_frame_data
+from backend.llm import get_model_config_id
+from backend import metrics
+from backend.singleflight import request_flights
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB_PATH = os.path.join(PROJECT_DIR, 'data', 'translation_memory.sqlite3')
+
+NGRAM_SIZE = 3
+
+# Part of every scope, bumped when the key normalization changes so entries stored under the old one are not served
+KEY_VERSION = 2
+
+# Fuzzy lookups only score this many candidates sharing the most n-grams
+FUZZY_CANDIDATES = 20
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize source text for exact-match keys
+
+    Args:
+        text: Source text
+
+    Returns:
+        NFKC-normalized text with collapsed whitespace, case preserved
+    """
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFKC', text)).strip()
+
+
+def fuzzy_text(normalized: str) -> str:
+    """Case-folded normalized text, the input of the fuzzy n-gram index"""
+    return normalized.casefold()
+
+
+def char_ngrams(text: str, n: int = NGRAM_SIZE) -> List[str]:
+    """
+    Get the distinct character n-grams of normalized text
+
+    Args:
+        text: Normalized text
+        n: N-gram size
+
+    Returns:
+        Sorted list of distinct n-grams
+    """
+    if len(text) <= n:
+        return [text] if text else []
+    return sorted({text[i:i + n] for i in range(len(text) - n + 1)})
+
+
+class TranslationMemory:
+    """SQLite-backed store of finished translations"""
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, max_entries: int = 10000, ttl_seconds: float = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self.stats = {'exact_hits': 0, 'fuzzy_hits': 0, 'misses': 0, 'stores': 0}
+
+        if db_path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        self._init_schema()
+
+    def _init_schema(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS tm_entries (
+                    key TEXT PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    source_text TEXT NOT NULL,
+                    gram_count INTEGER NOT NULL,
+                    result TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS tm_entries_last_access ON tm_entries (last_access)')
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS tm_ngrams (
+                    scope TEXT NOT NULL,
+                    gram TEXT NOT NULL,
+                    key TEXT NOT NULL
+                )''')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS tm_ngrams_scope_gram ON tm_ngrams (scope, gram)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS tm_ngrams_key ON tm_ngrams (key)')
+
+    @staticmethod
+    def make_scope(frame_id: str, source_language: str, target_language: str, model: str, prompt_version: str) -> str:
+        """Hash everything except the source text that a cached result depends on"""
+        raw = '\x1f'.join([str(KEY_VERSION), frame_id, source_language, target_language, model, prompt_version])
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def make_key(scope: str, normalized_text: str) -> str:
+        return hashlib.sha1(f'{scope}\x1f{normalized_text}'.encode('utf-8')).hexdigest()
+
+    def lookup(self, source_text: str, scope: str, fuzzy_threshold: Optional[float] = None) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Look up a cached translation
+
+        Args:
+            source_text: Source text
+            scope: Scope from make_scope
+            fuzzy_threshold: Minimum similarity (0-1) for fuzzy hits, or None for exact only
+
+        Returns:
+            Tuple of (cached result, match information), or None on a miss
+        """
+        normalized = normalize_text(source_text)
+        key = self.make_key(scope, normalized)
+        now = time.time()
+        min_created = now - self.ttl_seconds
+
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                'SELECT result, created_at FROM tm_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and row[1] >= min_created:
+                self._touch(key, now)
+                self.stats['exact_hits'] += 1
+                return json.loads(row[0]), {'hit': True, 'match': 'exact', 'similarity': 1.0}
+
+            if fuzzy_threshold is not None:
+                match = self._fuzzy_lookup(normalized, scope, fuzzy_threshold, min_created)
+                if match is not None:
+                    match_key, result, similarity, matched_source = match
+                    self._touch(match_key, now)
+                    self.stats['fuzzy_hits'] += 1
+                    return result, {
+                        'hit': True,
+                        'match': 'fuzzy',
+                        'similarity': round(similarity, 4),
+                        'matched_source_text': matched_source
+                    }
+
+            self.stats['misses'] += 1
+        return None
+
+    def _fuzzy_lookup(self, normalized: str, scope: str, threshold: float, min_created: float):
+        grams = char_ngrams(fuzzy_text(normalized))
+        if not grams:
+            return None
+
+        candidates = self._conn.execute('''
+            SELECT e.key, e.result, e.source_text, e.gram_count, COUNT(*) AS shared
+            FROM tm_ngrams g JOIN tm_entries e ON e.key = g.key
+            WHERE g.scope = ? AND g.gram IN (SELECT value FROM json_each(?)) AND e.created_at >= ?
+            GROUP BY e.key
+            ORDER BY shared DESC
+            LIMIT ?''', (scope, json.dumps(grams, ensure_ascii=False), min_created, FUZZY_CANDIDATES)).fetchall()
+
+        best = None
+        for key, result, source_text, gram_count, shared in candidates:
+            # Dice coefficient over distinct n-grams
+            similarity = 2.0 * shared / (len(grams) + gram_count)
+            if similarity >= threshold and (best is None or similarity > best[2]):
+                best = (key, result, similarity, source_text)
+
+        if best is None:
+            return None
+        return best[0], json.loads(best[1]), best[2], best[3]
+
+    def _touch(self, key: str, now: float) -> None:
+        self._conn.execute('UPDATE tm_entries SET last_access = ?, hits = hits + 1 WHERE key = ?', (now, key))
+
+    def store(self, source_text: str, scope: str, result: Dict[str, Any]) -> None:
+        """
+        Store a finished translation
+
+        Args:
+            source_text: Source text
+            scope: Scope from make_scope
+            result: Result returned by run_translation
+        """
+        normalized = normalize_text(source_text)
+        key = self.make_key(scope, normalized)
+        grams = char_ngrams(fuzzy_text(normalized))
+        now = time.time()
+
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM tm_ngrams WHERE key = ?', (key,))
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tm_entries (key, scope, source_text, gram_count, result, created_at, last_access, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, 0)',
+                (key, scope, source_text, len(grams), json.dumps(result, ensure_ascii=False), now, now)
+            )
+            self._conn.executemany(
+                'INSERT INTO tm_ngrams (scope, gram, key) VALUES (?, ?, ?)',
+                [(scope, gram, key) for gram in grams]
+            )
+            self.stats['stores'] += 1
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        # Drop expired entries, then the least recently used ones beyond the size limit
+        stale = self._conn.execute(
+            'SELECT key FROM tm_entries WHERE created_at < ?', (now - self.ttl_seconds,)
+        ).fetchall()
+        overflow = self._conn.execute('SELECT COUNT(*) FROM tm_entries').fetchone()[0] - len(stale) - self.max_entries
+        if overflow > 0:
+            stale += self._conn.execute(
+                'SELECT key FROM tm_entries WHERE created_at >= ? ORDER BY last_access ASC LIMIT ?',
+                (now - self.ttl_seconds, overflow)
+            ).fetchall()
+        if stale:
+            self._conn.executemany('DELETE FROM tm_ngrams WHERE key = ?', stale)
+            self._conn.executemany('DELETE FROM tm_entries WHERE key = ?', stale)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters of this process and the number of stored entries
+
+        Returns:
+            Statistics including the overall hit ratio
+        """
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM tm_entries').fetchone()[0]
+        stats = dict(self.stats)
+        lookups = stats['exact_hits'] + stats['fuzzy_hits'] + stats['misses']
+        stats['entries'] = entries
+        stats['hit_ratio'] = (stats['exact_hits'] + stats['fuzzy_hits']) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM tm_ngrams')
+            self._conn.execute('DELETE FROM tm_entries')
+
+
+_memory: Optional[TranslationMemory] = None
+_memory_lock = threading.Lock()
+
+
+def get_translation_memory() -> Optional[TranslationMemory]:
+    """
+    Get the process-wide translation memory
+
+    Configured with TM_ENABLED, TM_DB_PATH, TM_MAX_ENTRIES and TM_TTL_SECONDS.
+
+    Returns:
+        Shared TranslationMemory, or None if disabled
+    """
+    global _memory
+    if os.getenv('TM_ENABLED', '1') == '0':
+        return None
+    if _memory is None:
+        with _memory_lock:
+            if _memory is None:
+                _memory = TranslationMemory(
+                    db_path=os.getenv('TM_DB_PATH', DEFAULT_DB_PATH),
+                    max_entries=int(os.getenv('TM_MAX_ENTRIES', '10000')),
+                    ttl_seconds=float(os.getenv('TM_TTL_SECONDS', str(30 * 24 * 3600)))
+                )
+    return _memory
+
+
+def get_default_fuzzy_threshold() -> Optional[float]:
+    """
+    Get the fuzzy match threshold from TM_FUZZY_THRESHOLD
+
+    Returns:
+        Threshold between 0 and 1, or None if fuzzy matching is disabled
+    """
+    value = os.getenv('TM_FUZZY_THRESHOLD')
+    return float(value) if value else None
+
+
+def is_cacheable(result: Dict[str, Any]) -> bool:
+    """Only successful translations are worth remembering"""
+    frame_analysis = result.get('frame_analysis')
+    if isinstance(frame_analysis, dict) and 'error' in frame_analysis:
+        return False
+    return bool(result.get('translation'))
+
+
+def _memory_scope(memory: TranslationMemory, frame_path: Union[str, List[str]], source_language: str, target_language: str, mode: str) -> str:
+    from backend.agent import PROMPT_VERSION, as_frame_paths
+    frame_ids = [load_frame_data(path).get('frame_id') or os.path.abspath(path) for path in as_frame_paths(frame_path)]
+    return memory.make_scope(
+        '+'.join(frame_ids),
+        source_language,
+        target_language,
+        get_model_config_id(),
+        f'{PROMPT_VERSION}:{mode}'
+    )
+
+
+def _lookup(memory: TranslationMemory, source_text: str, scope: str, fuzzy_threshold: float) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    # Timed lookup counted as an exact/fuzzy hit or a miss
+    with metrics.stage('cache_lookup'):
+        cached = memory.lookup(source_text, scope, fuzzy_threshold)
+    metrics.record_cache_lookup(cached[1]['match'] if cached is not None else 'miss')
+    return cached
+
+
+def _serve_hit(result: Dict[str, Any], source_text: str, match: Dict[str, Any]) -> Dict[str, Any]:
+    # No provider call was made for this request: zero usage, keeping the stored translation's cost in the cache block
+    from backend.agent import summarize_usage
+    result['source_text'] = source_text
+    result['cache'] = dict(match, original_usage=result.get('usage'), original_models=result.get('models'))
+    result['usage'] = summarize_usage({})
+    result['models'] = {}
+    return result
+
+
+def translate_with_memory(
+    source_text: str,
+    source_language: str,
+    target_language: str,
+    frame_path: Union[str, List[str]],
+    use_cache: bool = True,
+    fuzzy_threshold: Optional[float] = None,
+    mode: str = 'standard',
+    translate_fn: Optional[Callable[..., Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Translate text, serving repeated requests from the translation memory
+
+    Args:
+        source_text: Text to translate
+        source_language: Source language
+        target_language: Target language
+        frame_path: Path to the Frame JSON file, or a list of paths for multi-Frame analysis
+        use_cache: Set to False to bypass the memory for this request
+        fuzzy_threshold: Minimum similarity for fuzzy hits (defaults to TM_FUZZY_THRESHOLD)
+        mode: Translation mode passed to translate_fn ("standard" or "fast")
+        translate_fn: Function called on a miss (defaults to run_translation)
+
+    Returns:
+        Translation result with a "cache" block describing the lookup, and
+        "coalesced": true if it was shared with an identical in-flight request
+    """
+    from backend.agent import run_translation, as_frame_paths
+    translate_fn = translate_fn or run_translation
+
+    memory = get_translation_memory() if use_cache else None
+    scope = None
+    if memory is not None:
+        scope = _memory_scope(memory, frame_path, source_language, target_language, mode)
+        if fuzzy_threshold is None:
+            fuzzy_threshold = get_default_fuzzy_threshold()
+
+        cached = _lookup(memory, source_text, scope, fuzzy_threshold)
+        if cached is not None:
+            return _serve_hit(cached[0], source_text, cached[1])
+
+    def translate_and_store() -> Dict[str, Any]:
+        result = translate_fn(
+            source_text=source_text,
+            source_language=source_language,
+            target_language=target_language,
+            frame_path=frame_path,
+            mode=mode
+        )
+        # Stored before the flight ends so later requests hit the memory instead
+        if memory is not None and is_cacheable(result):
+            with metrics.stage('cache_store'):
+                memory.store(source_text, scope, result)
+        return result
+
+    # Identical requests already being translated share that execution
+    flight_key = (
+        source_text,
+        source_language,
+        target_language,
+        tuple(os.path.abspath(path) for path in as_frame_paths(frame_path)),
+        mode,
+        scope,
+        translate_fn
+    )
+    result, shared = request_flights.do(flight_key, translate_and_store)
+    if memory is None:
+        metrics.record_cache_lookup('bypass')
+    result['cache'] = {'hit': False, 'match': None}
+    if shared:
+        result['coalesced'] = True
+    return result
+
+
+def stream_with_memory(
+    source_text: str,
+    source_language: str,
+    target_language: str,
+    frame_path: Union[str, List[str]],
+    use_cache: bool = True,
+    fuzzy_threshold: Optional[float] = None,
+    mode: str = 'standard',
+    stream_fn: Optional[Callable[..., Iterator[Tuple[str, Dict[str, Any]]]]] = None
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Streaming counterpart of translate_with_memory
+
+    A cache hit is replayed as one analysis, one token and one done event.
+    On a miss the events of stream_fn (defaults to stream_translation) are
+    passed through and the final result is stored.
+
+    Yields:
+        (event, data) tuples; the done event carries the "cache" block
+    """
+    from backend.agent import stream_translation
+    stream_fn = stream_fn or stream_translation
+
+    memory = get_translation_memory() if use_cache else None
+    scope = None
+    if memory is not None:
+        scope = _memory_scope(memory, frame_path, source_language, target_language, mode)
+        if fuzzy_threshold is None:
+            fuzzy_threshold = get_default_fuzzy_threshold()
+
+        cached = _lookup(memory, source_text, scope, fuzzy_threshold)
+        if cached is not None:
+            result = _serve_hit(cached[0], source_text, cached[1])
+            yield 'analysis', {'frame_analysis': result.get('frame_analysis')}
+            yield 'token', {'text': result.get('translation') or ''}
+            yield 'done', result
+            return
+
+    if memory is None:
+        metrics.record_cache_lookup('bypass')
+
+    for event, data in stream_fn(
+        source_text=source_text,
+        source_language=source_language,
+        target_language=target_language,
+        frame_path=frame_path,
+        mode=mode
+    ):
+        if event == 'done':
+            if memory is not None and is_cacheable(data):
+                with metrics.stage('cache_store'):
+                    memory.store(source_text, scope, data)
+            data['cache'] = {'hit': False, 'match': None}
+        yield event, data
@@ -1,20 +1,39 @@
 import json
 import os
-import glob
+import threading
 from typing import Dict, List, Any, Optional, Tuple
 
+# Parsed Frame files keyed by absolute path, stored with the file mtime they were read at
+_frame_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+_frame_cache_lock = threading.Lock()
+
 def load_frame_data(frame_path: str) -> Dict[str, Any]:
     """
     Load Frame data from a specific file
     
+    Parsed data is cached in memory and re-read only when the file's
+    modification time changes. The returned dict is shared between
+    callers and must not be modified.
+    
     Args:
         frame_path: Path to the Frame JSON file
         
     Returns:
         Loaded Frame data
     """
-    with open(frame_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    abs_path = os.path.abspath(frame_path)
+    mtime = os.stat(abs_path).st_mtime_ns
+    
+    cached = _frame_cache.get(abs_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    
+    with open(abs_path, 'r', encoding='utf-8') as f:
+        frame_data = json.load(f)
+    
+    with _frame_cache_lock:
+        _frame_cache[abs_path] = (mtime, frame_data)
+    return frame_data
 
 def list_available_frames() -> List[Dict[str, str]]:
     """
@@ -23,23 +42,8 @@ def list_available_frames() -> List[Dict[str, str]]:
     Returns:
         List of dictionaries containing frame information (id, name, path)
     """
-    frames_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frames')
-    frame_files = glob.glob(os.path.join(frames_dir, '*-frame.json'))
-    
-    frames = []
-    for frame_file in frame_files:
-        try:
-            frame_data = load_frame_data(frame_file)
-            frames.append({
-                'id': frame_data.get('frame_id', ''),
-                'name': frame_data.get('frame_name', ''),
-                'path': frame_file,
-                'description': frame_data.get('description', '')[:100] + '...' if len(frame_data.get('description', '')) > 100 else frame_data.get('description', '')
-            })
-        except Exception as e:
-            print(f"Error loading frame file {frame_file}: {str(e)}")
-    
-    return frames
+    from backend.frame_registry import get_frame_registry
+    return get_frame_registry().list_frames()
 
 def get_frame_by_name(frame_name: str) -> Tuple[Dict[str, Any], str]:
     """
@@ -54,14 +58,8 @@ def get_frame_by_name(frame_name: str) -> Tuple[Dict[str, Any], str]:
     Raises:
         ValueError: If frame not found
     """
-    frames = list_available_frames()
-    for frame in frames:
-        if frame['name'].lower() == frame_name.lower():
-            frame_path = frame['path']
-            frame_data = load_frame_data(frame_path)
-            return frame_data, frame_path
-    
-    raise ValueError(f"Frame '{frame_name}' not found")
+    from backend.frame_registry import get_frame_registry
+    return get_frame_registry().get_by_name(frame_name)
 
 def extract_frame_elements(frame_data: Dict[str, Any]) -> List[Dict[str, str]]:
     """
@@ -0,0 +1,133 @@
+"""
+Kill/resume/interrupt/resume check of the bulk translator
+
+Runs python -m backend.bulk_translate against the fake model in subprocesses:
+a first run is killed with SIGKILL after a checkpoint (leaving output written
+after it, as a hard kill does), a second run resumes without periodic
+checkpoints and is interrupted with SIGINT, so its only checkpoint is the one
+written on the interrupt, and a third run resumes to completion. Fails (exit
+status 1) unless the output holds every input record exactly once, with no
+NUL bytes or unparseable lines.
+
+Usage:
+    python -m benchmarks.bulk_resume_check [--records 40] [--latency 0.05] [--interrupt-after 1.0]
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SENTENCES = [
+    'John bought a new car from the dealership for $25,000.',
+    'She purchased the house through a real estate agent last month.',
+    'The company acquired three small businesses for expansion.',
+    'Mary purchased a laptop online for her studies.'
+]
+
+
+def start_run(input_path, output_path, latency, checkpoint_interval):
+    env = dict(os.environ, DEFAULT_MODEL='fake', FAKE_LLM_LATENCY=str(latency), FAKE_LLM_SEED='0', TM_ENABLED='0')
+    return subprocess.Popen(
+        [sys.executable, '-m', 'backend.bulk_translate', input_path, '-o', output_path,
+         '--concurrency', '2', '--checkpoint-interval', str(checkpoint_interval), '--progress-interval', '3600', '--no-cache'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+
+
+def load_checkpoint(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def wait_for(condition, process, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        if process.poll() is not None:
+            return False
+        time.sleep(0.01)
+    return False
+
+
+def check_output(output_path, records):
+    with open(output_path, 'rb') as f:
+        content = f.read()
+    problems = []
+    nul_bytes = content.count(b'\0')
+    if nul_bytes:
+        problems.append(f'{nul_bytes} NUL bytes in the output')
+    indexes = []
+    for number, line in enumerate(content.splitlines(), 1):
+        try:
+            indexes.append(json.loads(line)['index'])
+        except (ValueError, KeyError):
+            problems.append(f'line {number} is not a result: {line[:80]!r}')
+    missing = sorted(set(range(records)) - set(indexes))
+    duplicates = sorted({index for index in indexes if indexes.count(index) > 1})
+    if missing:
+        problems.append(f'missing records: {missing}')
+    if duplicates:
+        problems.append(f'records written twice: {duplicates}')
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake model latency per call in seconds')
+    parser.add_argument('--interrupt-after', type=float, default=1.0, help='Seconds the resumed run works before SIGINT')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        input_path = os.path.join(directory, 'input.jsonl')
+        output_path = os.path.join(directory, 'output.jsonl')
+        checkpoint_path = f'{output_path}.checkpoint'
+        with open(input_path, 'w', encoding='utf-8') as f:
+            for index in range(args.records):
+                f.write(json.dumps({'id': index, 'source_text': SENTENCES[index % len(SENTENCES)]}) + '\n')
+
+        # 1. Hard kill once the output has grown past the last checkpoint
+        process = start_run(input_path, output_path, args.latency, 0)
+        behind = wait_for(lambda: (load_checkpoint(checkpoint_path) or {}).get('index', 0) >= 3
+                          and os.path.getsize(output_path) > load_checkpoint(checkpoint_path)['output_size'], process)
+        process.kill()
+        process.wait()
+        print(f'killed:      checkpoint behind the output: {behind}')
+
+        # 2. Resume, then interrupt after a few more records
+        process = start_run(input_path, output_path, args.latency, 3600)
+        time.sleep(args.interrupt_after)
+        process.send_signal(signal.SIGINT)
+        status = process.wait()
+        print(f'interrupted: exit status {status}')
+
+        # 3. Resume to completion
+        process = start_run(input_path, output_path, args.latency, 0)
+        _, errors = process.communicate(timeout=300)
+        print(f'completed:   exit status {process.returncode}')
+
+        problems = check_output(output_path, args.records)
+        if process.returncode != 0:
+            problems.append(f"final run failed: {errors.decode('utf-8', 'replace')[-500:]}")
+        if not (load_checkpoint(checkpoint_path) or {}).get('complete'):
+            problems.append('checkpoint is not marked complete')
+
+    for problem in problems:
+        print(f'FAIL: {problem}')
+    if not problems:
+        print(f'OK: {args.records} records written exactly once')
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Compare latency and token usage of the standard, fast and speculative translation modes
+
+Runs every example sentence of the selected Frame through run_translation in
+each mode against the configured model and prints per-mode averages.
+
+Usage:
+    python -m benchmarks.compare_modes [--frame frames/commerce-buy-frame.json] [--repeat 1]
+"""
+import argparse
+import re
+import statistics
+import time
+
+from backend.agent import run_translation
+from backend.utils import load_frame_data
+
+# Strips "[Element]" annotations from Frame example sentences
+_ANNOTATION_RE = re.compile(r'\s*\[[^\]]+\]')
+
+
+def collect_sentences(frame_path):
+    frame_data = load_frame_data(frame_path)
+    sentences = [_ANNOTATION_RE.sub('', ex['text']) for ex in frame_data.get('example_sentences', [])]
+    return [s for s in sentences if s]
+
+
+def run_mode(mode, sentences, frame_path, repeat):
+    latencies, input_tokens, output_tokens, calls, fallbacks = [], [], [], [], 0
+    for _ in range(repeat):
+        for sentence in sentences:
+            start = time.perf_counter()
+            result = run_translation(
+                source_text=sentence,
+                source_language='English',
+                target_language='Japanese',
+                frame_path=frame_path,
+                mode=mode
+            )
+            latencies.append(time.perf_counter() - start)
+            input_tokens.append(result['usage']['input_tokens'])
+            output_tokens.append(result['usage']['output_tokens'])
+            calls.append(result['usage']['llm_calls'])
+            if result['mode'] in ('fast_fallback', 'speculative_refined'):
+                fallbacks += 1
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'mean_latency_s': statistics.mean(latencies),
+        'median_latency_s': statistics.median(latencies),
+        'mean_input_tokens': statistics.mean(input_tokens),
+        'mean_output_tokens': statistics.mean(output_tokens),
+        'mean_llm_calls': statistics.mean(calls),
+        'fallbacks': fallbacks
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frame', default='frames/commerce-buy-frame.json')
+    parser.add_argument('--repeat', type=int, default=1)
+    args = parser.parse_args()
+
+    sentences = collect_sentences(args.frame)
+    rows = [run_mode(mode, sentences, args.frame, args.repeat) for mode in ('standard', 'fast', 'speculative')]
+
+    print(f"{'mode':<12}{'requests':>10}{'mean s':>10}{'p50 s':>10}{'in tok':>10}{'out tok':>10}{'calls':>8}{'fallback':>10}")
+    for row in rows:
+        print(f"{row['mode']:<12}{row['requests']:>10}{row['mean_latency_s']:>10.2f}{row['median_latency_s']:>10.2f}"
+              f"{row['mean_input_tokens']:>10.0f}{row['mean_output_tokens']:>10.0f}{row['mean_llm_calls']:>8.1f}{row['fallbacks']:>10}")
+
+
+if __name__ == '__main__':
+    main()
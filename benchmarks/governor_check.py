@@ -0,0 +1,209 @@
+"""
+Behavior checks of the provider-call governor
+
+Drives backend.governor.Governor with the fake chat model and fails (exit
+status 1) unless:
+
+- a rate limited (429) call halves the AIMD concurrency limit, a burst of 429s
+  within one round trip halves it only once, and successful calls grow it
+  back above its initial value
+- rate limited calls are retried with backoff until they succeed
+- a hedge still waiting for a thread is cancelled when the primary wins and
+  never reaches the model; a hedge already running is left to finish, its
+  result is dropped and its slot returned
+- the hedge's result is used when it finishes first
+- no hedge is sent when the model has no spare concurrency
+
+Usage:
+    python -m benchmarks.governor_check
+"""
+import sys
+import time
+
+from backend import metrics
+from backend.fake_llm import FakeChatModel, FakeRateLimitError, get_fake_llm_stats, reset_fake_llm_stats
+from backend.governor import Governor
+
+# Hedging delay the latency window is primed with
+HEDGE_DELAY = 0.02
+
+
+def expect(problems, condition, message):
+    if not condition:
+        problems.append(message)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def hedged_governor(stage, **kwargs):
+    governor = Governor(timeout=None, hedge_stages=[stage], **kwargs)
+    for _ in range(governor.latencies.min_samples):
+        governor.latencies.observe(stage, HEDGE_DELAY)
+    return governor
+
+
+def sequence(*models):
+    # The primary call uses the first model, the hedge the second
+    remaining = list(models)
+    return lambda: remaining.pop(0).invoke('Text: John bought a car.').content
+
+
+def hedges(stage):
+    return {outcome: metrics.LLM_HEDGES.value(stage=stage, outcome=outcome) for outcome in ('fired', 'won', 'cancelled')}
+
+
+def check_aimd():
+    problems = []
+    governor = Governor(timeout=None, max_retries=0, concurrency=(8, 1, 64))
+    limiter = governor.limiter('fake-aimd')
+    healthy = FakeChatModel(latency=0.02)
+    rejecting = FakeChatModel(latency=0.0, rate_limit_rate=1.0, seed=0)
+
+    def call(model):
+        return governor.call('fake-aimd', 'check_aimd', lambda: model.invoke('Text: John bought a car.'))
+
+    try:
+        call(rejecting)
+        problems.append('AIMD: a rate limited call did not raise with retries disabled')
+    except FakeRateLimitError:
+        pass
+    expect(problems, limiter.limit == 4, f'AIMD: limit after one 429 is {limiter.limit}, expected 4')
+
+    # Establish a round trip, then send a burst of 429s well within it
+    for _ in range(5):
+        call(healthy)
+    before = limiter.limit
+    for _ in range(3):
+        try:
+            call(rejecting)
+        except FakeRateLimitError:
+            pass
+    expect(problems, abs(limiter.limit - before / 2) < 1e-9,
+           f'AIMD: a burst of 429s moved the limit from {before:.2f} to {limiter.limit:.2f}, expected one halving')
+
+    fast = FakeChatModel(latency=0.001)
+    for _ in range(60):
+        call(fast)
+    expect(problems, limiter.limit > 8, f'AIMD: limit recovered only to {limiter.limit:.2f} after 60 successful calls')
+    expect(problems, limiter.in_flight == 0, f'AIMD: {limiter.in_flight} slots still taken')
+    return problems
+
+
+def check_retries():
+    problems = []
+    governor = Governor(timeout=None, max_retries=3, backoff=0.001)
+    healthy = FakeChatModel(latency=0.0, responses=['ok'])
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) <= 2:
+            raise FakeRateLimitError('Rate limit exceeded (simulated 429)')
+        return healthy.invoke('x').content
+
+    rate_limited = metrics.LLM_RATE_LIMITED.value(model='fake-retry')
+    result = governor.call('fake-retry', 'check_retry', flaky)
+    expect(problems, result == 'ok' and len(attempts) == 3, f'retries: got {result!r} after {len(attempts)} attempts')
+    expect(problems, metrics.LLM_RATE_LIMITED.value(model='fake-retry') - rate_limited == 2,
+           'retries: the two 429s were not counted')
+    return problems
+
+
+def check_hedge_cancelled_while_queued():
+    problems = []
+    stage = 'check_hedge_queued'
+    # A single call thread: the hedge waits behind the primary
+    governor = hedged_governor(stage, max_workers=1)
+    limiter = governor.limiter('fake-hedge-queued')
+    before = hedges(stage)
+    reset_fake_llm_stats()
+
+    result = governor.call('fake-hedge-queued', stage, sequence(
+        FakeChatModel(latency=0.1, responses=['primary']), FakeChatModel(latency=0.0, responses=['hedge'])
+    ))
+    after = hedges(stage)
+    expect(problems, result == 'primary', f'queued hedge: got {result!r}, expected the primary result')
+    expect(problems, after['fired'] - before['fired'] == 1, 'queued hedge: no hedge was fired')
+    expect(problems, after['cancelled'] - before['cancelled'] == 1, 'queued hedge: the hedge was not cancelled')
+    expect(problems, wait_until(lambda: limiter.in_flight == 0), f'queued hedge: {limiter.in_flight} slots still taken')
+    expect(problems, get_fake_llm_stats()['calls'] == 1, f"queued hedge: the model was called {get_fake_llm_stats()['calls']} times")
+    return problems
+
+
+def check_hedge_dropped_while_running():
+    problems = []
+    stage = 'check_hedge_running'
+    governor = hedged_governor(stage)
+    limiter = governor.limiter('fake-hedge-running')
+    limit = limiter.limit
+    before = hedges(stage)
+
+    start = time.monotonic()
+    result = governor.call('fake-hedge-running', stage, sequence(
+        FakeChatModel(latency=0.1, responses=['primary']), FakeChatModel(latency=0.5, responses=['hedge'])
+    ))
+    elapsed = time.monotonic() - start
+    after = hedges(stage)
+    expect(problems, result == 'primary' and elapsed < 0.4,
+           f'running hedge: got {result!r} after {elapsed:.2f}s, expected the primary result without waiting for the hedge')
+    expect(problems, after['fired'] - before['fired'] == 1 and after['won'] == before['won'],
+           f'running hedge: unexpected hedge outcomes {after}')
+    expect(problems, wait_until(lambda: limiter.in_flight == 0), f'running hedge: {limiter.in_flight} slots still taken')
+    expect(problems, limiter.limit >= limit, 'running hedge: the dropped hedge decreased the concurrency limit')
+    return problems
+
+
+def check_hedge_wins():
+    problems = []
+    stage = 'check_hedge_wins'
+    governor = hedged_governor(stage)
+    before = hedges(stage)
+
+    start = time.monotonic()
+    result = governor.call('fake-hedge-wins', stage, sequence(
+        FakeChatModel(latency=0.5, responses=['primary']), FakeChatModel(latency=0.0, responses=['hedge'])
+    ))
+    elapsed = time.monotonic() - start
+    expect(problems, result == 'hedge' and elapsed < 0.4, f'winning hedge: got {result!r} after {elapsed:.2f}s')
+    expect(problems, hedges(stage)['won'] - before['won'] == 1, 'winning hedge: the win was not counted')
+    return problems
+
+
+def check_no_hedge_without_capacity():
+    problems = []
+    stage = 'check_hedge_capacity'
+    governor = hedged_governor(stage, concurrency=(1, 1, 1))
+    before = hedges(stage)
+
+    result = governor.call('fake-hedge-capacity', stage, sequence(
+        FakeChatModel(latency=0.1, responses=['primary']), FakeChatModel(latency=0.0, responses=['hedge'])
+    ))
+    expect(problems, result == 'primary', f'no capacity: got {result!r}')
+    expect(problems, hedges(stage)['fired'] == before['fired'], 'no capacity: a hedge was fired with every slot taken')
+    return problems
+
+
+CHECKS = (
+    check_aimd, check_retries, check_hedge_cancelled_while_queued, check_hedge_dropped_while_running,
+    check_hedge_wins, check_no_hedge_without_capacity
+)
+
+
+def main():
+    failed = False
+    for check in CHECKS:
+        problems = check()
+        print(f"{check.__name__:<40}{'FAIL' if problems else 'OK'}")
+        for problem in problems:
+            print(f'  {problem}')
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
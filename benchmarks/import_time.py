@@ -0,0 +1,69 @@
+"""
+Import-time budget check for the web app
+
+Imports backend.app in fresh interpreters and fails (exit status 1) when the
+median import time exceeds the budget or when the LangChain/LangGraph stacks
+are loaded at import time instead of on the first translation.
+
+Usage:
+    python -m benchmarks.import_time [--budget 0.5] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported lazily
+HEAVY_MODULES = ('langchain_core', 'langchain_openai', 'langchain_deepseek', 'langgraph', 'openai', 'httpx')
+
+MEASURE_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import backend.app
+elapsed = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy_modules": heavy}}))
+"""
+
+
+def measure_once():
+    output = subprocess.check_output(
+        [sys.executable, '-c', MEASURE_SCRIPT.format(heavy=HEAVY_MODULES)],
+        cwd=PROJECT_DIR,
+        text=True
+    )
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=float(os.getenv('IMPORT_TIME_BUDGET', '0.5')),
+                        help='Maximum median import time of backend.app in seconds')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    # The first run warms the bytecode cache
+    measure_once()
+    runs = [measure_once() for _ in range(args.runs)]
+    median = statistics.median(run['seconds'] for run in runs)
+    heavy = sorted({name for run in runs for name in run['heavy_modules']})
+
+    print(f'backend.app import: median {median * 1000:.1f}ms over {args.runs} runs (budget {args.budget * 1000:.0f}ms)')
+    failed = False
+    if median > args.budget:
+        print('FAIL: import time is over budget')
+        failed = True
+    if heavy:
+        print(f"FAIL: imported at module load: {', '.join(heavy)}")
+        failed = True
+    if not failed:
+        print('OK')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+"""
+Coverage and accuracy of the rule-based pre-annotator against the Frame examples
+
+Reports how often the pre-annotation is confident enough to skip the LLM
+analysis call, and how accurate the element spans are, both for the confident
+cases (precision at the threshold) and overall. No model is called.
+
+Two case sets are scored separately:
+- in-sample: the annotated examples of each Frame (English example sentences
+  and identification prompt, Japanese examples, tagged Japanese translation
+  example). The cues are learned from these, so this is an upper bound.
+- held-out: sentences the cues never saw (--cases, by default
+  benchmarks/pre_annotator_held_out.jsonl), including negations, questions,
+  imperatives and passives, as {"frame": path, "text", "language",
+  "annotation": {element: span}} lines. Its confident precision is the
+  evidence for PRE_ANNOTATOR_THRESHOLD.
+
+Usage:
+    python -m benchmarks.pre_annotator_report [--frames frames/a.json,frames/b.json] [--cases held_out.jsonl]
+                                              [--threshold 0.9] [--verbose] [--json]
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import statistics
+import time
+
+from backend import pre_annotator
+from backend.example_selector import collect_examples
+from backend.utils import load_frame_data
+
+_TAG_RE = re.compile(r'\[([A-Za-z_]+)\]')
+HELD_OUT_CASES = os.path.join(os.path.dirname(__file__), 'pre_annotator_held_out.jsonl')
+
+
+def tagged_japanese_example(frame_data):
+    # "お客様[Buyer]は昨日[Time]..." -> text without tags and {element: span}
+    tagged = frame_data.get('few_shot_prompts', {}).get('expected_translation', {}).get('Japanese')
+    if not tagged:
+        return None
+    annotation, text, position = {}, '', 0
+    for match in _TAG_RE.finditer(tagged):
+        segment = tagged[position:match.start()]
+        particle = next((p for p in pre_annotator.PARTICLES if text and segment.startswith(p)), '')
+        annotation[match.group(1)] = segment[len(particle):]
+        text += segment
+        position = match.end()
+    return {'text': text + tagged[position:], 'annotation': annotation, 'language': 'Japanese'}
+
+
+def collect_cases(frame_path):
+    frame_data = load_frame_data(frame_path)
+    cases = collect_examples(frame_data)
+    japanese = tagged_japanese_example(frame_data)
+    if japanese:
+        cases.append(japanese)
+    return cases
+
+
+def normalize(span):
+    return str(span).strip().strip('.,').lower()
+
+
+def score(expected, predicted):
+    # Element spans only; the Japanese tagged example has no lexical unit to compare
+    expected = {k: normalize(v) for k, v in expected.items() if k != 'lexical_unit'}
+    predicted = {k: normalize(v) for k, v in (predicted or {}).items() if k != 'lexical_unit'}
+    correct = sum(1 for k, v in predicted.items() if expected.get(k) == v)
+    return correct, len(predicted), len(expected)
+
+
+def summarize(rows):
+    correct = sum(r['correct'] for r in rows)
+    predicted = sum(r['predicted'] for r in rows)
+    expected = sum(r['expected'] for r in rows)
+    return {
+        'cases': len(rows),
+        'precision': correct / predicted if predicted else 0.0,
+        'recall': correct / expected if expected else 0.0,
+        'exact': sum(1 for r in rows if r['correct'] == r['predicted'] == r['expected']) / len(rows) if rows else 0.0
+    }
+
+
+def load_cases(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def annotate_cases(cases, threshold, verbose=False):
+    rows = []
+    for case in cases:
+        frame_path = case['frame']
+        pre_annotator.get_annotator(frame_path)  # compile outside the timing
+        start = time.perf_counter()
+        analysis, confidence = pre_annotator.pre_annotate([frame_path], case['text'], case['language'])
+        elapsed = time.perf_counter() - start
+        correct, predicted, expected = score(case['annotation'], analysis)
+        rows.append({
+            'frame': frame_path, 'language': case['language'], 'text': case['text'],
+            'confidence': confidence, 'skipped': analysis is not None and confidence >= threshold,
+            'seconds': elapsed, 'correct': correct, 'predicted': predicted, 'expected': expected
+        })
+        if verbose:
+            print(f"{confidence:5.2f} {'skip' if rows[-1]['skipped'] else 'llm ':<5} {correct}/{expected} {case['text']}")
+            print(f"      {json.dumps(analysis, ensure_ascii=False)}")
+    return rows
+
+
+def report_rows(rows):
+    skipped = [r for r in rows if r['skipped']]
+    return {
+        'cases': len(rows),
+        'skip_rate': len(skipped) / len(rows) if rows else 0.0,
+        'confident': summarize(skipped),
+        'all': summarize(rows),
+        'by_language': {
+            language: {'cases': len(group), 'skip_rate': sum(r['skipped'] for r in group) / len(group)}
+            for language in sorted({r['language'] for r in rows})
+            for group in [[r for r in rows if r['language'] == language]]
+        }
+    }
+
+
+def run(frame_paths, threshold, verbose=False, held_out_cases=()):
+    in_sample = [dict(case, frame=frame_path) for frame_path in frame_paths for case in collect_cases(frame_path)]
+    sets = {'in_sample': annotate_cases(in_sample, threshold, verbose)}
+    if held_out_cases:
+        sets['held_out'] = annotate_cases(held_out_cases, threshold, verbose)
+    rows = [row for set_rows in sets.values() for row in set_rows]
+    report = {'threshold': threshold}
+    report.update({name: report_rows(set_rows) for name, set_rows in sets.items()})
+    report['mean_us'] = statistics.mean(r['seconds'] for r in rows) * 1e6 if rows else 0.0
+    report['max_us'] = max(r['seconds'] for r in rows) * 1e6 if rows else 0.0
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', default=','.join(sorted(glob.glob('frames/*.json'))))
+    parser.add_argument('--threshold', type=float, default=pre_annotator.get_confidence_threshold())
+    parser.add_argument('--cases', default=HELD_OUT_CASES, help='JSONL file of held-out annotated sentences ("" for none)')
+    parser.add_argument('--verbose', action='store_true', help='Print every case with its annotation')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args()
+
+    held_out_cases = load_cases(args.cases) if args.cases else []
+    report = run([path for path in args.frames.split(',') if path], args.threshold, args.verbose, held_out_cases)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"threshold: {report['threshold']}")
+    for name in ('in_sample', 'held_out'):
+        if name not in report:
+            continue
+        result = report[name]
+        print(f"\n{name}: {result['cases']} cases, LLM analysis skipped: {result['skip_rate']:.0%}")
+        for language, row in result['by_language'].items():
+            print(f"  {language:<10}{row['cases']:>4} cases, skipped {row['skip_rate']:.0%}")
+        print(f"{'':<12}{'cases':>8}{'precision':>11}{'recall':>9}{'exact':>8}")
+        for subset in ('confident', 'all'):
+            row = result[subset]
+            print(f"{subset:<12}{row['cases']:>8}{row['precision']:>11.0%}{row['recall']:>9.0%}{row['exact']:>8.0%}")
+    print(f"\nannotation time: mean {report['mean_us']:.0f} us, max {report['max_us']:.0f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Offline benchmark suite
+
+Drives the translation pipeline against the local fake chat model
+(backend/fake_llm.py) at several concurrency levels and reports latency
+percentiles, throughput, memory and pipeline overhead (wall time not spent
+inside model calls). Results are written as JSON so runs can be compared
+between commits.
+
+Usage:
+    python -m benchmarks.run_benchmarks [--paths run_translation,flask,stream,batch,document]
+        [--concurrency 1,4,16] [--requests 32] [--modes standard,fast]
+        [--latency 0.2] [--jitter 0.05] [--tokens-per-second 200]
+        [--output benchmarks/results/run.json] [--compare benchmarks/results/previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(PROJECT_DIR, 'benchmarks', 'results')
+FRAME_PATH = os.path.join(PROJECT_DIR, 'frames', 'commerce-buy-frame.json')
+
+SENTENCES = [
+    'John bought a new car from the dealership for $25,000.',
+    'She purchased the house through a real estate agent last month.',
+    'The company acquired three small businesses for expansion.',
+    'Mary purchased a laptop online for her studies.'
+]
+
+ALL_PATHS = ('run_translation', 'flask', 'stream', 'batch', 'document')
+# Paths and modes that run several model calls concurrently inside one request
+PARALLEL_CALL_SCENARIOS = ('batch', 'document', 'speculative')
+
+
+def configure_environment(args):
+    # Must run before backend modules are imported
+    os.environ['DEFAULT_MODEL'] = 'fake'
+    os.environ['FAKE_LLM_LATENCY'] = str(args.latency)
+    os.environ['FAKE_LLM_JITTER'] = str(args.jitter)
+    os.environ['FAKE_LLM_TOKENS_PER_SECOND'] = str(args.tokens_per_second)
+    os.environ['FAKE_LLM_SEED'] = '0'
+    if not args.with_cache:
+        os.environ['TM_ENABLED'] = '0'
+    os.environ['PRE_ANNOTATOR_ENABLED'] = '1' if args.with_pre_annotator else '0'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (k - lower)
+
+
+def sentence(index):
+    # Distinct inputs so batch deduplication and caches do not skew results
+    return f'{SENTENCES[index % len(SENTENCES)]} (#{index})'
+
+
+def make_request_fn(path, mode, client):
+    from backend.agent import run_translation, run_batch_translation, run_document_translation
+
+    def request_body(index):
+        return {
+            'source_text': sentence(index),
+            'source_language': 'English',
+            'target_language': 'Japanese',
+            'frame_path': FRAME_PATH,
+            'mode': mode
+        }
+
+    if path == 'run_translation':
+        def fn(index):
+            run_translation(**request_body(index))
+            return None
+    elif path == 'flask':
+        def fn(index):
+            response = client.post('/api/translate', json=request_body(index))
+            assert response.status_code == 200, response.get_data(as_text=True)
+            return None
+    elif path == 'stream':
+        def fn(index):
+            # Returns time to the first translation token
+            start = time.perf_counter()
+            response = client.post('/api/translate/stream', json=request_body(index))
+            first_token = None
+            for chunk in response.response:
+                if first_token is None and b'event: token' in chunk:
+                    first_token = time.perf_counter() - start
+            return first_token
+    elif path == 'batch':
+        def fn(index):
+            items = [request_body(index * 4 + offset) for offset in range(4)]
+            run_batch_translation(items, max_concurrency=4)
+            return None
+    elif path == 'document':
+        def fn(index):
+            body = request_body(index)
+            body['source_text'] = ' '.join(sentence(index * 4 + offset) for offset in range(4))
+            run_document_translation(**body)
+            return None
+    else:
+        raise ValueError(f'Unknown benchmark path: {path}')
+    return fn
+
+
+def run_scenario(path, mode, concurrency, requests, client):
+    from backend.fake_llm import get_fake_llm_stats, reset_fake_llm_stats
+
+    fn = make_request_fn(path, mode, client)
+    # Warm-up request so one-time initialization is not measured
+    fn(10 ** 6)
+    reset_fake_llm_stats()
+
+    latencies = []
+    first_token_latencies = []
+    errors = 0
+
+    def timed(index):
+        start = time.perf_counter()
+        first_token = fn(index)
+        return time.perf_counter() - start, first_token
+
+    tracemalloc.start()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(timed, index) for index in range(requests)]
+        for future in futures:
+            try:
+                latency, first_token = future.result()
+                latencies.append(latency)
+                if first_token is not None:
+                    first_token_latencies.append(first_token)
+            except Exception as e:
+                errors += 1
+                print(f'  error: {e}', file=sys.stderr)
+    wall = time.perf_counter() - wall_start
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    fake_stats = get_fake_llm_stats()
+    model_seconds_per_request = fake_stats['seconds'] / max(1, len(latencies))
+    result = {
+        'path': path,
+        'mode': mode,
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': errors,
+        'latency_s': {
+            'mean': statistics.mean(latencies) if latencies else 0.0,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99)
+        },
+        'throughput_rps': len(latencies) / wall if wall else 0.0,
+        'llm_calls_per_request': fake_stats['calls'] / max(1, len(latencies)),
+        'tokens_per_request': (fake_stats['input_tokens'] + fake_stats['output_tokens']) / max(1, len(latencies)),
+        # Wall time per request not spent inside (simulated) model calls; not meaningful
+        # when several model calls run concurrently inside one request (it would go negative)
+        'overhead_s_per_request': None if path in PARALLEL_CALL_SCENARIOS or mode in PARALLEL_CALL_SCENARIOS
+        else (statistics.mean(latencies) if latencies else 0.0) - model_seconds_per_request,
+        'peak_traced_memory_mb': peak_memory / 2 ** 20
+    }
+    if first_token_latencies:
+        result['first_token_s'] = {
+            'p50': percentile(first_token_latencies, 50),
+            'p95': percentile(first_token_latencies, 95)
+        }
+    return result
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, text=True).strip()
+    except Exception:
+        return 'unknown'
+
+
+def compare(current, previous_path):
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = json.load(f)
+    previous_by_key = {(r['path'], r['mode'], r['concurrency']): r for r in previous['results']}
+
+    print(f"\nComparison with {previous_path} ({previous['meta'].get('commit')}):")
+    for result in current['results']:
+        old = previous_by_key.get((result['path'], result['mode'], result['concurrency']))
+        if old is None:
+            continue
+        deltas = []
+        for key in ('p50', 'p95', 'p99'):
+            before, after = old['latency_s'][key], result['latency_s'][key]
+            change = (after - before) / before * 100 if before else 0.0
+            deltas.append(f'{key} {change:+.1f}%')
+        tput_change = (result['throughput_rps'] - old['throughput_rps']) / old['throughput_rps'] * 100 if old['throughput_rps'] else 0.0
+        print(f"  {result['path']:<16}{result['mode']:<10}c={result['concurrency']:<4}{', '.join(deltas)}, throughput {tput_change:+.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', default=','.join(ALL_PATHS))
+    parser.add_argument('--modes', default='standard')
+    parser.add_argument('--concurrency', default='1,4,16')
+    parser.add_argument('--requests', type=int, default=32)
+    parser.add_argument('--latency', type=float, default=0.2, help='Fake model latency to first token (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Uniform latency jitter (seconds)')
+    parser.add_argument('--tokens-per-second', type=float, default=200.0, help='Fake model output rate (0 = instant)')
+    parser.add_argument('--with-cache', action='store_true', help='Keep the translation memory enabled')
+    parser.add_argument('--with-pre-annotator', action='store_true', help='Let confident rule-based annotations skip the analysis call')
+    parser.add_argument('--output', help='Result file (defaults to benchmarks/results/<commit>-<timestamp>.json)')
+    parser.add_argument('--compare', help='Previous result file to compare against')
+    args = parser.parse_args()
+
+    configure_environment(args)
+    from backend.app import app
+    client = app.test_client()
+
+    paths = [p for p in args.paths.split(',') if p]
+    modes = [m for m in args.modes.split(',') if m]
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+
+    results = []
+    for path in paths:
+        for mode in modes:
+            for concurrency in levels:
+                result = run_scenario(path, mode, concurrency, args.requests, client)
+                results.append(result)
+                latency = result['latency_s']
+                overhead = result['overhead_s_per_request']
+                print(f"{path:<16}{mode:<12}c={concurrency:<4}p50={latency['p50']:.3f}s p95={latency['p95']:.3f}s "
+                      f"p99={latency['p99']:.3f}s {result['throughput_rps']:.1f} req/s "
+                      f"overhead={'n/a' if overhead is None else f'{overhead * 1000:.1f}ms'}")
+
+    output = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'config': vars(args)
+        },
+        'results': results
+    }
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"{output['meta']['commit']}-{time.strftime('%Y%m%d%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(output, f, indent=2)
+    print(f'\nResults written to {output_path}')
+
+    if args.compare:
+        compare(output, args.compare)
+
+
+if __name__ == '__main__':
+    main()
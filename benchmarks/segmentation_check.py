@@ -0,0 +1,56 @@
+"""
+Sentence segmentation check
+
+Splits known English and Japanese paragraphs with backend.segmentation and
+fails (exit status 1) unless every paragraph gives the expected sentences
+and a segmented document reassembles to its original layout.
+
+Usage:
+    python -m benchmarks.segmentation_check
+"""
+import sys
+
+from backend.segmentation import reassemble, segment_text, split_sentences
+
+# Paragraph -> expected sentences
+CASES = [
+    ('John bought a car. Mary bought a bicycle.', ['John bought a car.', 'Mary bought a bicycle.']),
+    ('Did he pay? Yes! He paid $25,000.', ['Did he pay?', 'Yes!', 'He paid $25,000.']),
+    # Titles and initials never end a sentence, dotted acronyms do when a capitalized word follows
+    ('Mr. A. B. Jones went to the U.S. He was happy.', ['Mr. A. B. Jones went to the U.S.', 'He was happy.']),
+    ('Dr. Smith met J. R. Tolkien in the U.S. last year.', ['Dr. Smith met J. R. Tolkien in the U.S. last year.']),
+    ('She arrived at 9 a.m. and left at 5 p.m. Then it rained.',
+     ['She arrived at 9 a.m. and left at 5 p.m.', 'Then it rained.']),
+    ('He bought pens, paper, etc. for the office.', ['He bought pens, paper, etc. for the office.']),
+    ('Rents rose in big cities, e.g. Tokyo and Osaka.', ['Rents rose in big cities, e.g. Tokyo and Osaka.']),
+    ('See No. 5 and Fig. 3 for details.', ['See No. 5 and Fig. 3 for details.']),
+    ('Version 3.5 is on example.com now. It is free.', ['Version 3.5 is on example.com now.', 'It is free.']),
+    ('He said "Stop." Then he left.', ['He said "Stop."', 'Then he left.']),
+    ('ジョンは車を買った。メアリーは自転車を買った。', ['ジョンは車を買った。', 'メアリーは自転車を買った。']),
+    ('「本当？」と彼は聞いた。はい！', ['「本当？」と彼は聞いた。', 'はい！'])
+]
+
+DOCUMENT = 'John bought a car. Mary bought a bicycle.\n\nMr. Jones went to the U.S. He was happy.\nThe end.'
+
+
+def main():
+    failed = False
+    for paragraph, expected in CASES:
+        sentences = split_sentences(paragraph)
+        if sentences != expected:
+            failed = True
+            print(f'FAIL: {paragraph!r}\n  expected {expected}\n  got      {sentences}')
+
+    segments, separators = segment_text(DOCUMENT)
+    rebuilt = reassemble([segment['text'] for segment in segments], segments, separators, 'English')
+    if rebuilt != DOCUMENT:
+        failed = True
+        print(f'FAIL: reassembled document differs\n  expected {DOCUMENT!r}\n  got      {rebuilt!r}')
+
+    if not failed:
+        print(f'OK: {len(CASES)} paragraphs split as expected, document layout preserved')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
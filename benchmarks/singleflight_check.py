@@ -0,0 +1,147 @@
+"""
+Behavior checks of in-flight call coalescing
+
+Drives backend.singleflight.SingleFlight with the fake chat model and fails
+(exit status 1) unless:
+
+- concurrent calls with the same key run the model once, and every follower
+  receives its own copy of the leader's result
+- calls with different keys are not coalesced
+- when the leader fails, every follower that joined it raises the same error,
+  the key is released, and the next call runs afresh instead of receiving the
+  stale error
+
+Usage:
+    python -m benchmarks.singleflight_check [--callers 5]
+"""
+import argparse
+import sys
+import threading
+import time
+
+from backend import metrics
+from backend.fake_llm import FakeChatModel, FakeRateLimitError, get_fake_llm_stats, reset_fake_llm_stats
+from backend.singleflight import SingleFlight
+
+
+def expect(problems, condition, message):
+    if not condition:
+        problems.append(message)
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return condition()
+
+
+def run_callers(flight, keys, fn):
+    """
+    Call flight.do from one thread per key while fn is held back
+
+    fn only runs once every caller except the leaders has joined a flight, so
+    the outcome does not depend on thread scheduling.
+
+    Returns:
+        List of (result, shared) or the exception raised, per caller
+    """
+    outcomes = [None] * len(keys)
+    release = threading.Event()
+    followers = len(keys) - len(set(keys))
+    coalesced = metrics.COALESCED_CALLS.value(flight=flight.name)
+
+    def held_back():
+        release.wait()
+        return fn()
+
+    def caller(position, key):
+        try:
+            outcomes[position] = flight.do(key, held_back)
+        except Exception as e:
+            outcomes[position] = e
+
+    threads = [threading.Thread(target=caller, args=(position, key)) for position, key in enumerate(keys)]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: metrics.COALESCED_CALLS.value(flight=flight.name) - coalesced >= followers)
+    release.set()
+    for thread in threads:
+        thread.join()
+    return outcomes
+
+
+def check_coalescing(callers):
+    problems = []
+    flight = SingleFlight('check_coalescing')
+    model = FakeChatModel(latency=0.0, responses=['ジョンは車を買った。'])
+    reset_fake_llm_stats()
+
+    outcomes = run_callers(flight, ['John bought a car.'] * callers,
+                           lambda: {'translation': model.invoke('Text: John bought a car.').content, 'notes': []})
+    results = [result for result, _ in outcomes]
+    shared = sum(1 for _, was_shared in outcomes if was_shared)
+    expect(problems, get_fake_llm_stats()['calls'] == 1, f"coalescing: the model was called {get_fake_llm_stats()['calls']} times")
+    expect(problems, shared == callers - 1, f'coalescing: {shared} of {callers} callers shared the result')
+    expect(problems, all(result == results[0] for result in results), 'coalescing: callers received different results')
+    results[0]['notes'].append('modified by one caller')
+    expect(problems, not any(result['notes'] for result in results[1:]), 'coalescing: callers share one result object')
+    expect(problems, flight.in_flight() == 0, f'coalescing: {flight.in_flight()} keys still in flight')
+    return problems
+
+
+def check_distinct_keys(callers):
+    problems = []
+    flight = SingleFlight('check_distinct_keys')
+    model = FakeChatModel(latency=0.0)
+    reset_fake_llm_stats()
+
+    outcomes = run_callers(flight, [f'sentence {index}' for index in range(callers)],
+                           lambda: model.invoke('Text: John bought a car.').content)
+    expect(problems, get_fake_llm_stats()['calls'] == callers,
+           f"distinct keys: {callers} keys ran the model {get_fake_llm_stats()['calls']} times")
+    expect(problems, not any(shared for _, shared in outcomes), 'distinct keys: a result was shared across keys')
+    return problems
+
+
+def check_failure(callers):
+    problems = []
+    flight = SingleFlight('check_failure')
+    rejecting = FakeChatModel(latency=0.0, rate_limit_rate=1.0, seed=0)
+    reset_fake_llm_stats()
+
+    outcomes = run_callers(flight, ['John bought a car.'] * callers,
+                           lambda: rejecting.invoke('Text: John bought a car.').content)
+    errors = [outcome for outcome in outcomes if isinstance(outcome, FakeRateLimitError)]
+    expect(problems, len(errors) == callers, f'failure: {len(errors)} of {callers} callers raised the leader\'s error')
+    expect(problems, flight.in_flight() == 0, f'failure: {flight.in_flight()} keys still in flight after the error')
+
+    healthy = FakeChatModel(latency=0.0, responses=['ジョンは車を買った。'])
+    try:
+        result, shared = flight.do('John bought a car.', lambda: healthy.invoke('Text: John bought a car.').content)
+        expect(problems, result == 'ジョンは車を買った。' and not shared, f'failure: the next call returned {result!r}, shared={shared}')
+    except FakeRateLimitError:
+        problems.append('failure: the next call received the stale error')
+    return problems
+
+
+CHECKS = (check_coalescing, check_distinct_keys, check_failure)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--callers', type=int, default=5, help='Concurrent callers per check')
+    args = parser.parse_args()
+
+    failed = False
+    for check in CHECKS:
+        problems = check(args.callers)
+        print(f"{check.__name__:<24}{'FAIL' if problems else 'OK'}")
+        for problem in problems:
+            print(f'  {problem}')
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -5,6 +5,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const swapLanguagesBtn = document.getElementById('swap-languages');
     const sourceTextArea = document.getElementById('source-text');
     const translateBtn = document.getElementById('translate-btn');
+    const fastModeCheckbox = document.getElementById('fast-mode');
+    const speculativeModeCheckbox = document.getElementById('speculative-mode');
     const loadingIndicator = document.getElementById('loading-indicator');
     const translationResult = document.getElementById('translation-result');
     const frameAnalysis = document.getElementById('frame-analysis');
@@ -25,8 +27,19 @@ document.addEventListener('DOMContentLoaded', function() {
     // Current frame data
     let currentFramePath = '';
     let currentFrameName = '';
+    // Let the server pick the frame from the lexical units in the source text
+    let autoDetectFrame = false;
     
-    // Initialize - load available frames and frame information
+    // In-flight requests, aborted when a newer request supersedes them
+    let translationController = null;
+    let frameInfoController = null;
+    
+    // Frame metadata (revalidated with ETags) and recent translations survive page loads
+    const BOOTSTRAP_URL = '/api/bootstrap';
+    const metadataCache = createLruCache('frame-translation:metadata', 20);
+    const translationCache = createLruCache('frame-translation:translations', 50, 24 * 60 * 60 * 1000);
+    
+    // Initialize - load available frames and the default frame information
     loadAvailableFrames();
     
     // Event listeners
@@ -35,6 +48,22 @@ document.addEventListener('DOMContentLoaded', function() {
     toggleFrameInfoBtn.addEventListener('click', toggleFrameInfo);
     toggleFrameAnalysisBtn.addEventListener('click', toggleFrameAnalysis);
     
+    frameSelector.addEventListener('change', function() {
+        const selectedFrameName = this.value;
+        autoDetectFrame = selectedFrameName === 'auto';
+        if (selectedFrameName && !autoDetectFrame) {
+            loadFrameInfo(selectedFrameName);
+        }
+    });
+    
+    // Fast and speculative mode are alternatives
+    fastModeCheckbox.addEventListener('change', function() {
+        if (this.checked) speculativeModeCheckbox.checked = false;
+    });
+    speculativeModeCheckbox.addEventListener('change', function() {
+        if (this.checked) fastModeCheckbox.checked = false;
+    });
+    
     // Add event listeners for example buttons
     exampleButtons.forEach(button => {
         button.addEventListener('click', function() {
@@ -52,22 +81,20 @@ document.addEventListener('DOMContentLoaded', function() {
     // Function definitions
     
     /**
-     * Load available frames
+     * Load the frame list and the default frame's information in one request
      */
     function loadAvailableFrames() {
-        fetch('/api/frames')
-            .then(response => response.json())
+        // Render the cached copy right away, then revalidate it with its ETag
+        const cached = metadataCache.get(BOOTSTRAP_URL);
+        if (cached) {
+            applyBootstrap(cached.body.data);
+        }
+        
+        fetchJsonCached(BOOTSTRAP_URL)
             .then(data => {
                 if (data.status === 'success') {
-                    populateFrameSelector(data.data);
-                    
-                    // Load default frame info if frames are available
-                    if (data.data.length > 0) {
-                        const defaultFrame = data.data[0];
-                        frameSelector.value = defaultFrame.name;
-                        loadFrameInfo(defaultFrame.name);
-                    } else {
-                        console.warn('No frames available');
+                    if (!cached || data !== cached.body) {
+                        applyBootstrap(data.data);
                     }
                 } else {
                     console.error('Failed to load frames:', data.message);
@@ -80,6 +107,21 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
+    /**
+     * Show the frame list and the default frame from a bootstrap payload
+     */
+    function applyBootstrap(bootstrap) {
+        populateFrameSelector(bootstrap.frames);
+        
+        if (bootstrap.default_frame) {
+            frameSelector.value = bootstrap.default_frame.frame_name;
+            autoDetectFrame = false;
+            setFrameInfo(bootstrap.default_frame);
+        } else {
+            console.warn('No frames available');
+        }
+    }
+    
     /**
      * Populate frame selector dropdown
      */
@@ -87,6 +129,11 @@ document.addEventListener('DOMContentLoaded', function() {
         // Clear existing options
         frameSelector.innerHTML = '';
         
+        const autoOption = document.createElement('option');
+        autoOption.value = 'auto';
+        autoOption.textContent = 'Auto-detect from text';
+        frameSelector.appendChild(autoOption);
+        
         // Add options for each frame
         frames.forEach(frame => {
             const option = document.createElement('option');
@@ -94,38 +141,46 @@ document.addEventListener('DOMContentLoaded', function() {
             option.textContent = `${frame.name} - ${frame.description}`;
             frameSelector.appendChild(option);
         });
-        
-        // Add event listener for frame selection
-        frameSelector.addEventListener('change', function() {
-            const selectedFrameName = this.value;
-            if (selectedFrameName) {
-                loadFrameInfo(selectedFrameName);
-            }
-        });
     }
     
     /**
      * Load Frame information
      */
     function loadFrameInfo(frameName) {
-        fetch(`/api/frame-info?name=${encodeURIComponent(frameName)}`)
-            .then(response => response.json())
+        // A newer selection supersedes a request still in flight
+        if (frameInfoController) {
+            frameInfoController.abort();
+        }
+        const controller = new AbortController();
+        frameInfoController = controller;
+        
+        fetchJsonCached(`/api/frame-info?name=${encodeURIComponent(frameName)}`, controller.signal)
             .then(data => {
                 if (data.status === 'success') {
-                    currentFramePath = data.data.path;
-                    currentFrameName = data.data.frame_name;
-                    displayFrameInfo(data.data);
+                    setFrameInfo(data.data);
                 } else {
                     console.error('Failed to load Frame information:', data.message);
                     alert('Failed to load Frame information: ' + data.message);
                 }
             })
             .catch(error => {
+                if (error.name === 'AbortError') {
+                    return;
+                }
                 console.error('Error requesting Frame information:', error);
                 alert('Error requesting Frame information: ' + error.message);
             });
     }
     
+    /**
+     * Make a frame the current one and display it
+     */
+    function setFrameInfo(frameInfo) {
+        currentFramePath = frameInfo.path;
+        currentFrameName = frameInfo.frame_name;
+        displayFrameInfo(frameInfo);
+    }
+    
     /**
      * Display Frame information
      */
@@ -191,55 +246,146 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
         
-        if (!currentFrameName) {
+        if (!currentFrameName && !autoDetectFrame) {
             alert('Please select a frame first');
             return;
         }
         
+        const requestBody = {
+            source_text: sourceText,
+            source_language: sourceLanguage,
+            target_language: targetLanguage,
+            frame_name: autoDetectFrame ? 'auto' : currentFrameName,
+            mode: fastModeCheckbox.checked ? 'fast' : (speculativeModeCheckbox.checked ? 'speculative' : 'standard')
+        };
+        const cacheKey = JSON.stringify(requestBody);
+        
+        // A new request supersedes the one in flight; the server stops its pipeline
+        if (translationController) {
+            translationController.abort();
+            translationController = null;
+        }
+        
+        // Recent translations are shown without a round trip
+        const cachedResult = translationCache.get(cacheKey);
+        if (cachedResult) {
+            loadingIndicator.style.display = 'none';
+            displayTranslationResult(cachedResult);
+            return;
+        }
+        
+        const controller = new AbortController();
+        translationController = controller;
+        
         // Show loading indicator
         loadingIndicator.style.display = 'flex';
-        translateBtn.disabled = true;
         
         // Clear previous results
         translationResult.textContent = '';
         frameAnalysis.innerHTML = '';
         
-        // Send translation request
-        fetch('/api/translate', {
+        // Send translation request, rendering the analysis and tokens as they stream in
+        fetch('/api/translate/stream', {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
-                source_text: sourceText,
-                source_language: sourceLanguage,
-                target_language: targetLanguage,
-                frame_name: currentFrameName
-            })
+            body: JSON.stringify(requestBody),
+            signal: controller.signal
         })
-        .then(response => response.json())
-        .then(data => {
-            // Hide loading indicator
-            loadingIndicator.style.display = 'none';
-            translateBtn.disabled = false;
-            
-            if (data.status === 'success') {
-                displayTranslationResult(data.data);
-            } else {
-                console.error('Translation failed:', data.message);
-                alert('Translation failed: ' + data.message);
+        .then(response => {
+            const contentType = response.headers.get('Content-Type') || '';
+            if (!contentType.includes('text/event-stream')) {
+                // Validation errors are returned as plain JSON
+                return response.json().then(data => {
+                    throw new Error(data.message || 'Unexpected response from server');
+                });
+            }
+            return readEventStream(response, (event, data) => {
+                if (event === 'done' && data.translation) {
+                    translationCache.set(cacheKey, data);
+                }
+                handleTranslationEvent(event, data);
+            });
+        })
+        .then(() => {
+            if (translationController === controller) {
+                translationController = null;
+                loadingIndicator.style.display = 'none';
             }
         })
         .catch(error => {
-            // Hide loading indicator
-            loadingIndicator.style.display = 'none';
-            translateBtn.disabled = false;
+            // Superseded requests are aborted silently, the newer one owns the UI
+            if (error.name === 'AbortError') {
+                return;
+            }
+            if (translationController === controller) {
+                translationController = null;
+                loadingIndicator.style.display = 'none';
+            }
             
             console.error('Error in translation request:', error);
             alert('Error in translation request: ' + error.message);
         });
     }
     
+    /**
+     * Read a Server-Sent Events response body, calling onEvent(name, data) per event
+     */
+    function readEventStream(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        function pump() {
+            return reader.read().then(({ done, value }) => {
+                if (done) {
+                    return;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                
+                let boundary;
+                while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    
+                    let eventName = 'message';
+                    const dataLines = [];
+                    rawEvent.split('\n').forEach(line => {
+                        if (line.startsWith('event:')) {
+                            eventName = line.slice(6).trim();
+                        } else if (line.startsWith('data:')) {
+                            dataLines.push(line.slice(5).trim());
+                        }
+                    });
+                    if (dataLines.length > 0) {
+                        onEvent(eventName, JSON.parse(dataLines.join('\n')));
+                    }
+                }
+                return pump();
+            });
+        }
+        
+        return pump();
+    }
+    
+    /**
+     * Handle one translation stream event
+     */
+    function handleTranslationEvent(event, data) {
+        if (event === 'analysis') {
+            if (data.frame_analysis) {
+                frameAnalysis.innerHTML = formatJSON(data.frame_analysis);
+            }
+        } else if (event === 'token') {
+            translationResult.textContent += data.text;
+        } else if (event === 'done') {
+            displayTranslationResult(data);
+        } else if (event === 'error') {
+            throw new Error(data.message);
+        }
+    }
+    
     /**
      * Display translation result
      */
@@ -253,6 +399,11 @@ document.addEventListener('DOMContentLoaded', function() {
         } else {
             frameAnalysis.textContent = 'No Frame analysis results';
         }
+        
+        // Show the frame the server detected
+        if (data.frame_detection && data.frame_detection.frame_name) {
+            loadFrameInfo(data.frame_detection.frame_name);
+        }
     }
     
     /**
@@ -324,4 +475,80 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize display/hide state
     frameInfoContent.style.display = 'grid';
     frameAnalysis.style.display = 'block';
+    
+    /**
+     * Create a small LRU cache kept in memory and mirrored to localStorage
+     */
+    function createLruCache(storageKey, maxEntries, maxAgeMs) {
+        const entries = new Map();
+        try {
+            const stored = JSON.parse(localStorage.getItem(storageKey) || '[]');
+            stored.forEach(([key, entry]) => entries.set(key, entry));
+        } catch (error) {
+            // Storage unavailable or corrupt, start empty
+        }
+        
+        function persist() {
+            try {
+                localStorage.setItem(storageKey, JSON.stringify(Array.from(entries)));
+            } catch (error) {
+                // Quota exceeded or storage disabled, keep the in-memory copy only
+            }
+        }
+        
+        return {
+            get(key) {
+                const entry = entries.get(key);
+                if (!entry) {
+                    return undefined;
+                }
+                if (maxAgeMs && Date.now() - entry.time > maxAgeMs) {
+                    entries.delete(key);
+                    persist();
+                    return undefined;
+                }
+                // Most recently used entries are kept last
+                entries.delete(key);
+                entries.set(key, entry);
+                return entry.value;
+            },
+            set(key, value) {
+                entries.delete(key);
+                entries.set(key, { value: value, time: Date.now() });
+                while (entries.size > maxEntries) {
+                    entries.delete(entries.keys().next().value);
+                }
+                persist();
+            }
+        };
+    }
+    
+    /**
+     * GET a JSON resource, revalidating the cached copy with If-None-Match
+     */
+    function fetchJsonCached(url, signal) {
+        const cached = metadataCache.get(url);
+        const headers = cached ? { 'If-None-Match': cached.etag } : {};
+        
+        return fetch(url, { headers: headers, signal: signal })
+            .then(response => {
+                if (response.status === 304 && cached) {
+                    return cached.body;
+                }
+                return response.json().then(body => {
+                    const etag = response.headers.get('ETag');
+                    if (response.ok && etag && body.status === 'success') {
+                        metadataCache.set(url, { etag: etag, body: body });
+                    }
+                    return body;
+                });
+            })
+            .catch(error => {
+                // Offline: fall back to the cached copy
+                if (error.name !== 'AbortError' && cached) {
+                    return cached.body;
+                }
+                throw error;
+            });
+    }
 });
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Translation requests spend most of their time waiting on the model provider,
+so each worker serves requests from a pool of threads. The app is preloaded
+in the master process (Frame index, LLM clients, compiled workflow) and
+every worker warms up its routes before accepting traffic. On shutdown,
+workers stop accepting connections and get graceful_timeout seconds to
+finish in-flight requests.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.getenv('GUNICORN_WORKERS', str(min(4, multiprocessing.cpu_count()))))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '16'))
+
+preload_app = True
+
+# A translation makes up to two model calls, allow for slow providers
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '180'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '60'))
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+
+
+def post_worker_init(worker):
+    from backend.app import warm_up
+    from backend.jobs import get_job_manager
+
+    warm_up()
+    # Background job threads must be started after the fork
+    get_job_manager()
+
+
+def worker_exit(server, worker):
+    from backend.jobs import shutdown_job_manager
+
+    # Running jobs stop between chunks and are resumed by another process
+    shutdown_job_manager(wait=False)
@@ -3,7 +3,7 @@ Frame-based English-Japanese Translation Tool Startup Script
 """
 import os
 from dotenv import load_dotenv
-from backend.app import app
+from backend.app import app, start_background_preload
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +18,10 @@ if __name__ == "__main__":
         print("Warning: DEEPSEEK_API_KEY environment variable is not set")
         print("Please set the DEEPSEEK_API_KEY in your .env file")
     
+    # Resume jobs interrupted by a restart, then load the translation stack and
+    # create shared LLM clients while the server starts
+    start_background_preload()
+    
     # Start application
     print("Starting Frame-based English-Japanese Translation Tool...")
     print("Access http://127.0.0.1:8080 to use the application")
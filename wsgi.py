@@ -0,0 +1,9 @@
+"""
+WSGI entry point for production servers
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from backend.app import app, preload
+
+# Runs once in the master process when the app is preloaded, before workers fork
+preload()